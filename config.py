@@ -16,6 +16,19 @@ DATABASE_PATH = os.path.join(DATABASE_DIR, 'patterns.db')
 REPORTS_DIR = os.path.join(BASE_DIR, 'reports')
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 
+# SQLite 忙等待超时（秒），并发写入时等待锁释放
+DATABASE_TIMEOUT = 60
+
+# SQLite 连接参数（scripts/db.py 的 connect 统一设置）
+DB_MMAP_SIZE = 256 * 1024 * 1024      # 内存映射读取的最大字节数
+DB_CACHE_SIZE_KB = 64 * 1024          # 每个连接的页缓存大小（KB）
+
+# 批量写入时每次 executemany 的行数（整批数据仍在同一个事务内提交）
+DB_UPSERT_BATCH_SIZE = 5000
+
+# 批量写入时每个事务最多写入的行数，超过后提交并开始新事务（None 表示整批一个事务）
+DB_TRANSACTION_SIZE = 50000
+
 # ==================== Binance API 配置 ====================
 # 使用公开API，不需要密钥
 BINANCE_API_BASE = 'https://api.binance.com/api/v3'
@@ -27,6 +40,39 @@ BITSTAMP_API_BASE = 'https://www.bitstamp.net/api/v2'
 # API请求间隔（秒），避免限流
 API_REQUEST_INTERVAL = 0.5
 
+# ==================== HTTP 客户端配置 ====================
+HTTP_TIMEOUT = 30           # 单次请求超时（秒）
+HTTP_MAX_RETRIES = 5        # 失败后最多重试次数
+HTTP_BACKOFF_BASE = 1.0     # 指数退避的初始等待（秒）
+HTTP_BACKOFF_MAX = 60.0     # 指数退避的最长等待（秒）
+HTTP_POOL_SIZE = 4          # 每个会话的连接池大小
+
+# HTTP 录制/回放模式（通过环境变量 AMDX_HTTP_MODE 设置）
+# off: 正常请求交易所API
+# record: 正常请求，并把原始响应压缩保存到 HTTP_CACHE_DIR
+# replay: 只从 HTTP_CACHE_DIR 读取已录制的响应，不访问网络
+HTTP_CACHE_MODE = os.environ.get('AMDX_HTTP_MODE', 'off').lower()
+HTTP_CACHE_DIR = os.path.join(DATA_DIR, 'raw', 'http_cache')
+
+# 录制/回放时固定的当前时间（UTC+9，如 "2025-12-15 09:00:00"，通过环境变量 AMDX_HTTP_NOW 设置）
+# 请求的结束时间由当前时间推算；未设置时录制使用运行开始的时间并保存到缓存目录，回放读取该时间
+HTTP_CACHE_NOW = os.environ.get('AMDX_HTTP_NOW')
+
+# ==================== 并发获取与限流配置 ====================
+# 并发获取数据的最大线程数（所有交易对和交易所共享）
+FETCH_MAX_WORKERS = 4
+
+# Bitstamp回填时并发获取的时间窗口数（每个窗口1000小时，受Bitstamp令牌桶限制）
+BITSTAMP_FETCH_WORKERS = 4
+
+# 各交易所的令牌桶限流参数
+# capacity: 时间窗口内允许的请求权重上限
+# window_seconds: 时间窗口长度（秒）
+RATE_LIMITS = {
+    'binance': {'capacity': 2400, 'window_seconds': 60},    # 期货API: 每分钟2400权重
+    'bitstamp': {'capacity': 8000, 'window_seconds': 600}   # 每10分钟8000次请求
+}
+
 # ==================== 交易对配置 ====================
 SYMBOLS = [
     {
@@ -75,6 +121,23 @@ REPORT_CONFIG = {
     'decimal_places': 2
 }
 
+# 并行生成报告的进程数（Excel、PDF、JSON和合并报告互相独立，各占一个进程）
+REPORT_WORKERS = min(4, os.cpu_count() or 1)
+
+# PDF报告图表缓存目录，图片文件名包含图表数据的哈希，数据未变化的图表不再重新绘制
+CHART_CACHE_DIR = os.path.join(REPORTS_DIR, 'charts')
+
+# 图表尺寸（英寸）和分辨率
+CHART_FIGSIZE = (8, 3.5)
+CHART_DPI = 120
+
+# ==================== 原始数据导出配置 ====================
+# 原始数据（CSV/Parquet）导出目录，供分析笔记本直接读取
+RAW_EXPORT_DIR = os.path.join(DATA_DIR, 'processed')
+
+# 每次从游标读取的行数，导出时内存占用与此成正比，与表的大小无关
+RAW_EXPORT_CHUNK_SIZE = 50000
+
 # ==================== 创建必要的目录 ====================
 def ensure_directories():
     """确保所有必要的目录存在"""
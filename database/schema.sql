@@ -241,3 +241,52 @@ CREATE INDEX IF NOT EXISTS idx_weekly_patterns_symbol_year ON weekly_patterns(sy
 CREATE INDEX IF NOT EXISTS idx_weekly_patterns_pattern ON weekly_patterns(pattern);
 CREATE INDEX IF NOT EXISTS idx_weekly_patterns_week_start ON weekly_patterns(week_start);
 
+-- ==================== 日模式表 ====================
+-- 周度7字母模式按天展开（由周模式计算程序维护），报告按 (symbol_id, trade_date) 等值连接读取
+CREATE TABLE IF NOT EXISTS daily_patterns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol_id INTEGER NOT NULL,
+    trade_date DATE NOT NULL,                  -- 交易日期 (UTC+9)
+    week_start DATETIME NOT NULL,              -- 所属周的开始时间（weekly_patterns.week_start）
+    year INTEGER NOT NULL,
+    day_of_week INTEGER NOT NULL,              -- 0=周一, 6=周日
+    letter TEXT,                               -- 当天在周度模式中的字母 (A/M/D/X)
+    trend_detail TEXT,                         -- 当天走势明细
+    breakout_up_percent DECIMAL(10, 4),        -- 当天向上突破幅度(%)
+    breakout_down_percent DECIMAL(10, 4),      -- 当天向下突破幅度(%)
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (symbol_id) REFERENCES symbols(id),
+    UNIQUE(symbol_id, trade_date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_daily_patterns_symbol_year ON daily_patterns(symbol_id, year);
+
+
+-- ==================== 获取进度检查点表 ====================
+CREATE TABLE IF NOT EXISTS fetch_checkpoints (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol_id INTEGER NOT NULL,
+    timeframe TEXT NOT NULL,                   -- K线周期，如 1h
+    last_timestamp INTEGER,                    -- 已写入数据库的最后一根K线（Unix时间戳，秒）
+    range_start INTEGER NOT NULL,              -- 本次获取范围开始（Unix时间戳，秒）
+    range_end INTEGER NOT NULL,                -- 本次获取范围结束（Unix时间戳，秒）
+    status TEXT NOT NULL,                      -- running/done
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (symbol_id) REFERENCES symbols(id),
+    UNIQUE(symbol_id, timeframe)
+);
+
+-- ==================== 待重算数据范围表 ====================
+-- 获取程序写入新增或有变化的周/日数据时记录范围，模式计算只重算受影响的月/周
+CREATE TABLE IF NOT EXISTS dirty_ranges (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol_id INTEGER NOT NULL,
+    source_table TEXT NOT NULL,                -- weekly_data/daily_data
+    range_start TEXT NOT NULL,                 -- 变化数据的最小键（week_start 或 trade_date）
+    range_end TEXT NOT NULL,                   -- 变化数据的最大键
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (symbol_id) REFERENCES symbols(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_dirty_ranges_source ON dirty_ranges(source_table);
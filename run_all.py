@@ -42,13 +42,15 @@ def main():
 示例:
   python run_all.py                    # 运行所有步骤（增量更新）
   python run_all.py --force            # 强制重新获取所有数据
-  python run_all.py --report           # 只生成报告
+  python run_all.py --report           # 只生成报告（输入数据未变化的报告跳过）
+  python run_all.py --report --force   # 重新生成所有报告
   python run_all.py --bitstamp         # 获取Bitstamp数据
+  python run_all.py --export-raw csv   # 只导出原始数据（CSV/Parquet）
         """
     )
     
     parser.add_argument('--force', '-f', action='store_true',
-                        help='强制重新获取所有数据')
+                        help='强制重新获取所有数据，并重新生成输入数据未变化的报告')
     parser.add_argument('--report', '-r', action='store_true',
                         help='只生成报告（跳过数据获取）')
     parser.add_argument('--init', '-i', action='store_true',
@@ -59,6 +61,8 @@ def main():
                         help='只计算模式')
     parser.add_argument('--bitstamp', action='store_true',
                         help='获取Bitstamp数据')
+    parser.add_argument('--export-raw', choices=['csv', 'parquet'],
+                        help='导出原始数据和模式表到 data/processed（parquet需要安装pyarrow）')
     
     args = parser.parse_args()
     
@@ -69,10 +73,10 @@ def main():
     print(f"数据库: {DATABASE_PATH}")
     
     # 根据参数决定运行哪些步骤
-    run_init = args.init or (not args.report and not args.fetch and not args.calculate)
-    run_fetch = args.fetch or (not args.init and not args.report and not args.calculate)
-    run_calc = args.calculate or (not args.init and not args.report and not args.fetch)
-    run_report = args.report or (not args.init and not args.fetch and not args.calculate)
+    run_init = args.init or (not args.report and not args.fetch and not args.calculate and not args.export_raw)
+    run_fetch = args.fetch or (not args.init and not args.report and not args.calculate and not args.export_raw)
+    run_calc = args.calculate or (not args.init and not args.report and not args.fetch and not args.export_raw)
+    run_report = args.report or (not args.init and not args.fetch and not args.calculate and not args.export_raw)
     
     success = True
     
@@ -86,17 +90,12 @@ def main():
         print("\n数据库初始化完成!")
         return 0
     
-    # 步骤2: 获取数据
+    # 步骤2: 获取数据（Binance与Bitstamp各交易对并发获取）
     if run_fetch:
-        if not run_step("获取Binance数据", "fetch_data", "main", force_update=args.force):
+        if not run_step("获取数据", "fetch_scheduler", "main", force_update=args.force,
+                        include_bitstamp=args.bitstamp or args.force):
             print("\n数据获取失败，继续执行...")
             success = False
-        
-        # 获取Bitstamp数据
-        if args.bitstamp or args.force:
-            if not run_step("获取Bitstamp数据", "fetch_bitstamp_data", "main", force_update=args.force):
-                print("\nBitstamp数据获取失败，继续执行...")
-                success = False
     
     if args.fetch:
         return 0 if success else 1
@@ -106,19 +105,32 @@ def main():
         if not run_step("计算AMDX/XAMD模式", "calculate_patterns", "main"):
             print("\n模式计算失败，继续执行...")
             success = False
+        
+        # 周度模式同时维护按天展开的 daily_patterns，报告的日数据工作表从该表读取
+        if not run_step("计算周度模式", "calculate_weekly_patterns", "main"):
+            print("\n周度模式计算失败，继续执行...")
+            success = False
     
     if args.calculate:
         return 0 if success else 1
     
+    # 只生成报告或导出原始数据时数据库没有经过初始化，先补齐旧数据库缺少的表（如 daily_patterns）
+    if (run_report or args.export_raw) and not run_init:
+        if not run_step("迁移数据库", "init_database", "migrate_database"):
+            print("\n数据库迁移失败，继续执行...")
+            success = False
+    
     # 步骤4: 生成报告
     if run_report:
-        if not run_step("生成分析报告", "generate_reports", "main"):
+        # Excel报告、PDF报告、JSON数据、JSON接口和合并报告（月度模式 + 周度模式）并行生成
+        if not run_step("生成报告", "report_orchestrator", "main", force=args.force):
             print("\n报告生成失败")
             success = False
-        
-        # 生成合并报告（月度模式 + 周度模式）
-        if not run_step("生成合并报告", "export_combined_report", "main"):
-            print("\n合并报告生成失败")
+    
+    # 步骤5: 导出原始数据
+    if args.export_raw:
+        if not run_step("导出原始数据", "export_raw_data", "main", fmt=args.export_raw):
+            print("\n原始数据导出失败")
             success = False
     
     # 完成
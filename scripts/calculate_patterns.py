@@ -3,7 +3,6 @@ AMDX/XAMD 模式计算脚本
 判断每个月第一周的模式
 """
 
-import sqlite3
 import os
 import sys
 from datetime import datetime, timedelta
@@ -11,7 +10,12 @@ from datetime import datetime, timedelta
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import DATABASE_PATH, TZ_UTC9, WEEK_START_HOUR
+from config import TZ_UTC9, WEEK_START_HOUR
+from scripts.db import connect
+from scripts.db_writer import BatchWriter
+from scripts.dirty_ranges import get_dirty_ranges, clear_dirty_ranges, in_ranges
+import numpy as np
+import pandas as pd
 import pytz
 
 
@@ -142,10 +146,16 @@ def determine_pattern(first_week_high, first_week_low, prev_week_high, prev_week
             breakout_up_percent, breakout_down_percent)
 
 
-def calculate_pattern_for_month(symbol_id, year, month, conn):
+def calculate_pattern_for_month(symbol_id, year, month, conn, writer=None):
     """
     计算指定月份的模式
+    
+    传入writer时写入由调用方的 BatchWriter 批量提交，否则单独提交
     """
+    if writer is None:
+        with BatchWriter(conn) as writer:
+            return calculate_pattern_for_month(symbol_id, year, month, conn, writer)
+    
     cursor = conn.cursor()
     
     # 获取该月第一周数据
@@ -210,7 +220,7 @@ def calculate_pattern_for_month(symbol_id, year, month, conn):
     
     if existing:
         # 更新记录
-        cursor.execute("""
+        writer.execute("""
             UPDATE monthly_patterns SET
                 first_week_id = ?, previous_week_id = ?, first_week_start = ?,
                 pattern = ?, first_week_high = ?, first_week_low = ?,
@@ -229,7 +239,7 @@ def calculate_pattern_for_month(symbol_id, year, month, conn):
               data['data_quality_score'], existing[0]))
     else:
         # 插入新记录
-        cursor.execute("""
+        writer.execute("""
             INSERT INTO monthly_patterns
             (symbol_id, year, month, first_week_id, previous_week_id, first_week_start,
              pattern, first_week_high, first_week_low,
@@ -248,13 +258,95 @@ def calculate_pattern_for_month(symbol_id, year, month, conn):
               data['breakout_up_percent'], data['breakout_down_percent'],
               data['data_quality_score']))
     
-    conn.commit()
     return data
 
 
-def calculate_all_patterns(conn):
+# monthly_patterns 的写入列（与 calculate_pattern_for_month 的 data 字段一致）
+MONTHLY_PATTERN_COLUMNS = [
+    'symbol_id', 'year', 'month', 'first_week_id', 'previous_week_id', 'first_week_start',
+    'pattern', 'first_week_high', 'first_week_low',
+    'previous_week_high', 'previous_week_low',
+    'is_breakout_up', 'is_breakout_down',
+    'breakout_up_amount', 'breakout_down_amount',
+    'breakout_up_percent', 'breakout_down_percent',
+    'data_quality_score'
+]
+
+
+def compute_monthly_patterns(weekly):
+    """
+    一次性计算一个交易对所有月份的模式（与 calculate_pattern_for_month 结果相同）
+    
+    Args:
+        weekly: 该交易对的周数据 DataFrame，
+                包含 id, week_start, year, month, week_high, week_low, data_quality_score
+    
+    Returns:
+        DataFrame: 每个可判断模式的月份一行，列为 MONTHLY_PATTERN_COLUMNS（不含symbol_id）
+    """
+    weekly = weekly.sort_values('week_start').reset_index(drop=True)
+    weekly['pos'] = np.arange(len(weekly))
+    
+    # 每个月第一个周一（1号是周一时即为1号）
+    month_start = pd.to_datetime(dict(year=weekly['year'], month=weekly['month'], day=1))
+    first_monday = month_start + pd.to_timedelta((7 - month_start.dt.weekday) % 7, unit='D')
+    
+    # 第一周：优先取从第一个周一开始的周，否则取该月最早的一周
+    keys = ['year', 'month']
+    is_exact = weekly['week_start'].str[:10] == first_monday.dt.strftime('%Y-%m-%d')
+    fallback_pos = weekly.groupby(keys)['pos'].min()
+    exact_pos = weekly[is_exact].groupby(keys)['pos'].min()
+    first_pos = exact_pos.reindex(fallback_pos.index).fillna(fallback_pos).astype(int)
+    
+    # 前一周：按周开始时间排序的上一行，第一行没有前一周
+    first_pos = first_pos[first_pos > 0]
+    first = weekly.iloc[first_pos.to_numpy()].reset_index(drop=True)
+    prev = weekly.iloc[first_pos.to_numpy() - 1].reset_index(drop=True)
+    
+    first_high = first['week_high'].to_numpy(dtype=float)
+    first_low = first['week_low'].to_numpy(dtype=float)
+    prev_high = prev['week_high'].to_numpy(dtype=float)
+    prev_low = prev['week_low'].to_numpy(dtype=float)
+    
+    # 判断是否突破（等于前一周最高/最低不算突破）
+    is_breakout_up = first_high > prev_high
+    is_breakout_down = first_low < prev_low
+    
+    breakout_up_amount = np.where(is_breakout_up, first_high - prev_high, np.nan)
+    breakout_down_amount = np.where(is_breakout_down, prev_low - first_low, np.nan)
+    
+    # 数据质量分数取两周的最低分（缺失或0按100计）
+    first_quality = first['data_quality_score'].fillna(0).replace(0, 100)
+    prev_quality = prev['data_quality_score'].fillna(0).replace(0, 100)
+    
+    return pd.DataFrame({
+        'year': first['year'],
+        'month': first['month'],
+        'first_week_id': first['id'],
+        'previous_week_id': prev['id'],
+        'first_week_start': first['week_start'],
+        'pattern': np.where(is_breakout_up | is_breakout_down, 'XAMD', 'AMDX'),
+        'first_week_high': first_high,
+        'first_week_low': first_low,
+        'previous_week_high': prev_high,
+        'previous_week_low': prev_low,
+        'is_breakout_up': is_breakout_up.astype(int),
+        'is_breakout_down': is_breakout_down.astype(int),
+        'breakout_up_amount': breakout_up_amount,
+        'breakout_down_amount': breakout_down_amount,
+        'breakout_up_percent': breakout_up_amount / prev_high * 100,
+        'breakout_down_percent': breakout_down_amount / prev_low * 100,
+        'data_quality_score': np.minimum(first_quality, prev_quality).astype(int)
+    })
+
+
+def calculate_all_patterns(conn, full=False):
     """
-    计算所有交易对的所有月份模式
+    计算所有交易对的月份模式
+    
+    每个交易对只读取一次周数据，所有月份一次性计算，在一个事务内写入。
+    默认只写入受变化周数据影响的月份（该周作为第一周或前一周的月份），
+    full=True 或该交易对还没有任何模式时全量重算
     """
     cursor = conn.cursor()
     
@@ -262,46 +354,74 @@ def calculate_all_patterns(conn):
     cursor.execute("SELECT id, symbol FROM symbols WHERE is_active = 1")
     symbols = cursor.fetchall()
     
+    dirty_ids, dirty = get_dirty_ranges(conn, 'weekly_data')
+    
+    cursor.execute("SELECT DISTINCT symbol_id FROM monthly_patterns")
+    calculated = {row[0] for row in cursor.fetchall()}
+    
+    weekly_all = pd.read_sql_query("""
+        SELECT symbol_id, id, week_start, year, month, week_high, week_low, data_quality_score
+        FROM weekly_data
+        WHERE symbol_id IN (SELECT id FROM symbols WHERE is_active = 1)
+    """, conn)
+    
+    rows = []
+    
     for symbol_id, symbol_name in symbols:
         print(f"\n处理交易对: {symbol_name}")
         print("-" * 40)
         
-        # 获取该交易对的所有不同年月组合
-        cursor.execute("""
-            SELECT DISTINCT year, month
-            FROM weekly_data
-            WHERE symbol_id = ?
-            ORDER BY year, month
-        """, (symbol_id,))
+        weekly = weekly_all[weekly_all['symbol_id'] == symbol_id]
+        
+        if weekly.empty:
+            continue
         
-        months = cursor.fetchall()
+        symbol_full = full or symbol_id not in calculated
         
-        amdx_count = 0
-        xamd_count = 0
+        if not symbol_full and symbol_id not in dirty:
+            print("  周数据没有变化，跳过")
+            continue
         
-        for year, month in months:
-            result = calculate_pattern_for_month(symbol_id, year, month, conn)
+        patterns = compute_monthly_patterns(weekly)
+        
+        if not symbol_full:
+            # 只保留第一周或前一周有变化的月份
+            dirty_week_ids = weekly.loc[in_ranges(weekly['week_start'], dirty[symbol_id]), 'id']
+            affected = (patterns['first_week_id'].isin(dirty_week_ids)
+                        | patterns['previous_week_id'].isin(dirty_week_ids))
+            patterns = patterns[affected]
+            print(f"  增量重算 {len(patterns)} 个月")
+        
+        patterns.insert(0, 'symbol_id', symbol_id)
+        
+        # 转换为Python原生类型，NaN写入为NULL
+        patterns = patterns.astype(object).where(patterns.notna(), None)
+        rows.extend(patterns[MONTHLY_PATTERN_COLUMNS].itertuples(index=False, name=None))
+        
+        for result in patterns.itertuples(index=False):
+            # 显示详情
+            breakout_info = ""
+            if result.is_breakout_up:
+                breakout_info += f" ↑{result.breakout_up_percent:.2f}%"
+            if result.is_breakout_down:
+                breakout_info += f" ↓{result.breakout_down_percent:.2f}%"
             
-            if result:
-                pattern = result['pattern']
-                if pattern == 'AMDX':
-                    amdx_count += 1
-                else:
-                    xamd_count += 1
-                
-                # 显示详情
-                breakout_info = ""
-                if result['is_breakout_up']:
-                    breakout_info += f" ↑{result['breakout_up_percent']:.2f}%"
-                if result['is_breakout_down']:
-                    breakout_info += f" ↓{result['breakout_down_percent']:.2f}%"
-                
-                print(f"  {year}-{month:02d}: {pattern}{breakout_info}")
+            print(f"  {result.year}-{result.month:02d}: {result.pattern}{breakout_info}")
+        
+        amdx_count = int((patterns['pattern'] == 'AMDX').sum())
+        xamd_count = int((patterns['pattern'] == 'XAMD').sum())
         
         total = amdx_count + xamd_count
-        if total > 0:
+        if total > 0 and symbol_full:
             print(f"\n  统计: AMDX={amdx_count} ({amdx_count*100/total:.1f}%), "
                   f"XAMD={xamd_count} ({xamd_count*100/total:.1f}%)")
+    
+    # 所有交易对的结果与已处理范围的删除在同一个工作单元内写入
+    with BatchWriter(conn) as writer:
+        writer.upsert('monthly_patterns', MONTHLY_PATTERN_COLUMNS, rows,
+                      conflict_columns=['symbol_id', 'year', 'month'],
+                      update_columns=MONTHLY_PATTERN_COLUMNS[3:])
+        clear_dirty_ranges(conn, dirty_ids)
 
 
 def run_data_quality_checks(conn):
@@ -324,17 +444,18 @@ def run_data_quality_checks(conn):
     
     low_quality = cursor.fetchall()
     
-    for symbol, count in low_quality:
-        print(f"  警告: {symbol} 有 {count} 周数据质量较低")
-        
-        # 记录到日志
-        cursor.execute("""
-            INSERT INTO data_quality_logs
-            (symbol_id, check_date, check_type, status, message, affected_records)
-            SELECT id, CURRENT_TIMESTAMP, 'LOW_QUALITY_DATA', 'WARN',
-                   '数据质量分数低于80', ?
-            FROM symbols WHERE symbol = ?
-        """, (count, symbol))
+    with BatchWriter(conn) as writer:
+        for symbol, count in low_quality:
+            print(f"  警告: {symbol} 有 {count} 周数据质量较低")
+            
+            # 记录到日志
+            writer.execute("""
+                INSERT INTO data_quality_logs
+                (symbol_id, check_date, check_type, status, message, affected_records)
+                SELECT id, CURRENT_TIMESTAMP, 'LOW_QUALITY_DATA', 'WARN',
+                       '数据质量分数低于80', ?
+                FROM symbols WHERE symbol = ?
+            """, (count, symbol))
     
     # 检查2: 异常价格变动
     cursor.execute("""
@@ -352,23 +473,27 @@ def run_data_quality_checks(conn):
     for symbol, week_start, pct in high_volatility:
         print(f"  注意: {symbol} 在 {week_start[:10]} 周波动率达 {pct:.1f}%")
     
-    conn.commit()
     print("  数据质量检查完成")
 
 
-def main():
-    """主函数"""
+def main(full=False):
+    """
+    主函数
+    
+    Args:
+        full: 是否全量重算所有月份（默认只重算周数据有变化的月份）
+    """
     print("=" * 60)
     print("AMDX/XAMD 模式计算程序")
     print("=" * 60)
     print(f"当前时间: {datetime.now(TZ_UTC9).strftime('%Y-%m-%d %H:%M:%S')} (UTC+9)")
     
     # 连接数据库
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = connect()
     
     try:
         # 计算所有模式
-        calculate_all_patterns(conn)
+        calculate_all_patterns(conn, full=full)
         
         # 运行数据质量检查
         run_data_quality_checks(conn)
@@ -386,5 +511,12 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='计算AMDX/XAMD月度模式')
+    parser.add_argument('--full', action='store_true',
+                        help='全量重算所有月份（默认只重算周数据有变化的月份）')
+    
+    args = parser.parse_args()
+    main(full=args.full)
 
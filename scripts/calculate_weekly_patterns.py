@@ -3,14 +3,18 @@
 计算每周的7字母模式（XAMDXAM 或 AMDXAMD）
 """
 
-import sqlite3
 import os
 import sys
 from datetime import datetime, timedelta
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import DATABASE_PATH, TZ_UTC9, WEEK_START_HOUR, WEEK_START_MINUTE
+from config import TZ_UTC9, WEEK_START_HOUR, WEEK_START_MINUTE
+from scripts.db import connect
+from scripts.db_writer import BatchWriter
+from scripts.dirty_ranges import get_dirty_ranges, clear_dirty_ranges, in_ranges
+import numpy as np
+import pandas as pd
 import pytz
 
 
@@ -82,8 +86,16 @@ def get_week_mondays(conn, symbol_id):
     return [row[0] for row in cursor.fetchall()]
 
 
-def calculate_pattern_for_week(symbol_id, monday_date_str, conn):
-    """计算指定周的模式"""
+def calculate_pattern_for_week(symbol_id, monday_date_str, conn, writer=None):
+    """
+    计算指定周的模式
+    
+    传入writer时写入由调用方的 BatchWriter 批量提交，否则单独提交
+    """
+    if writer is None:
+        with BatchWriter(conn) as writer:
+            return calculate_pattern_for_week(symbol_id, monday_date_str, conn, writer)
+    
     cursor = conn.cursor()
     
     # 解析周一日期
@@ -236,7 +248,7 @@ def calculate_pattern_for_week(symbol_id, monday_date_str, conn):
     
     if existing:
         # 更新记录
-        cursor.execute("""
+        writer.execute("""
             UPDATE weekly_patterns SET
                 pattern = ?, monday_id = ?, tuesday_id = ?, wednesday_id = ?,
                 thursday_id = ?, friday_id = ?, saturday_id = ?, sunday_id = ?,
@@ -277,7 +289,7 @@ def calculate_pattern_for_week(symbol_id, monday_date_str, conn):
         ))
     else:
         # 插入新记录
-        cursor.execute("""
+        writer.execute("""
             INSERT INTO weekly_patterns
             (symbol_id, week_start, week_end, year, month, week_of_year,
              pattern, monday_id, tuesday_id, wednesday_id, thursday_id,
@@ -320,54 +332,314 @@ def calculate_pattern_for_week(symbol_id, monday_date_str, conn):
             data.get('sunday_breakout_up_percent'), data.get('sunday_breakout_down_percent')
         ))
     
-    conn.commit()
+    # 同步更新按天展开的日模式
+    week = pd.DataFrame([{**data, 'week_start': data['week_start'].strftime('%Y-%m-%d %H:%M:%S')}])
+    days = explode_daily_patterns(week.reindex(columns=WEEKLY_PATTERN_COLUMNS[1:]))
+    days.insert(0, 'symbol_id', symbol_id)
+    days = days.astype(object).where(days.notna(), None)
+    writer.upsert('daily_patterns', DAILY_PATTERN_COLUMNS, days.itertuples(index=False, name=None),
+                  conflict_columns=['symbol_id', 'trade_date'],
+                  update_columns=DAILY_PATTERN_COLUMNS[2:])
+    
     return data
 
 
-def calculate_all_weekly_patterns(conn):
-    """计算所有交易对的所有周模式"""
+WEEKDAY_NAMES = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+# weekly_patterns 的写入列（与 calculate_pattern_for_week 写入的字段一致）
+WEEKLY_PATTERN_COLUMNS = (
+    ['symbol_id', 'week_start', 'week_end', 'year', 'month', 'week_of_year', 'pattern']
+    + [f'{day}_id' for day in WEEKDAY_NAMES]
+    + ['previous_sunday_id', 'monday_high', 'monday_low',
+       'previous_sunday_high', 'previous_sunday_low',
+       'monday_is_breakout_up', 'monday_is_breakout_down',
+       'monday_breakout_up_percent', 'monday_breakout_down_percent']
+    + [f'{day}_trend_detail' for day in WEEKDAY_NAMES]
+    + [f'{day}_breakout_{side}_percent' for day in WEEKDAY_NAMES[1:] for side in ('up', 'down')]
+)
+
+# 已存在的周只更新模式相关字段（与 calculate_pattern_for_week 的UPDATE一致）
+WEEKLY_PATTERN_UPDATE_COLUMNS = WEEKLY_PATTERN_COLUMNS[6:]
+
+# daily_patterns 的写入列（周模式按天展开）
+DAILY_PATTERN_COLUMNS = ['symbol_id', 'trade_date', 'week_start', 'year', 'day_of_week',
+                         'letter', 'trend_detail', 'breakout_up_percent', 'breakout_down_percent']
+
+
+def compute_daily_trends(daily):
+    """
+    计算每一天相对于前一天（trade_date - 1）的走势明细和突破幅度
+    
+    Args:
+        daily: 一个交易对的日数据 DataFrame，包含 id, trade_date, day_high, day_low
+    
+    Returns:
+        DataFrame: 以交易日期为索引，包含 id, high, low, prev_id, prev_high, prev_low,
+                   is_breakout_up, is_breakout_down, trend_detail,
+                   breakout_up_percent, breakout_down_percent；
+                   前一天没有数据时走势相关字段为空
+    """
+    days = pd.DataFrame({
+        'id': daily['id'].to_numpy(),
+        'high': daily['day_high'].to_numpy(dtype=float),
+        'low': daily['day_low'].to_numpy(dtype=float)
+    }, index=pd.to_datetime(daily['trade_date']).to_numpy())
+    
+    # 按日期取前一天（不是按行），中间缺失的日期不会与更早的一天比较
+    prev = days.reindex(days.index - pd.Timedelta(days=1))
+    days['prev_id'] = prev['id'].to_numpy()
+    days['prev_high'] = prev['high'].to_numpy()
+    days['prev_low'] = prev['low'].to_numpy()
+    
+    has_prev = days['prev_high'].notna().to_numpy()
+    is_up = (days['high'] > days['prev_high']).to_numpy()
+    is_down = (days['low'] < days['prev_low']).to_numpy()
+    
+    trend = np.select([is_up & is_down, is_up, is_down],
+                      ['同时向上和向下突破', '向上突破', '向下突破'], '在区间内').astype(object)
+    trend[~has_prev] = None
+    
+    days['is_breakout_up'] = is_up
+    days['is_breakout_down'] = is_down
+    days['trend_detail'] = trend
+    days['breakout_up_percent'] = np.where(
+        is_up, (days['high'] - days['prev_high']) / days['prev_high'] * 100, np.nan)
+    days['breakout_down_percent'] = np.where(
+        is_down, (days['prev_low'] - days['low']) / days['prev_low'] * 100, np.nan)
+    
+    return days
+
+
+def compute_weekly_patterns(daily):
+    """
+    一次性计算一个交易对所有周的7字母模式（与 calculate_pattern_for_week 结果相同）
+    
+    Args:
+        daily: 一个交易对的日数据 DataFrame，包含 id, trade_date, day_of_week, day_high, day_low
+    
+    Returns:
+        DataFrame: 每个可判断模式的周一行，列为 WEEKLY_PATTERN_COLUMNS（不含symbol_id）
+    """
+    days = compute_daily_trends(daily)
+    
+    # 有周一数据且有上周日数据的周
+    mondays = days.index[(daily['day_of_week'] == 0).to_numpy() & days['prev_id'].notna().to_numpy()]
+    
+    weeks = pd.DataFrame(index=mondays)
+    monday = days.loc[mondays]
+    
+    # 周一到周日按日期对齐到对应的周
+    for offset, day in enumerate(WEEKDAY_NAMES):
+        day_data = days.reindex(mondays + pd.Timedelta(days=offset))
+        weeks[f'{day}_id'] = day_data['id'].to_numpy()
+        weeks[f'{day}_trend_detail'] = day_data['trend_detail'].to_numpy()
+        if offset > 0:
+            weeks[f'{day}_breakout_up_percent'] = day_data['breakout_up_percent'].to_numpy()
+            weeks[f'{day}_breakout_down_percent'] = day_data['breakout_down_percent'].to_numpy()
+    
+    is_up = monday['is_breakout_up'].to_numpy()
+    is_down = monday['is_breakout_down'].to_numpy()
+    
+    week_start = mondays + pd.Timedelta(hours=WEEK_START_HOUR, minutes=WEEK_START_MINUTE)
+    week_end = week_start + pd.Timedelta(days=7) - pd.Timedelta(seconds=1)
+    
+    weeks['week_start'] = week_start.strftime('%Y-%m-%d %H:%M:%S')
+    weeks['week_end'] = week_end.strftime('%Y-%m-%d %H:%M:%S')
+    weeks['year'] = week_start.year
+    weeks['month'] = week_start.month
+    weeks['week_of_year'] = week_start.isocalendar().week.to_numpy()
+    weeks['pattern'] = np.where(is_up | is_down, 'XAMDXAM', 'AMDXAMD')
+    weeks['previous_sunday_id'] = monday['prev_id'].to_numpy()
+    weeks['monday_high'] = monday['high'].to_numpy()
+    weeks['monday_low'] = monday['low'].to_numpy()
+    weeks['previous_sunday_high'] = monday['prev_high'].to_numpy()
+    weeks['previous_sunday_low'] = monday['prev_low'].to_numpy()
+    weeks['monday_is_breakout_up'] = is_up.astype(int)
+    weeks['monday_is_breakout_down'] = is_down.astype(int)
+    weeks['monday_breakout_up_percent'] = monday['breakout_up_percent'].to_numpy()
+    weeks['monday_breakout_down_percent'] = monday['breakout_down_percent'].to_numpy()
+    
+    # ID列中有缺失值时保持整数类型
+    for column in [f'{day}_id' for day in WEEKDAY_NAMES] + ['previous_sunday_id']:
+        weeks[column] = weeks[column].astype('Int64')
+    
+    return weeks.reset_index(drop=True)[WEEKLY_PATTERN_COLUMNS[1:]]
+
+
+def explode_daily_patterns(patterns):
+    """
+    将周模式展开为每天一行，写入 daily_patterns
+    
+    报告按日期等值连接该表，不再需要按周范围连接 weekly_patterns 再用CASE取出当天的字母和走势
+    
+    Args:
+        patterns: 周模式 DataFrame（compute_weekly_patterns 的结果）
+    
+    Returns:
+        DataFrame: 按日期排序，列为 DAILY_PATTERN_COLUMNS（不含symbol_id）
+    """
+    mondays = pd.to_datetime(patterns['week_start']).dt.normalize()
+    frames = []
+    
+    for offset, day in enumerate(WEEKDAY_NAMES):
+        dates = mondays + pd.Timedelta(days=offset)
+        frames.append(pd.DataFrame({
+            'trade_date': dates.dt.strftime('%Y-%m-%d'),
+            'week_start': patterns['week_start'],
+            'year': dates.dt.year,
+            'day_of_week': offset,
+            'letter': patterns['pattern'].str[offset],
+            'trend_detail': patterns[f'{day}_trend_detail'],
+            'breakout_up_percent': patterns[f'{day}_breakout_up_percent'],
+            'breakout_down_percent': patterns[f'{day}_breakout_down_percent']
+        }))
+    
+    days = pd.concat(frames, ignore_index=True)
+    return days.sort_values('trade_date', kind='stable').reset_index(drop=True)[DAILY_PATTERN_COLUMNS[1:]]
+
+
+def backfill_daily_patterns(conn):
+    """
+    由已有的周模式补齐 daily_patterns（旧数据库迁移用）
+    
+    只处理已有周模式、但还没有日模式的交易对，重复运行不会重复写入
+    
+    Returns:
+        int: 补齐的日模式条数
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT DISTINCT symbol_id FROM weekly_patterns
+        EXCEPT
+        SELECT DISTINCT symbol_id FROM daily_patterns
+    """)
+    symbol_ids = [row[0] for row in cursor.fetchall()]
+    
+    total = 0
+    
+    with BatchWriter(conn) as writer:
+        for symbol_id in symbol_ids:
+            patterns = pd.read_sql_query(f"""
+                SELECT {', '.join(WEEKLY_PATTERN_COLUMNS[1:])}
+                FROM weekly_patterns
+                WHERE symbol_id = ?
+                ORDER BY week_start
+            """, conn, params=(symbol_id,))
+            
+            days = explode_daily_patterns(patterns)
+            days.insert(0, 'symbol_id', symbol_id)
+            days = days.astype(object).where(days.notna(), None)
+            writer.upsert('daily_patterns', DAILY_PATTERN_COLUMNS, days.itertuples(index=False, name=None),
+                          conflict_columns=['symbol_id', 'trade_date'],
+                          update_columns=DAILY_PATTERN_COLUMNS[2:])
+            total += len(days)
+    
+    return total
+
+
+def calculate_all_weekly_patterns(conn, full=False):
+    """
+    计算所有交易对的周模式
+    
+    每个交易对只读取一次日数据，所有周一次性计算，与按天展开的 daily_patterns
+    在一个工作单元内写入。默认只写入受变化日数据影响的周（包括以变化的周日作为
+    上周日的下一周），full=True 或该交易对还没有任何模式时全量重算
+    """
     cursor = conn.cursor()
     
     # 获取所有交易对
     cursor.execute("SELECT id, symbol FROM symbols WHERE is_active = 1")
     symbols = cursor.fetchall()
     
+    dirty_ids, dirty = get_dirty_ranges(conn, 'daily_data')
+    
+    # 周模式和日模式都已计算过的交易对才能增量重算
+    cursor.execute("""
+        SELECT DISTINCT symbol_id FROM weekly_patterns
+        INTERSECT
+        SELECT DISTINCT symbol_id FROM daily_patterns
+    """)
+    calculated = {row[0] for row in cursor.fetchall()}
+    
+    rows = []
+    day_rows = []
+    
     for symbol_id, symbol_name in symbols:
         print(f"\n处理交易对: {symbol_name}")
         print("-" * 40)
         
-        # 获取所有周一日期
-        mondays = get_week_mondays(conn, symbol_id)
+        symbol_full = full or symbol_id not in calculated
+        
+        # 先判断是否需要重算，日数据没有变化的交易对不读取日数据
+        if not symbol_full and symbol_id not in dirty:
+            print("  日数据没有变化，跳过")
+            continue
         
-        pattern_count = {'XAMDXAM': 0, 'AMDXAMD': 0}
+        daily = pd.read_sql_query("""
+            SELECT id, trade_date, day_of_week, day_high, day_low
+            FROM daily_data
+            WHERE symbol_id = ?
+            ORDER BY trade_date
+        """, conn, params=(symbol_id,))
         
-        for i, monday_date_str in enumerate(mondays):
-            if (i + 1) % 50 == 0:
-                print(f"  处理进度: {i + 1}/{len(mondays)} ({(i + 1) * 100 // len(mondays)}%)")
-            
-            result = calculate_pattern_for_week(symbol_id, monday_date_str, conn)
-            
-            if result:
-                pattern = result['pattern']
-                pattern_count[pattern] += 1
+        if daily.empty:
+            continue
+        
+        patterns = compute_weekly_patterns(daily)
+        
+        if not symbol_full:
+            # 只保留引用了有变化日数据的周（周一到周日及上周日）
+            dirty_day_ids = daily.loc[in_ranges(daily['trade_date'], dirty[symbol_id]), 'id']
+            day_columns = [f'{day}_id' for day in WEEKDAY_NAMES] + ['previous_sunday_id']
+            affected = patterns[day_columns].isin(dirty_day_ids.tolist()).any(axis=1)
+            patterns = patterns[affected]
+            print(f"  增量重算 {len(patterns)} 周")
+        
+        days = explode_daily_patterns(patterns)
+        days.insert(0, 'symbol_id', symbol_id)
+        patterns.insert(0, 'symbol_id', symbol_id)
+        
+        # 转换为Python原生类型，缺失值写入为NULL
+        patterns = patterns.astype(object).where(patterns.notna(), None)
+        rows.extend(patterns.itertuples(index=False, name=None))
+        days = days.astype(object).where(days.notna(), None)
+        day_rows.extend(days.itertuples(index=False, name=None))
+        
+        pattern_count = {'XAMDXAM': int((patterns['pattern'] == 'XAMDXAM').sum()),
+                         'AMDXAMD': int((patterns['pattern'] == 'AMDXAMD').sum())}
         
         total = sum(pattern_count.values())
-        if total > 0:
+        if total > 0 and symbol_full:
             print(f"\n  统计: XAMDXAM={pattern_count['XAMDXAM']} ({pattern_count['XAMDXAM']*100/total:.1f}%), "
                   f"AMDXAMD={pattern_count['AMDXAMD']} ({pattern_count['AMDXAMD']*100/total:.1f}%)")
+    
+    # 所有交易对的结果与已处理范围的删除在同一个工作单元内写入
+    with BatchWriter(conn) as writer:
+        writer.upsert('weekly_patterns', WEEKLY_PATTERN_COLUMNS, rows,
+                      conflict_columns=['symbol_id', 'week_start'],
+                      update_columns=WEEKLY_PATTERN_UPDATE_COLUMNS)
+        writer.upsert('daily_patterns', DAILY_PATTERN_COLUMNS, day_rows,
+                      conflict_columns=['symbol_id', 'trade_date'],
+                      update_columns=DAILY_PATTERN_COLUMNS[2:])
+        clear_dirty_ranges(conn, dirty_ids)
 
 
-def main():
-    """主函数"""
+def main(full=False):
+    """
+    主函数
+    
+    Args:
+        full: 是否全量重算所有周（默认只重算日数据有变化的周）
+    """
     print("=" * 60)
     print("周度模式计算程序")
     print("=" * 60)
     print(f"当前时间: {datetime.now(TZ_UTC9).strftime('%Y-%m-%d %H:%M:%S')} (UTC+9)")
     
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = connect()
     
     try:
-        calculate_all_weekly_patterns(conn)
+        calculate_all_weekly_patterns(conn, full=full)
         
         print("\n" + "=" * 60)
         print("周度模式计算完成!")
@@ -382,5 +654,12 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='计算周度7字母模式')
+    parser.add_argument('--full', action='store_true',
+                        help='全量重算所有周（默认只重算日数据有变化的周）')
+    
+    args = parser.parse_args()
+    main(full=args.full)
 
@@ -0,0 +1,304 @@
+"""
+图表绘制模块
+为PDF报告绘制各交易对的图表（matplotlib，Agg后端，在进程池中并行绘制）：
+- 模式频率：每个交易对各年份的 AMDX/XAMD 次数
+- 突破幅度：每个交易对每年各月的向上/向下突破幅度
+- 价格区间：每个交易对每年各月第一周与前一周的高低价区间
+
+图片缓存在 CHART_CACHE_DIR 中，文件名包含图表数据的哈希：
+数据未变化的图表直接使用缓存，只重新绘制数据有变化的图表
+"""
+
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import CHART_CACHE_DIR, CHART_FIGSIZE, CHART_DPI, REPORT_WORKERS
+from scripts.generate_reports import get_monthly_data, get_yearly_summary
+from scripts.export_json_api import to_columns
+from scripts.report_data import open_report_data
+
+import numpy as np
+import pandas as pd
+
+# 图表样式版本，绘图代码变化时递增，使所有缓存的图片失效
+CHART_VERSION = 1
+
+# 模式颜色（比Excel中的底色深，便于在图表中区分）
+PATTERN_COLORS = {
+    'AMDX': '#63BE7B',
+    'XAMD': '#F8696B',
+}
+RANGE_COLOR = '#A6A6A6'
+
+
+def chart_settings():
+    """
+    影响图表的设置（加入PDF报告的输入指纹）
+
+    Returns:
+        dict: 图表样式版本和尺寸，matplotlib 未安装（PDF中没有图表）时为None
+    """
+    try:
+        import matplotlib  # noqa: F401
+    except ImportError:
+        return None
+
+    return {'version': CHART_VERSION, 'figsize': list(CHART_FIGSIZE), 'dpi': CHART_DPI}
+
+
+def chart_spec(kind, symbol, year, title, columns):
+    """
+    创建图表描述
+
+    Args:
+        kind: 图表类型（RENDERERS 的键）
+        symbol: 交易对
+        year: 年份，按年份汇总的图表为None
+        title: 图表标题
+        columns: 绘图数据 {列名: Series}
+
+    Returns:
+        dict: 图表描述，path 为缓存图片路径（文件名包含数据哈希）
+    """
+    spec = {
+        'kind': kind,
+        'symbol': symbol,
+        'year': year,
+        'title': title,
+        'data': to_columns(pd.DataFrame(columns))
+    }
+
+    # 数据、标题、样式版本和图片尺寸任一变化都会得到新的哈希
+    key = json.dumps([CHART_VERSION, list(CHART_FIGSIZE), CHART_DPI, spec],
+                     ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+    name = f"{symbol}_{year or 'all'}_{digest}.png"
+    spec['path'] = os.path.join(CHART_CACHE_DIR, kind, name)
+
+    return spec
+
+
+def chart_specs(data):
+    """报告中所有图表的描述"""
+    monthly_df = get_monthly_data(data)
+    yearly_df = get_yearly_summary(data)
+    specs = []
+
+    for symbol, df in yearly_df.groupby('交易对', sort=True):
+        specs.append(chart_spec('pattern_frequency', symbol, None, f'{symbol} Pattern Frequency', {
+            'year': df['年份'],
+            'AMDX': df['AMDX次数'],
+            'XAMD': df['XAMD次数']
+        }))
+
+    for (symbol, year), df in monthly_df.groupby(['交易对', '年份'], sort=True):
+        year = int(year)
+
+        specs.append(chart_spec('breakout_magnitude', symbol, year, f'{symbol} {year} Breakout Magnitude', {
+            'month': df['月份'],
+            'up': df['向上突破幅度(%)'],
+            'down': df['向下突破幅度(%)']
+        }))
+
+        specs.append(chart_spec('price_range', symbol, year, f'{symbol} {year} First Week vs Previous Week Range', {
+            'month': df['月份'],
+            'pattern': df['模式'],
+            'first_high': df['第一周最高价'],
+            'first_low': df['第一周最低价'],
+            'previous_high': df['前一周最高价'],
+            'previous_low': df['前一周最低价']
+        }))
+
+    return specs
+
+
+def values(spec, column):
+    """绘图数据的一列（空值为nan）"""
+    return np.array(spec['data'][column], dtype=float)
+
+
+def draw_pattern_frequency(ax, spec):
+    """各年份 AMDX/XAMD 次数（堆叠柱状图）"""
+    years = spec['data']['year']
+    amdx = values(spec, 'AMDX')
+    xamd = values(spec, 'XAMD')
+
+    ax.bar(years, amdx, color=PATTERN_COLORS['AMDX'], label='AMDX')
+    ax.bar(years, xamd, bottom=amdx, color=PATTERN_COLORS['XAMD'], label='XAMD')
+    ax.set_xticks(years)
+    ax.set_xlabel('Year')
+    ax.set_ylabel('Months')
+    ax.legend(loc='upper left')
+
+
+def draw_breakout_magnitude(ax, spec):
+    """各月向上突破幅度（正）和向下突破幅度（负）"""
+    months = spec['data']['month']
+
+    ax.bar(months, values(spec, 'up'), color=PATTERN_COLORS['AMDX'], label='Breakout up')
+    ax.bar(months, -values(spec, 'down'), color=PATTERN_COLORS['XAMD'], label='Breakout down')
+    ax.axhline(0, color='black', linewidth=0.8)
+    ax.set_xticks(range(1, 13))
+    ax.set_xlabel('Month')
+    ax.set_ylabel('Breakout (%)')
+    ax.legend(loc='upper left')
+
+
+def draw_price_range(ax, spec):
+    """各月前一周（灰色）与第一周（按模式着色）的高低价区间"""
+    months = np.array(spec['data']['month'], dtype=float)
+    first_high, first_low = values(spec, 'first_high'), values(spec, 'first_low')
+    previous_high, previous_low = values(spec, 'previous_high'), values(spec, 'previous_low')
+    colors = [PATTERN_COLORS.get(pattern, RANGE_COLOR) for pattern in spec['data']['pattern']]
+
+    ax.bar(months - 0.2, previous_high - previous_low, bottom=previous_low, width=0.4,
+           color=RANGE_COLOR, label='Previous week')
+    ax.bar(months + 0.2, first_high - first_low, bottom=first_low, width=0.4,
+           color=colors, label='First week')
+    ax.set_xticks(range(1, 13))
+    ax.set_xlabel('Month')
+    ax.set_ylabel('Price')
+    ax.legend(loc='upper left')
+
+
+RENDERERS = {
+    'pattern_frequency': draw_pattern_frequency,
+    'breakout_magnitude': draw_breakout_magnitude,
+    'price_range': draw_price_range,
+}
+
+
+def render_chart(spec):
+    """
+    绘制一张图表并保存为PNG（在子进程中运行）
+
+    先写入临时文件再替换，其他进程不会读到写了一半的图片
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    path = spec['path']
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    fig, ax = plt.subplots(figsize=CHART_FIGSIZE)
+
+    try:
+        RENDERERS[spec['kind']](ax, spec)
+        ax.set_title(spec['title'])
+        ax.grid(axis='y', alpha=0.3)
+        fig.tight_layout()
+
+        tmp_path = f'{path}.tmp'
+        fig.savefig(tmp_path, dpi=CHART_DPI, format='png')
+        os.replace(tmp_path, path)
+    finally:
+        plt.close(fig)
+
+    return path
+
+
+def remove_stale_charts(keep):
+    """删除数据已变化（或交易对、年份已不存在）的旧图片"""
+    keep = {os.path.normpath(path) for path in keep}
+
+    for root, _, files in os.walk(CHART_CACHE_DIR, topdown=False):
+        for name in files:
+            path = os.path.normpath(os.path.join(root, name))
+            if path not in keep and name.endswith(('.png', '.tmp')):
+                os.remove(path)
+
+        if root != CHART_CACHE_DIR and not os.listdir(root):
+            os.rmdir(root)
+
+
+def generate_charts(data, workers=REPORT_WORKERS, force=False):
+    """
+    绘制报告图表，只绘制缓存中没有的图表
+
+    Args:
+        data: 报告数据层
+        workers: 进程数（1 表示在当前进程中依次绘制）
+        force: 忽略缓存，重新绘制所有图表
+
+    Returns:
+        dict: {(图表类型, 交易对, 年份): 图片路径}，matplotlib 不可用时为空
+    """
+    print("  绘制图表...")
+
+    try:
+        import matplotlib  # noqa: F401
+    except ImportError:
+        print("  警告: matplotlib未安装，PDF报告中不包含图表")
+        print("  请运行: pip install matplotlib")
+        return {}
+
+    specs = chart_specs(data)
+    pending = [spec for spec in specs if force or not os.path.exists(spec['path'])]
+    failed = 0
+
+    # 只有一张图表时不值得启动进程池
+    if workers <= 1 or len(pending) <= 1:
+        for spec in pending:
+            try:
+                render_chart(spec)
+            except Exception as e:
+                print(f"  图表绘制失败 {os.path.basename(spec['path'])}: {e}")
+                failed += 1
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+            futures = {executor.submit(render_chart, spec): spec for spec in pending}
+
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"  图表绘制失败 {os.path.basename(futures[future]['path'])}: {e}")
+                    failed += 1
+
+    remove_stale_charts(spec['path'] for spec in specs)
+
+    print(f"  图表: 共 {len(specs)} 张，重新绘制 {len(pending) - failed} 张，"
+          f"使用缓存 {len(specs) - len(pending)} 张")
+
+    return {
+        (spec['kind'], spec['symbol'], spec['year']): spec['path']
+        for spec in specs if os.path.exists(spec['path'])
+    }
+
+
+def main(data=None, force=False, workers=REPORT_WORKERS):
+    """
+    主函数
+
+    Args:
+        data: 共享的报告数据层，默认单独连接数据库
+        force: 忽略缓存，重新绘制所有图表
+        workers: 进程数
+    """
+    with open_report_data(data) as data:
+        try:
+            generate_charts(data, workers, force)
+        except Exception as e:
+            print(f"\n错误: {e}")
+            import traceback
+            traceback.print_exc()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='绘制PDF报告的图表（已缓存的图表不重新绘制）')
+    parser.add_argument('--force', action='store_true',
+                        help='忽略缓存，重新绘制所有图表')
+    parser.add_argument('--workers', type=int, default=REPORT_WORKERS,
+                        help=f'进程数（默认{REPORT_WORKERS}）')
+
+    args = parser.parse_args()
+    main(force=args.force, workers=args.workers)
@@ -0,0 +1,77 @@
+"""
+获取进度检查点模块
+记录每个交易对、每个K线周期已写入数据库的最后一根K线，
+回填中断后重新运行时从检查点继续，而不是从头开始
+"""
+
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+
+
+def get_checkpoint(conn, symbol_id, timeframe):
+    """
+    获取检查点
+
+    Returns:
+        dict: 包含 last_timestamp, range_start, range_end, status；不存在时返回None
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT last_timestamp, range_start, range_end, status
+        FROM fetch_checkpoints
+        WHERE symbol_id = ? AND timeframe = ?
+    """, (symbol_id, timeframe))
+    row = cursor.fetchone()
+
+    if not row:
+        return None
+
+    return {
+        'last_timestamp': row[0],
+        'range_start': row[1],
+        'range_end': row[2],
+        'status': row[3]
+    }
+
+
+def start_checkpoint(conn, symbol_id, timeframe, range_start, range_end, last_timestamp=None):
+    """
+    开始（或继续）一次获取，状态标记为running
+
+    Args:
+        range_start: 获取范围开始（Unix时间戳，秒）
+        range_end: 获取范围结束（Unix时间戳，秒）
+        last_timestamp: 继续中断的获取时，已写入的最后一根K线
+    """
+    conn.execute("""
+        INSERT INTO fetch_checkpoints
+        (symbol_id, timeframe, last_timestamp, range_start, range_end, status)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (symbol_id, timeframe) DO UPDATE SET
+            last_timestamp = excluded.last_timestamp,
+            range_start = excluded.range_start,
+            range_end = excluded.range_end,
+            status = excluded.status,
+            updated_at = CURRENT_TIMESTAMP
+    """, (symbol_id, timeframe, last_timestamp, int(range_start), int(range_end), STATUS_RUNNING))
+    conn.commit()
+
+
+def advance_checkpoint(conn, symbol_id, timeframe, last_timestamp):
+    """记录已写入数据库的最后一根K线"""
+    conn.execute("""
+        UPDATE fetch_checkpoints
+        SET last_timestamp = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE symbol_id = ? AND timeframe = ?
+    """, (int(last_timestamp), symbol_id, timeframe))
+    conn.commit()
+
+
+def finish_checkpoint(conn, symbol_id, timeframe):
+    """标记获取完成"""
+    conn.execute("""
+        UPDATE fetch_checkpoints
+        SET status = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE symbol_id = ? AND timeframe = ?
+    """, (STATUS_DONE, symbol_id, timeframe))
+    conn.commit()
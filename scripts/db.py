@@ -0,0 +1,59 @@
+"""
+数据库连接模块
+所有脚本通过 connect() 获取数据库连接，统一设置:
+WAL日志、内存映射、页缓存、临时表放内存、忙等待超时和外键检查。
+报告导出使用只读连接，WAL模式下可以与数据获取同时运行
+"""
+
+import os
+import sqlite3
+import sys
+from urllib.request import pathname2url
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DATABASE_PATH, DATABASE_TIMEOUT, DB_MMAP_SIZE, DB_CACHE_SIZE_KB
+
+
+def enable_wal(conn):
+    """
+    开启WAL日志模式，并将同步级别设为NORMAL
+
+    WAL模式下读写互不阻塞，NORMAL只在检查点时fsync，每次提交不再单独刷盘
+    （journal_mode 写入数据库文件，synchronous 只对当前连接有效）
+    """
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.OperationalError as e:
+        # 其他连接正在使用数据库时无法切换，保持原模式继续写入
+        print(f"  无法开启WAL模式: {e}")
+
+    conn.execute("PRAGMA synchronous=NORMAL")
+
+
+def connect(readonly=False, path=DATABASE_PATH, timeout=DATABASE_TIMEOUT):
+    """
+    打开数据库连接
+
+    Args:
+        readonly: 是否以只读方式打开（报告导出使用，不会获取写锁）
+        path: 数据库文件路径
+        timeout: 忙等待超时（秒）
+
+    Returns:
+        sqlite3.Connection: 数据库连接
+    """
+    if readonly:
+        uri = f"file:{pathname2url(os.path.abspath(path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=timeout)
+    else:
+        conn = sqlite3.connect(path, timeout=timeout)
+        enable_wal(conn)
+        conn.execute("PRAGMA foreign_keys=ON")
+
+    conn.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+    return conn
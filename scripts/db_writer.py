@@ -0,0 +1,264 @@
+"""
+数据库批量写入模块
+利用各数据表上的UNIQUE约束，以 INSERT ... ON CONFLICT DO UPDATE 批量写入，
+替代逐行的 SELECT + INSERT/UPDATE；BatchWriter 将多次写入合并到少量事务中提交
+"""
+
+import os
+import sys
+from itertools import islice
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DB_UPSERT_BATCH_SIZE, DB_TRANSACTION_SIZE
+from scripts.db import enable_wal
+
+
+# 单条语句的参数个数上限（SQLite 3.32 之前为999）
+SQLITE_MAX_VARIABLES = 999
+
+
+def build_upsert_sql(table, columns, conflict_columns, update_columns):
+    """
+    生成 INSERT ... ON CONFLICT DO UPDATE 语句
+
+    Args:
+        table: 表名
+        columns: 插入的列
+        conflict_columns: UNIQUE约束包含的列
+        update_columns: 冲突时需要更新的列（同时刷新updated_at）
+
+    Returns:
+        str: SQL语句
+    """
+    assignments = [f"{col} = excluded.{col}" for col in update_columns]
+    assignments.append("updated_at = CURRENT_TIMESTAMP")
+
+    return f"""
+        INSERT INTO {table} ({', '.join(columns)})
+        VALUES ({', '.join('?' for _ in columns)})
+        ON CONFLICT ({', '.join(conflict_columns)}) DO UPDATE SET
+            {', '.join(assignments)}
+    """
+
+
+# 各连接上正在进行的 BatchWriter（以连接的id为键），嵌套使用时加入外层事务
+_active_writers = {}
+
+
+class BatchWriter:
+    """
+    批量写入工作单元
+
+    将多次写入合并到少量事务中：写满 batch_size 行后提交并开始新事务，
+    正常退出时提交剩余数据，出错时回滚当前事务（已提交的批次都是完整的写入）。
+    在同一连接上嵌套使用时加入外层工作单元，由外层统一提交
+
+    用法:
+        with BatchWriter(conn) as writer:
+            writer.upsert('monthly_patterns', columns, rows, ...)
+            writer.execute("INSERT INTO update_logs ...", params)
+    """
+
+    def __init__(self, conn, batch_size=DB_TRANSACTION_SIZE, chunk_size=DB_UPSERT_BATCH_SIZE):
+        """
+        Args:
+            conn: 数据库连接
+            batch_size: 每个事务最多写入的行数（None 表示全部写入一个事务）
+            chunk_size: 每次 executemany 的行数
+        """
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.pending = 0
+        self.outer = None
+
+    def __enter__(self):
+        self.outer = _active_writers.get(id(self.conn))
+
+        if self.outer is None:
+            _active_writers[id(self.conn)] = self
+            # 已有未提交的写入时不能切换日志模式，这些写入随本工作单元一起提交
+            if not self.conn.in_transaction:
+                enable_wal(self.conn)
+                self.cursor.execute("BEGIN IMMEDIATE")
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.outer is not None:
+            return False
+
+        del _active_writers[id(self.conn)]
+
+        if exc_type is None:
+            self.conn.commit()
+        else:
+            self.conn.rollback()
+
+        return False
+
+    def _batch_full(self, count):
+        """再写入count行后是否写满一批（嵌套时由外层统计）"""
+        root = self.outer or self
+        return bool(root.batch_size) and root.pending + count >= root.batch_size
+
+    def _written(self, count):
+        """记录写入行数，写满一批时提交"""
+        root = self.outer or self
+        full = self._batch_full(count)
+        root.pending += count
+
+        if full:
+            root.commit()
+
+    def commit(self):
+        """提交当前事务并开始新事务"""
+        if self.outer is not None:
+            return
+
+        self.conn.commit()
+        self.cursor.execute("BEGIN IMMEDIATE")
+        self.pending = 0
+
+    def execute(self, sql, params=()):
+        """执行一条写入语句"""
+        self.cursor.execute(sql, params)
+        self._written(1)
+        return self.cursor
+
+    def executemany(self, sql, rows):
+        """分块执行批量写入语句"""
+        rows = iter(rows)
+
+        while True:
+            batch = list(islice(rows, self.chunk_size))
+            if not batch:
+                break
+            self.cursor.executemany(sql, batch)
+            self._written(len(batch))
+
+    def count_existing(self, table, key_columns, keys):
+        """
+        统计已存在于表中的键（按UNIQUE约束的列查找，只读取涉及的索引项，不扫描整张表）
+
+        Args:
+            table: 表名
+            key_columns: UNIQUE约束包含的列
+            keys: 不重复的键，每个键与key_columns一一对应
+        """
+        row = '(' + ', '.join('?' for _ in key_columns) + ')'
+        # 以键列表驱动连接，逐个键在UNIQUE索引上查找
+        join = ' AND '.join(f't.{col} = k.column{i}' for i, col in enumerate(key_columns, 1))
+        per_query = max(1, SQLITE_MAX_VARIABLES // len(key_columns))
+        existing = 0
+
+        for start in range(0, len(keys), per_query):
+            batch = keys[start:start + per_query]
+            self.cursor.execute(f"""
+                SELECT COUNT(*)
+                FROM (VALUES {', '.join([row] * len(batch))}) k
+                JOIN {table} t ON {join}
+            """, [value for key in batch for value in key])
+            existing += self.cursor.fetchone()[0]
+
+        return existing
+
+    def upsert(self, table, columns, rows, conflict_columns, update_columns):
+        """
+        批量写入数据（已存在则更新）
+
+        Returns:
+            tuple: (新增条数, 更新条数)
+        """
+        sql = build_upsert_sql(table, columns, conflict_columns, update_columns)
+        key_idx = [columns.index(col) for col in conflict_columns]
+        rows = iter(rows)
+        total = 0
+        added = 0
+
+        while True:
+            batch = list(islice(rows, self.chunk_size))
+            if not batch:
+                break
+
+            # 写入前统计本块中已存在的键，其余的键为新增（块内重复的键只算一次）；
+            # 事务以 BEGIN IMMEDIATE 开始，持有写锁期间统计的结果不受并发写入影响
+            keys = list(dict.fromkeys(tuple(row[i] for i in key_idx) for row in batch))
+            added += len(keys) - self.count_existing(table, conflict_columns, keys)
+
+            self.cursor.executemany(sql, batch)
+            total += len(batch)
+            self._written(len(batch))
+
+        return added, total - added
+
+
+def upsert_rows(conn, table, columns, rows, conflict_columns, update_columns,
+                batch_size=DB_UPSERT_BATCH_SIZE):
+    """
+    批量写入数据（已存在则更新），在 BatchWriter 工作单元内提交
+
+    Args:
+        conn: 数据库连接
+        table: 表名
+        columns: 插入的列
+        rows: 数据行（可迭代对象），每行与columns一一对应
+        conflict_columns: UNIQUE约束包含的列
+        update_columns: 冲突时需要更新的列
+        batch_size: 每次 executemany 的行数
+
+    Returns:
+        tuple: (新增条数, 更新条数)
+    """
+    with BatchWriter(conn, chunk_size=batch_size) as writer:
+        return writer.upsert(table, columns, rows, conflict_columns, update_columns)
+
+
+def filter_changed_rows(conn, table, columns, rows, key_columns, compare_columns):
+    """
+    与数据库中已有的数据比较，只保留新增或内容有变化的行
+
+    Args:
+        conn: 数据库连接
+        table: 表名
+        columns: 行中各列的列名
+        rows: 数据行
+        key_columns: UNIQUE约束的两列 (交易对列, 有序键列)，如 ['symbol_id', 'week_start']
+        compare_columns: 需要比较的列
+
+    Returns:
+        list: 新增或有变化的行
+    """
+    rows = list(rows)
+
+    if not rows:
+        return rows
+
+    key_idx = [columns.index(col) for col in key_columns]
+    compare_idx = [columns.index(col) for col in compare_columns]
+    group_column, order_column = key_columns
+
+    # 每个交易对只查询一次所涉及的键范围
+    key_ranges = {}
+    for row in rows:
+        group, key = row[key_idx[0]], row[key_idx[1]]
+        low, high = key_ranges.get(group, (key, key))
+        key_ranges[group] = (min(low, key), max(high, key))
+
+    cursor = conn.cursor()
+    existing = {}
+
+    for group, (low, high) in key_ranges.items():
+        cursor.execute(f"""
+            SELECT {', '.join(key_columns + compare_columns)}
+            FROM {table}
+            WHERE {group_column} = ? AND {order_column} BETWEEN ? AND ?
+        """, (group, low, high))
+
+        for record in cursor.fetchall():
+            existing[tuple(record[:2])] = tuple(record[2:])
+
+    return [row for row in rows
+            if existing.get(tuple(row[i] for i in key_idx)) != tuple(row[i] for i in compare_idx)]
@@ -0,0 +1,73 @@
+"""
+待重算数据范围模块
+获取程序记录新增或有变化的周/日数据范围，
+模式计算程序据此只重算受影响的月份/周，而不是重写全部历史
+"""
+
+
+def mark_dirty(conn, symbol_id, source_table, range_start, range_end):
+    """
+    记录一段有变化的数据（不提交，与数据写入在同一个事务内提交）
+
+    Args:
+        conn: 数据库连接
+        symbol_id: 交易对ID
+        source_table: 数据表（weekly_data / daily_data）
+        range_start: 变化数据的最小键（week_start 或 trade_date）
+        range_end: 变化数据的最大键
+    """
+    conn.execute("""
+        INSERT INTO dirty_ranges (symbol_id, source_table, range_start, range_end)
+        VALUES (?, ?, ?, ?)
+    """, (symbol_id, source_table, range_start, range_end))
+
+
+def get_dirty_ranges(conn, source_table):
+    """
+    获取待重算的数据范围
+
+    Returns:
+        tuple: (记录ID列表, {symbol_id: [(range_start, range_end), ...]})
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, symbol_id, range_start, range_end
+        FROM dirty_ranges
+        WHERE source_table = ?
+        ORDER BY id
+    """, (source_table,))
+
+    ids = []
+    ranges = {}
+
+    for range_id, symbol_id, range_start, range_end in cursor.fetchall():
+        ids.append(range_id)
+        ranges.setdefault(symbol_id, []).append((range_start, range_end))
+
+    return ids, ranges
+
+
+def clear_dirty_ranges(conn, ids):
+    """
+    删除已处理的范围（只删除读取时的记录，计算期间新增的记录留到下次处理）
+
+    不提交，与模式写入在同一个事务内提交，写入失败时范围保留到下次重算
+    """
+    conn.executemany("DELETE FROM dirty_ranges WHERE id = ?", [(range_id,) for range_id in ids])
+
+
+def in_ranges(values, ranges):
+    """
+    判断每个值是否落在任一范围内
+
+    Args:
+        values: pandas Series（字符串键，如 week_start / trade_date）
+        ranges: [(range_start, range_end), ...]
+
+    Returns:
+        pandas Series: 布尔掩码
+    """
+    mask = values != values  # 全为False
+    for range_start, range_end in ranges:
+        mask |= (values >= range_start) & (values <= range_end)
+    return mask
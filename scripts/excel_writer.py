@@ -0,0 +1,184 @@
+"""
+Excel 写入模块
+所有报告共用的工作表写入与样式：表头样式、数据单元格样式（居中、细边框、模式着色）、自动列宽
+
+安装了 xlsxwriter 时使用列格式和条件格式，不逐个单元格设置样式；
+否则使用 openpyxl，每种样式注册一次命名样式，单元格只引用样式名。
+列宽由 DataFrame 按列向量化计算字符串长度，不再逐个单元格测量
+"""
+
+import re
+import weakref
+
+import numpy as np
+import pandas as pd
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
+from openpyxl.styles.fonts import DEFAULT_FONT
+
+try:
+    import xlsxwriter  # noqa: F401
+    EXCEL_ENGINE = 'xlsxwriter'
+except ImportError:
+    EXCEL_ENGINE = 'openpyxl'
+
+# 月度模式颜色：AMDX用绿色，XAMD用红色
+MONTHLY_PATTERN_FILLS = {
+    'AMDX': 'C6EFCE',
+    'XAMD': 'FFC7CE',
+}
+
+# 周度模式颜色
+WEEKLY_PATTERN_FILLS = {
+    'XAMDXAM': 'FFC7CE',
+    'AMDXAMD': 'C6EFCE',
+}
+
+HEADER_COLOR = '4472C4'
+MAX_COLUMN_WIDTH = 50
+
+# 中文字符算2个宽度
+CJK_PATTERN = re.compile('[\u4e00-\u9fff]')
+
+# xlsxwriter 的格式对象需要由工作簿创建，每个工作簿只创建一次
+_xlsxwriter_formats = weakref.WeakKeyDictionary()
+
+
+def open_excel_writer(path):
+    """创建Excel写入器（优先使用 xlsxwriter）"""
+    return pd.ExcelWriter(path, engine=EXCEL_ENGINE)
+
+
+def column_widths(df):
+    """
+    计算各列列宽（表头和数据中最长的字符串，中文字符算2个宽度，最大50）
+
+    Returns:
+        list: 与 df.columns 一一对应的列宽
+    """
+    widths = []
+
+    for i, name in enumerate(df.columns):
+        values = df.iloc[:, i]
+        # 空值、0和空字符串不参与计算
+        values = values[values.notna()]
+        values = values[values.astype(bool)].astype(str)
+
+        header = str(name)
+        max_length = len(header) + len(CJK_PATTERN.findall(header))
+
+        if len(values):
+            lengths = values.str.len() + values.str.count(CJK_PATTERN.pattern)
+            max_length = max(max_length, int(lengths.max()))
+
+        widths.append(min(max_length + 2, MAX_COLUMN_WIDTH))
+
+    return widths
+
+
+def write_sheet(writer, df, sheet_name, fills=None):
+    """
+    写入工作表并设置样式
+
+    Args:
+        writer: open_excel_writer 创建的写入器
+        df: 数据
+        sheet_name: 工作表名称
+        fills: 需要着色的单元格值与颜色，如 MONTHLY_PATTERN_FILLS
+    """
+    df.to_excel(writer, sheet_name=sheet_name, index=False)
+    ws = writer.sheets[sheet_name]
+    fills = fills or {}
+
+    if writer.engine == 'xlsxwriter':
+        style_xlsxwriter_sheet(writer.book, ws, df, fills)
+    else:
+        style_openpyxl_sheet(writer.book, ws, df, fills)
+
+
+def style_xlsxwriter_sheet(book, ws, df, fills):
+    """用列格式和条件格式设置 xlsxwriter 工作表样式"""
+    formats = _xlsxwriter_formats.get(book)
+
+    if formats is None:
+        formats = {
+            'header': book.add_format({
+                'bold': True, 'font_color': '#FFFFFF', 'font_size': 11,
+                'bg_color': f'#{HEADER_COLOR}', 'align': 'center', 'valign': 'vcenter',
+                'text_wrap': True
+            }),
+            'data': book.add_format({'align': 'center', 'valign': 'vcenter'}),
+            'border': book.add_format({'border': 1}),
+            'fills': {}
+        }
+        _xlsxwriter_formats[book] = formats
+
+    for col, (name, width) in enumerate(zip(df.columns, column_widths(df))):
+        ws.write(0, col, name, formats['header'])
+        ws.set_column(col, col, width, formats['data'])
+
+    if df.empty:
+        return
+
+    last_row, last_col = len(df), len(df.columns) - 1
+
+    # 边框只加在有数据的区域
+    ws.conditional_format(1, 0, last_row, last_col, {
+        'type': 'formula', 'criteria': 'TRUE', 'format': formats['border']
+    })
+
+    for value, color in fills.items():
+        if color not in formats['fills']:
+            formats['fills'][color] = book.add_format({'bg_color': f'#{color}'})
+
+        ws.conditional_format(1, 0, last_row, last_col, {
+            'type': 'cell', 'criteria': '==', 'value': f'"{value}"',
+            'format': formats['fills'][color]
+        })
+
+
+def named_style(book, name, fill_color=None, header=False):
+    """获取（首次使用时注册）openpyxl 命名样式"""
+    if name in book.named_styles:
+        return name
+
+    style = NamedStyle(name=name)
+    style.alignment = Alignment(horizontal="center", vertical="center", wrap_text=header or None)
+
+    # 表头不加边框，数据单元格加细边框
+    if header:
+        style.font = Font(color="FFFFFF", bold=True, size=11)
+    else:
+        style.font = DEFAULT_FONT
+        thin = Side(style='thin')
+        style.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+
+    if fill_color:
+        style.fill = PatternFill(start_color=fill_color, end_color=fill_color, fill_type="solid")
+
+    book.add_named_style(style)
+    return name
+
+
+def style_openpyxl_sheet(book, ws, df, fills):
+    """用命名样式设置 openpyxl 工作表样式"""
+    header_style = named_style(book, 'amdx_header', HEADER_COLOR, header=True)
+    data_style = named_style(book, 'amdx_data')
+    n_cols = len(df.columns)
+
+    for cell in ws[1][:n_cols]:
+        cell.style = header_style
+
+    for row in ws.iter_rows(min_row=2, max_row=len(df) + 1, max_col=n_cols):
+        for cell in row:
+            cell.style = data_style
+
+    # 只有需要着色的单元格单独设置
+    for value, color in fills.items():
+        fill_style = named_style(book, f'amdx_data_{color}', color)
+        rows, cols = np.nonzero(df.isin([value]).to_numpy())
+
+        for row, col in zip(rows, cols):
+            ws.cell(row=row + 2, column=col + 1).style = fill_style
+
+    for cell, width in zip(ws[1][:n_cols], column_widths(df)):
+        ws.column_dimensions[cell.column_letter].width = width
@@ -3,7 +3,6 @@
 包含周数据、月度模式等完整数据
 """
 
-import sqlite3
 import os
 import sys
 from datetime import datetime
@@ -11,99 +10,15 @@ from datetime import datetime
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import DATABASE_PATH, REPORTS_DIR, TZ_UTC9
+from config import REPORTS_DIR, TZ_UTC9
+from scripts.excel_writer import open_excel_writer, write_sheet, MONTHLY_PATTERN_FILLS
+from scripts.report_data import open_report_data, monthly_pattern_letters, publish_latest
 
-import pandas as pd
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.utils.dataframe import dataframe_to_rows
 
 
-def style_excel_header(ws, row_num=1):
-    """设置Excel表头样式"""
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True, size=11)
-    header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    
-    for cell in ws[row_num]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = header_alignment
-
-
-def style_data_cells(ws, start_row=2):
-    """设置数据单元格样式"""
-    data_alignment = Alignment(horizontal="center", vertical="center")
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    amdx_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-    xamd_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-    
-    for row in ws.iter_rows(min_row=start_row, max_row=ws.max_row):
-        for cell in row:
-            cell.alignment = data_alignment
-            cell.border = thin_border
-            
-            if cell.value == 'AMDX':
-                cell.fill = amdx_fill
-            elif cell.value == 'XAMD':
-                cell.fill = xamd_fill
-
-
-def auto_adjust_column_width(ws):
-    """自动调整列宽"""
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        
-        for cell in column:
-            try:
-                if cell.value:
-                    cell_length = len(str(cell.value))
-                    for char in str(cell.value):
-                        if '\u4e00' <= char <= '\u9fff':
-                            cell_length += 1
-                    if cell_length > max_length:
-                        max_length = cell_length
-            except:
-                pass
-        
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-
-
-def get_xamd_from_monthly_pattern(pattern, week_of_month):
-    """
-    根据月度模式表的pattern字段和月内第几周
-    转换为X/A/M/D走势
-    
-    pattern是一个4字母字符串（XAMD或AMDX），每个字母对应月内第1-4周
-    例如：
-    - pattern='XAMD', week_of_month=1 -> 'X'
-    - pattern='XAMD', week_of_month=2 -> 'A'
-    - pattern='XAMD', week_of_month=3 -> 'M'
-    - pattern='XAMD', week_of_month=4 -> 'D'
-    - pattern='AMDX', week_of_month=1 -> 'A'
-    - pattern='AMDX', week_of_month=2 -> 'M'
-    - pattern='AMDX', week_of_month=3 -> 'D'
-    - pattern='AMDX', week_of_month=4 -> 'X'
-    """
-    if not pattern or len(pattern) != 4:
-        return ''
-    
-    # week_of_month是1-4，对应pattern的索引0-3
-    if 1 <= week_of_month <= 4:
-        return pattern[week_of_month - 1]
-    else:
-        return ''
-
-
-def export_all_data(conn):
+def export_all_data(data):
     """导出所有数据到Excel"""
     print("=" * 60)
     print("导出所有数据到Excel")
@@ -115,7 +30,7 @@ def export_all_data(conn):
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     excel_path = os.path.join(excel_dir, f'完整数据导出_{timestamp}.xlsx')
     
-    with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
+    with open_excel_writer(excel_path) as writer:
         # ========== 工作表1: 总体汇总 ==========
         print("生成工作表: 总体汇总...")
         query = """
@@ -132,12 +47,8 @@ def export_all_data(conn):
             JOIN symbols s ON mp.symbol_id = s.id
             GROUP BY s.symbol
         """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='总体汇总', index=False)
-        ws = writer.sheets['总体汇总']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        df = data.query(query)
+        write_sheet(writer, df, '总体汇总', MONTHLY_PATTERN_FILLS)
         
         # ========== 工作表2: 年度汇总 ==========
         print("生成工作表: 年度汇总...")
@@ -159,12 +70,8 @@ def export_all_data(conn):
             GROUP BY s.symbol, mp.year
             ORDER BY s.symbol, mp.year
         """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='年度汇总', index=False)
-        ws = writer.sheets['年度汇总']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        df = data.query(query)
+        write_sheet(writer, df, '年度汇总', MONTHLY_PATTERN_FILLS)
         
         # ========== 新增工作表: BTC月份分布统计 ==========
         print("生成工作表: BTC月份分布统计...")
@@ -182,12 +89,8 @@ def export_all_data(conn):
             GROUP BY mp.month
             ORDER BY mp.month
         """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='BTC月份分布统计', index=False)
-        ws = writer.sheets['BTC月份分布统计']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        df = data.query(query)
+        write_sheet(writer, df, 'BTC月份分布统计', MONTHLY_PATTERN_FILLS)
         
         # ========== 新增工作表: ETH月份分布统计 ==========
         print("生成工作表: ETH月份分布统计...")
@@ -205,16 +108,12 @@ def export_all_data(conn):
             GROUP BY mp.month
             ORDER BY mp.month
         """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='ETH月份分布统计', index=False)
-        ws = writer.sheets['ETH月份分布统计']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        df = data.query(query)
+        write_sheet(writer, df, 'ETH月份分布统计', MONTHLY_PATTERN_FILLS)
         
         # ========== 按交易对分别创建详细工作表 ==========
         symbols_query = "SELECT id, symbol FROM symbols WHERE is_active = 1"
-        symbols_df = pd.read_sql_query(symbols_query, conn)
+        symbols_df = data.query(symbols_query)
         
         # 先获取所有月度模式数据，用于映射
         monthly_patterns_query = """
@@ -225,7 +124,7 @@ def export_all_data(conn):
                 pattern
             FROM monthly_patterns
         """
-        monthly_patterns_df = pd.read_sql_query(monthly_patterns_query, conn)
+        monthly_patterns_df = data.query(monthly_patterns_query)
         
         for _, row in symbols_df.iterrows():
             symbol_id = row['id']
@@ -251,46 +150,16 @@ def export_all_data(conn):
                 WHERE symbol_id = ?
                 ORDER BY week_start
             """
-            df = pd.read_sql_query(query, conn, params=(symbol_id,))
+            df = data.query(query, (symbol_id,))
             
             # 根据月度模式表计算X/A/M/D走势
-            xamd_patterns = []
-            for idx, row_data in df.iterrows():
-                week_of_month = row_data['月内第几周']
-                year = row_data['年份']
-                month = row_data['月份']
-                
-                # 只处理月内第1-4周，第5周及以后显示为空
-                if week_of_month > 4:
-                    xamd_patterns.append('')
-                    continue
-                
-                # 从月度模式表中查找对应的模式
-                monthly_pattern = monthly_patterns_df[
-                    (monthly_patterns_df['symbol_id'] == symbol_id) &
-                    (monthly_patterns_df['year'] == year) &
-                    (monthly_patterns_df['month'] == month)
-                ]
-                
-                if len(monthly_pattern) > 0:
-                    mp_row = monthly_pattern.iloc[0]
-                    pattern = mp_row['pattern']
-                    
-                    # 根据月内第几周，从pattern字符串中取对应位置的字母
-                    xamd = get_xamd_from_monthly_pattern(pattern, week_of_month)
-                    xamd_patterns.append(xamd)
-                else:
-                    xamd_patterns.append('')  # 没有对应的月度模式数据
+            xamd_patterns = monthly_pattern_letters(df, monthly_patterns_df, symbol_id)
             
             # 插入X/A/M/D走势列（在"月内第几周"之后）
             df.insert(df.columns.get_loc('月内第几周') + 1, '走势', xamd_patterns)
             
             sheet_name = f"{symbol}_周数据"[:31]
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-            ws = writer.sheets[sheet_name]
-            style_excel_header(ws)
-            style_data_cells(ws)
-            auto_adjust_column_width(ws)
+            write_sheet(writer, df, sheet_name, MONTHLY_PATTERN_FILLS)
             
             print(f"生成工作表: {symbol}_月度模式...")
             # 月度模式
@@ -313,41 +182,37 @@ def export_all_data(conn):
                 WHERE symbol_id = ?
                 ORDER BY year, month
             """
-            df = pd.read_sql_query(query, conn, params=(symbol_id,))
+            df = data.query(query, (symbol_id,))
             sheet_name = f"{symbol}_月度模式"[:31]
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-            ws = writer.sheets[sheet_name]
-            style_excel_header(ws)
-            style_data_cells(ws)
-            auto_adjust_column_width(ws)
+            write_sheet(writer, df, sheet_name, MONTHLY_PATTERN_FILLS)
     
     print(f"\n完整数据导出完成: {excel_path}")
     
     # 同时保存最新版本
     latest_path = os.path.join(excel_dir, '完整数据导出_最新.xlsx')
-    import shutil
-    shutil.copy(excel_path, latest_path)
+    publish_latest(excel_path, latest_path)
     print(f"最新版本已保存: {latest_path}")
     
     return excel_path
 
 
-def main():
-    """主函数"""
-    conn = sqlite3.connect(DATABASE_PATH)
+def main(data=None):
+    """
+    主函数
     
-    try:
-        export_all_data(conn)
-        print("\n" + "=" * 60)
-        print("所有数据导出完成!")
-        print("=" * 60)
-    except Exception as e:
-        print(f"\n错误: {e}")
-        import traceback
-        traceback.print_exc()
-    finally:
-        conn.close()
-
+    Args:
+        data: 共享的报告数据层（由调用方传入时与其他报告共用查询结果），默认单独连接数据库
+    """
+    with open_report_data(data) as data:
+        try:
+            export_all_data(data)
+            print("\n" + "=" * 60)
+            print("所有数据导出完成!")
+            print("=" * 60)
+        except Exception as e:
+            print(f"\n错误: {e}")
+            import traceback
+            traceback.print_exc()
 
 if __name__ == '__main__':
     main()
@@ -3,362 +3,173 @@
 将月度模式分析和周度模式分析合并到同一个Excel文件
 """
 
-import sqlite3
 import os
 import sys
 from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import DATABASE_PATH, REPORTS_DIR, TZ_UTC9
+from config import REPORTS_DIR, TZ_UTC9
+from scripts.excel_writer import open_excel_writer, write_sheet, MONTHLY_PATTERN_FILLS, WEEKLY_PATTERN_FILLS
+from scripts.report_data import (
+    open_report_data, monthly_pattern_letters, input_fingerprint, report_is_current, save_fingerprint,
+    publish_latest
+)
 
 import pandas as pd
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 
+# 合并报告同时包含月度模式和周度模式
+PATTERN_FILLS = {**MONTHLY_PATTERN_FILLS, **WEEKLY_PATTERN_FILLS}
 
-def style_excel_header(ws, row_num=1):
-    """设置Excel表头样式"""
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True, size=11)
-    header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    
-    for cell in ws[row_num]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = header_alignment
-
-
-def style_data_cells(ws, start_row=2):
-    """设置数据单元格样式"""
-    data_alignment = Alignment(horizontal="center", vertical="center")
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # 月度模式颜色
-    amdx_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-    xamd_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-    
-    # 周度模式颜色
-    xamdxam_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-    amdxamd_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-    
-    for row in ws.iter_rows(min_row=start_row, max_row=ws.max_row):
-        for cell in row:
-            cell.alignment = data_alignment
-            cell.border = thin_border
-            
-            # 月度模式样式
-            if cell.value == 'AMDX':
-                cell.fill = amdx_fill
-            elif cell.value == 'XAMD':
-                cell.fill = xamd_fill
-            # 周度模式样式
-            elif cell.value == 'XAMDXAM':
-                cell.fill = xamdxam_fill
-            elif cell.value == 'AMDXAMD':
-                cell.fill = amdxamd_fill
-
-
-def auto_adjust_column_width(ws):
-    """自动调整列宽"""
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        
-        for cell in column:
-            try:
-                if cell.value:
-                    cell_length = len(str(cell.value))
-                    for char in str(cell.value):
-                        if '\u4e00' <= char <= '\u9fff':
-                            cell_length += 1
-                    if cell_length > max_length:
-                        max_length = cell_length
-            except:
-                pass
-        
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
+# 报告使用的数据表（输入指纹）
+REPORT_TABLES = ['symbols', 'weekly_data', 'daily_data', 'monthly_patterns', 'weekly_patterns', 'daily_patterns']
 
 
-def get_xamd_from_monthly_pattern(pattern_str, week_of_month):
-    """
-    根据月度模式表的pattern字符串和月内第几周
-    转换为X/A/M/D走势
-    """
-    if 1 <= week_of_month <= 4 and len(pattern_str) == 4:
-        return pattern_str[week_of_month - 1]
-    return ''
-
-
-def get_statistics_data(conn, symbol_name):
+def get_statistics_data(data, symbol_name):
     """获取统计数据"""
     query = """
         SELECT 
             dd.year as '年份',
-            CASE 
-                WHEN wp.pattern IS NULL THEN 'N/A'
-                WHEN dd.day_of_week = 0 THEN SUBSTR(wp.pattern, 1, 1)
-                WHEN dd.day_of_week = 1 THEN SUBSTR(wp.pattern, 2, 1)
-                WHEN dd.day_of_week = 2 THEN SUBSTR(wp.pattern, 3, 1)
-                WHEN dd.day_of_week = 3 THEN SUBSTR(wp.pattern, 4, 1)
-                WHEN dd.day_of_week = 4 THEN SUBSTR(wp.pattern, 5, 1)
-                WHEN dd.day_of_week = 5 THEN SUBSTR(wp.pattern, 6, 1)
-                WHEN dd.day_of_week = 6 THEN SUBSTR(wp.pattern, 7, 1)
-                ELSE 'N/A'
-            END as '周度模式',
-            CASE dd.day_of_week
-                WHEN 0 THEN COALESCE(wp.monday_trend_detail, 'N/A')
-                WHEN 1 THEN COALESCE(wp.tuesday_trend_detail, 'N/A')
-                WHEN 2 THEN COALESCE(wp.wednesday_trend_detail, 'N/A')
-                WHEN 3 THEN COALESCE(wp.thursday_trend_detail, 'N/A')
-                WHEN 4 THEN COALESCE(wp.friday_trend_detail, 'N/A')
-                WHEN 5 THEN COALESCE(wp.saturday_trend_detail, 'N/A')
-                WHEN 6 THEN COALESCE(wp.sunday_trend_detail, 'N/A')
-            END as '走势明细'
+            COALESCE(dp.letter, 'N/A') as '周度模式',
+            COALESCE(dp.trend_detail, 'N/A') as '走势明细'
         FROM daily_data dd
-        LEFT JOIN weekly_patterns wp ON (
-            dd.symbol_id = wp.symbol_id 
-            AND dd.trade_date >= DATE(wp.week_start) 
-            AND dd.trade_date < DATE(wp.week_start, '+7 days')
+        LEFT JOIN daily_patterns dp ON (
+            dp.symbol_id = dd.symbol_id
+            AND dp.trade_date = dd.trade_date
         )
         WHERE dd.symbol_id = (SELECT id FROM symbols WHERE symbol = ?)
-        AND wp.pattern IS NOT NULL
-        AND CASE 
-            WHEN dd.day_of_week = 0 THEN SUBSTR(wp.pattern, 1, 1)
-            WHEN dd.day_of_week = 1 THEN SUBSTR(wp.pattern, 2, 1)
-            WHEN dd.day_of_week = 2 THEN SUBSTR(wp.pattern, 3, 1)
-            WHEN dd.day_of_week = 3 THEN SUBSTR(wp.pattern, 4, 1)
-            WHEN dd.day_of_week = 4 THEN SUBSTR(wp.pattern, 5, 1)
-            WHEN dd.day_of_week = 5 THEN SUBSTR(wp.pattern, 6, 1)
-            WHEN dd.day_of_week = 6 THEN SUBSTR(wp.pattern, 7, 1)
-        END IN ('A', 'M', 'D', 'X')
+        AND dp.letter IN ('A', 'M', 'D', 'X')
         ORDER BY dd.year, dd.trade_date
     """
     
-    df = pd.read_sql_query(query, conn, params=(symbol_name,))
+    df = data.query(query, (symbol_name,))
     return df
 
 
-def get_daily_data_with_pattern(conn, symbol_name):
+def get_daily_data_with_pattern(data, symbol_name):
     """获取日数据，包含日期、周度模式、走势明细、年份"""
     query = """
         SELECT 
             dd.trade_date as '日期',
             dd.year as '年份',
-            CASE 
-                WHEN wp.pattern IS NULL THEN 'N/A'
-                WHEN dd.day_of_week = 0 THEN SUBSTR(wp.pattern, 1, 1)
-                WHEN dd.day_of_week = 1 THEN SUBSTR(wp.pattern, 2, 1)
-                WHEN dd.day_of_week = 2 THEN SUBSTR(wp.pattern, 3, 1)
-                WHEN dd.day_of_week = 3 THEN SUBSTR(wp.pattern, 4, 1)
-                WHEN dd.day_of_week = 4 THEN SUBSTR(wp.pattern, 5, 1)
-                WHEN dd.day_of_week = 5 THEN SUBSTR(wp.pattern, 6, 1)
-                WHEN dd.day_of_week = 6 THEN SUBSTR(wp.pattern, 7, 1)
-                ELSE 'N/A'
-            END as '周度模式',
-            CASE dd.day_of_week
-                WHEN 0 THEN COALESCE(wp.monday_trend_detail, 'N/A')
-                WHEN 1 THEN COALESCE(wp.tuesday_trend_detail, 'N/A')
-                WHEN 2 THEN COALESCE(wp.wednesday_trend_detail, 'N/A')
-                WHEN 3 THEN COALESCE(wp.thursday_trend_detail, 'N/A')
-                WHEN 4 THEN COALESCE(wp.friday_trend_detail, 'N/A')
-                WHEN 5 THEN COALESCE(wp.saturday_trend_detail, 'N/A')
-                WHEN 6 THEN COALESCE(wp.sunday_trend_detail, 'N/A')
-            END as '走势明细'
+            COALESCE(dp.letter, 'N/A') as '周度模式',
+            COALESCE(dp.trend_detail, 'N/A') as '走势明细'
         FROM daily_data dd
-        LEFT JOIN weekly_patterns wp ON (
-            dd.symbol_id = wp.symbol_id 
-            AND dd.trade_date >= DATE(wp.week_start) 
-            AND dd.trade_date < DATE(wp.week_start, '+7 days')
+        LEFT JOIN daily_patterns dp ON (
+            dp.symbol_id = dd.symbol_id
+            AND dp.trade_date = dd.trade_date
         )
         WHERE dd.symbol_id = (SELECT id FROM symbols WHERE symbol = ?)
-        AND wp.pattern IS NOT NULL
+        AND dp.letter IS NOT NULL
         ORDER BY dd.trade_date
     """
     
-    df = pd.read_sql_query(query, conn, params=(symbol_name,))
+    df = data.query(query, (symbol_name,))
     df['日期'] = pd.to_datetime(df['日期'])
     return df
 
 
-def calculate_consecutive_stats(df):
-    """计算连续2天的统计"""
-    from datetime import timedelta
+# 连续2天统计的分类：统计键 -> (前一天模式, 后一天模式, {明细键: (前一天走势, 后一天走势)})
+CONSECUTIVE_STAT_CATEGORIES = {
+    # D和X连续2天，都是"向上突破"
+    'D_X_向上突破': ('D', 'X', {
+        'D上_X上': ('向上突破', '向上突破')             # D为[向上突破]时，X为[向上突破]
+    }),
+    # D和X连续2天，都是"向下突破"
+    'D_X_向下突破': ('D', 'X', {
+        'D下_X下': ('向下突破', '向下突破')             # D为[向下突破]时，X为[向下突破]
+    }),
+    # D→X连续反方向
+    'D_X_反方向': ('D', 'X', {
+        'D上_X下': ('向上突破', '向下突破'),            # D为[向上突破]时，X为[向下突破]
+        'D上_X区间': ('向上突破', '在区间内'),          # D为[向上突破]时，X为[在区间内]
+        'D下_X上': ('向下突破', '向上突破'),            # D为[向下突破]时，X为[向上突破]
+        'D下_X区间': ('向下突破', '在区间内')           # D为[向下突破]时，X为[在区间内]
+    }),
+    # D弱→X强
+    'D弱_X强': ('D', 'X', {
+        'D区间_X上': ('在区间内', '向上突破'),          # D为[在区间内]时，X为[向上突破]
+        'D区间_X下': ('在区间内', '向下突破')           # D为[在区间内]时，X为[向下突破]
+    }),
+    # X→A连续，A为"在区间内"
+    'X_A_在区间内': ('X', 'A', {
+        'X上_A区间': ('向上突破', '在区间内'),          # X为"向上突破"时，A为"在区间内"
+        'X下_A区间': ('向下突破', '在区间内'),          # X为"向下突破"时，A为"在区间内"
+        'X双_A区间': ('同时向上和向下突破', '在区间内')  # X为"同时向上和向下突破"时，A为"在区间内"
+    }),
+    # X弱→A强
+    'X弱_A强': ('X', 'A', {
+        'X上_A双': ('向上突破', '同时向上和向下突破'),  # X为[向上突破]时，A为[同时向上和向下突破]
+        'X下_A双': ('向下突破', '同时向上和向下突破')   # X为[向下突破]时，A为[同时向上和向下突破]
+    })
+}
+
+
+def calculate_transition_matrix(df):
+    """
+    统计所有连续2天的 (模式, 走势) → (次日模式, 次日走势) 转移次数
     
-    # 初始化统计字典（基础统计）
-    stats = {
-        'D_X_向上突破': {},      # D和X连续2天，都是"向上突破"
-        'D_X_向下突破': {},      # D和X连续2天，都是"向下突破"
-        'D_X_反方向': {},        # D→X连续反方向统计
-        'D弱_X强': {},           # D弱→X强方向统计
-        'X_A_在区间内': {},      # X→A连续，A为"在区间内"
-        'X弱_A强': {}            # X弱→A强方向统计
-    }
+    将数据整体错开一天与次日对齐，去掉日期不连续的相邻行后一次分组计数
     
-    # 初始化详细统计字典
-    detailed_stats = {
-        # D→X连续（同方向）
-        'D上_X上': {},           # D为[向上突破]时，X为[向上突破]
-        'D下_X下': {},           # D为[向下突破]时，X为[向下突破]
-        
-        # D→X连续反方向
-        'D上_X下': {},           # D为[向上突破]时，X为[向下突破]
-        'D上_X区间': {},         # D为[向上突破]时，X为[在区间内]
-        'D下_X上': {},           # D为[向下突破]时，X为[向上突破]
-        'D下_X区间': {},         # D为[向下突破]时，X为[在区间内]
-        
-        # D弱→X强
-        'D区间_X上': {},         # D为[在区间内]时，X为[向上突破]
-        'D区间_X下': {},         # D为[在区间内]时，X为[向下突破]
-        
-        # X→A连续
-        'X上_A区间': {},         # X为"向上突破"时，A为"在区间内"
-        'X下_A区间': {},         # X为"向下突破"时，A为"在区间内"
-        'X双_A区间': {},         # X为"同时向上和向下突破"时，A为"在区间内"
-        
-        # X弱→A强
-        'X上_A双': {},           # X为[向上突破]时，A为[同时向上和向下突破]
-        'X下_A双': {}            # X为[向下突破]时，A为[同时向上和向下突破]
-    }
+    Args:
+        df: 日数据，包含 日期、年份、周度模式、走势明细
     
-    # 按日期排序
+    Returns:
+        Series: 索引为 (年份, 周度模式, 走势明细, 次日模式, 次日走势) 的转移次数
+    """
     df_sorted = df.sort_values('日期').reset_index(drop=True)
+    tomorrow = df_sorted.shift(-1)
     
-    # 遍历所有相邻的两天
-    for i in range(len(df_sorted) - 1):
-        today = df_sorted.iloc[i]
-        tomorrow = df_sorted.iloc[i + 1]
-        
-        # 检查是否连续（相差1天）
-        if (tomorrow['日期'] - today['日期']).days != 1:
-            continue
-        
-        year = today['年份']
-        today_pattern = today['周度模式']
-        today_trend = today['走势明细']
-        tomorrow_pattern = tomorrow['周度模式']
-        tomorrow_trend = tomorrow['走势明细']
-        
-        # 统计1: D和X连续2天，都是"向上突破"
-        if today_pattern == 'D' and tomorrow_pattern == 'X':
-            if today_trend == '向上突破' and tomorrow_trend == '向上突破':
-                if year not in stats['D_X_向上突破']:
-                    stats['D_X_向上突破'][year] = 0
-                stats['D_X_向上突破'][year] += 1
-                # 详细统计
-                if year not in detailed_stats['D上_X上']:
-                    detailed_stats['D上_X上'][year] = 0
-                detailed_stats['D上_X上'][year] += 1
-        
-        # 统计2: D和X连续2天，都是"向下突破"
-        if today_pattern == 'D' and tomorrow_pattern == 'X':
-            if today_trend == '向下突破' and tomorrow_trend == '向下突破':
-                if year not in stats['D_X_向下突破']:
-                    stats['D_X_向下突破'][year] = 0
-                stats['D_X_向下突破'][year] += 1
-                # 详细统计
-                if year not in detailed_stats['D下_X下']:
-                    detailed_stats['D下_X下'][year] = 0
-                detailed_stats['D下_X下'][year] += 1
-        
-        # 统计3: D→X连续反方向统计（详细分类）
-        if today_pattern == 'D' and tomorrow_pattern == 'X':
-            if today_trend == '向上突破' and tomorrow_trend == '向下突破':
-                if year not in stats['D_X_反方向']:
-                    stats['D_X_反方向'][year] = 0
-                stats['D_X_反方向'][year] += 1
-                if year not in detailed_stats['D上_X下']:
-                    detailed_stats['D上_X下'][year] = 0
-                detailed_stats['D上_X下'][year] += 1
-            elif today_trend == '向上突破' and tomorrow_trend == '在区间内':
-                if year not in stats['D_X_反方向']:
-                    stats['D_X_反方向'][year] = 0
-                stats['D_X_反方向'][year] += 1
-                if year not in detailed_stats['D上_X区间']:
-                    detailed_stats['D上_X区间'][year] = 0
-                detailed_stats['D上_X区间'][year] += 1
-            elif today_trend == '向下突破' and tomorrow_trend == '向上突破':
-                if year not in stats['D_X_反方向']:
-                    stats['D_X_反方向'][year] = 0
-                stats['D_X_反方向'][year] += 1
-                if year not in detailed_stats['D下_X上']:
-                    detailed_stats['D下_X上'][year] = 0
-                detailed_stats['D下_X上'][year] += 1
-            elif today_trend == '向下突破' and tomorrow_trend == '在区间内':
-                if year not in stats['D_X_反方向']:
-                    stats['D_X_反方向'][year] = 0
-                stats['D_X_反方向'][year] += 1
-                if year not in detailed_stats['D下_X区间']:
-                    detailed_stats['D下_X区间'][year] = 0
-                detailed_stats['D下_X区间'][year] += 1
-        
-        # 统计4: D弱→X强方向统计（详细分类）
-        if today_pattern == 'D' and tomorrow_pattern == 'X':
-            if today_trend == '在区间内' and tomorrow_trend == '向上突破':
-                if year not in stats['D弱_X强']:
-                    stats['D弱_X强'][year] = 0
-                stats['D弱_X强'][year] += 1
-                if year not in detailed_stats['D区间_X上']:
-                    detailed_stats['D区间_X上'][year] = 0
-                detailed_stats['D区间_X上'][year] += 1
-            elif today_trend == '在区间内' and tomorrow_trend == '向下突破':
-                if year not in stats['D弱_X强']:
-                    stats['D弱_X强'][year] = 0
-                stats['D弱_X强'][year] += 1
-                if year not in detailed_stats['D区间_X下']:
-                    detailed_stats['D区间_X下'][year] = 0
-                detailed_stats['D区间_X下'][year] += 1
+    # 只统计相差1天的相邻两天
+    consecutive = (tomorrow['日期'] - df_sorted['日期']) == pd.Timedelta(days=1)
+    
+    pairs = pd.DataFrame({
+        '年份': df_sorted['年份'],
+        '周度模式': df_sorted['周度模式'],
+        '走势明细': df_sorted['走势明细'],
+        '次日模式': tomorrow['周度模式'],
+        '次日走势': tomorrow['走势明细']
+    })[consecutive]
+    
+    return pairs.groupby(list(pairs.columns), sort=True).size()
+
+
+def calculate_consecutive_stats(df):
+    """
+    计算连续2天的统计
+    
+    各统计项是转移矩阵的切片（见 CONSECUTIVE_STAT_CATEGORIES）
+    
+    Returns:
+        tuple: (基础统计, 详细统计)，均为 {统计键: {年份: 次数}}
+    """
+    matrix = calculate_transition_matrix(df)
+    
+    # 按 (模式, 走势, 次日模式, 次日走势) 分组，组内为各年份的次数
+    transitions = {key: counts.droplevel([1, 2, 3, 4])
+                   for key, counts in matrix.groupby(level=[1, 2, 3, 4])}
+    
+    stats = {}
+    detailed_stats = {}
+    
+    for stat_key, (today_pattern, tomorrow_pattern, details) in CONSECUTIVE_STAT_CATEGORIES.items():
+        stats[stat_key] = {}
         
-        # 统计5: X→A连续（详细分类）
-        if today_pattern == 'X' and tomorrow_pattern == 'A':
-            if today_trend == '向上突破' and tomorrow_trend == '在区间内':
-                if year not in stats['X_A_在区间内']:
-                    stats['X_A_在区间内'][year] = 0
-                stats['X_A_在区间内'][year] += 1
-                if year not in detailed_stats['X上_A区间']:
-                    detailed_stats['X上_A区间'][year] = 0
-                detailed_stats['X上_A区间'][year] += 1
-            elif today_trend == '向下突破' and tomorrow_trend == '在区间内':
-                if year not in stats['X_A_在区间内']:
-                    stats['X_A_在区间内'][year] = 0
-                stats['X_A_在区间内'][year] += 1
-                if year not in detailed_stats['X下_A区间']:
-                    detailed_stats['X下_A区间'][year] = 0
-                detailed_stats['X下_A区间'][year] += 1
-            elif today_trend == '同时向上和向下突破' and tomorrow_trend == '在区间内':
-                if year not in stats['X_A_在区间内']:
-                    stats['X_A_在区间内'][year] = 0
-                stats['X_A_在区间内'][year] += 1
-                if year not in detailed_stats['X双_A区间']:
-                    detailed_stats['X双_A区间'][year] = 0
-                detailed_stats['X双_A区间'][year] += 1
+        for detail_key, (today_trend, tomorrow_trend) in details.items():
+            counts = transitions.get((today_pattern, today_trend, tomorrow_pattern, tomorrow_trend))
+            detailed_stats[detail_key] = {} if counts is None else {
+                int(year): int(count) for year, count in counts.items()
+            }
+            
+            for year, count in detailed_stats[detail_key].items():
+                stats[stat_key][year] = stats[stat_key].get(year, 0) + count
         
-        # 统计6: X弱→A强方向统计（详细分类）
-        if today_pattern == 'X' and tomorrow_pattern == 'A':
-            if today_trend == '向上突破' and tomorrow_trend == '同时向上和向下突破':
-                if year not in stats['X弱_A强']:
-                    stats['X弱_A强'][year] = 0
-                stats['X弱_A强'][year] += 1
-                if year not in detailed_stats['X上_A双']:
-                    detailed_stats['X上_A双'][year] = 0
-                detailed_stats['X上_A双'][year] += 1
-            elif today_trend == '向下突破' and tomorrow_trend == '同时向上和向下突破':
-                if year not in stats['X弱_A强']:
-                    stats['X弱_A强'][year] = 0
-                stats['X弱_A强'][year] += 1
-                if year not in detailed_stats['X下_A双']:
-                    detailed_stats['X下_A双'][year] = 0
-                detailed_stats['X下_A双'][year] += 1
+        stats[stat_key] = dict(sorted(stats[stat_key].items()))
     
     return stats, detailed_stats
 
 
-def create_statistics_sheets(conn, writer):
+def create_statistics_sheets(data, writer):
     """创建统计工作表"""
     print("\n【日统计】")
     
@@ -372,14 +183,14 @@ def create_statistics_sheets(conn, writer):
         print(f"生成工作表: {symbol_name}_日统计...")
         
         # 获取基础统计数据
-        df = get_statistics_data(conn, symbol_name)
+        df = get_statistics_data(data, symbol_name)
         
         if df.empty:
             print(f"  {symbol_name} 没有数据")
             continue
         
         # 获取日数据用于连续统计
-        df_daily = get_daily_data_with_pattern(conn, symbol_name)
+        df_daily = get_daily_data_with_pattern(data, symbol_name)
         consecutive_stats, detailed_stats = calculate_consecutive_stats(df_daily)
         
         # 创建统计表
@@ -511,14 +322,10 @@ def create_statistics_sheets(conn, writer):
         
         # 写入Excel
         sheet_name = f'{symbol_name}_日统计'
-        stats_df.to_excel(writer, sheet_name=sheet_name, index=False)
-        ws = writer.sheets[sheet_name]
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        write_sheet(writer, stats_df, sheet_name, PATTERN_FILLS)
 
 
-def create_detailed_consecutive_stats_sheets(conn, writer):
+def create_detailed_consecutive_stats_sheets(data, writer):
     """创建详细连续统计工作表"""
     print("\n【连续统计详细】")
     
@@ -530,7 +337,7 @@ def create_detailed_consecutive_stats_sheets(conn, writer):
         print(f"生成工作表: {symbol_name}_连续统计详细...")
         
         # 获取日数据用于连续统计
-        df_daily = get_daily_data_with_pattern(conn, symbol_name)
+        df_daily = get_daily_data_with_pattern(data, symbol_name)
         if df_daily.empty:
             print(f"  {symbol_name} 没有数据")
             continue
@@ -748,26 +555,61 @@ def create_detailed_consecutive_stats_sheets(conn, writer):
         
         # 写入Excel
         sheet_name = f'{symbol_name}_连续统计详细'
-        stats_df.to_excel(writer, sheet_name=sheet_name, index=False)
-        ws = writer.sheets[sheet_name]
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        write_sheet(writer, stats_df, sheet_name, PATTERN_FILLS)
+
+
+def combined_report_path():
+    """合并报告最新版本的路径"""
+    return os.path.join(REPORTS_DIR, 'excel', '完整分析报告_最新.xlsx')
+
+
+def combined_report_tables(data):
+    """
+    合并报告实际使用的数据表
+
+    还没有迁移的旧数据库没有 daily_patterns，此时不生成依赖日模式的工作表；
+    迁移后指纹中多出该表，报告会重新生成
+    """
+    return [table for table in REPORT_TABLES if table != 'daily_patterns' or data.has_table(table)]
 
 
-def export_combined_report(conn):
-    """导出合并报告（月度模式 + 周度模式）"""
+def combined_report_is_current(data):
+    """合并报告的输入数据与上次生成时相同"""
+    return report_is_current(combined_report_path(), input_fingerprint(data, combined_report_tables(data)))
+
+
+def export_combined_report(data, force=False):
+    """
+    导出合并报告（月度模式 + 周度模式）
+    
+    Args:
+        data: 报告数据层
+        force: 输入数据未变化时也重新生成
+    """
     print("=" * 60)
     print("导出合并报告（月度模式 + 周度模式）")
     print("=" * 60)
     
+    if not force and combined_report_is_current(data):
+        print("输入数据与上次生成时相同，跳过合并报告")
+        return None
+    
     excel_dir = os.path.join(REPORTS_DIR, 'excel')
+    latest_path = combined_report_path()
+    tables = combined_report_tables(data)
+    fingerprint = input_fingerprint(data, tables)
+    has_daily_patterns = 'daily_patterns' in tables
+    
+    if not has_daily_patterns:
+        print("警告: 数据库中没有 daily_patterns 表，跳过日数据、日统计和连续统计工作表")
+        print("  请运行: python scripts/init_database.py")
+    
     os.makedirs(excel_dir, exist_ok=True)
     
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     excel_path = os.path.join(excel_dir, f'完整分析报告_{timestamp}.xlsx')
     
-    with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
+    with open_excel_writer(excel_path) as writer:
         # ==================== 第一部分：月度模式分析 ====================
         print("\n【月度模式分析】")
         
@@ -787,12 +629,8 @@ def export_combined_report(conn):
             JOIN symbols s ON mp.symbol_id = s.id
             GROUP BY s.symbol
         """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='月度模式_总体汇总', index=False)
-        ws = writer.sheets['月度模式_总体汇总']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        df = data.query(query)
+        write_sheet(writer, df, '月度模式_总体汇总', PATTERN_FILLS)
         
         # 工作表2: 月度模式_年度汇总
         print("生成工作表: 月度模式_年度汇总...")
@@ -814,12 +652,8 @@ def export_combined_report(conn):
             GROUP BY s.symbol, mp.year
             ORDER BY s.symbol, mp.year
         """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='月度模式_年度汇总', index=False)
-        ws = writer.sheets['月度模式_年度汇总']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        df = data.query(query)
+        write_sheet(writer, df, '月度模式_年度汇总', PATTERN_FILLS)
         
         # 工作表3: BTC月份分布统计
         print("生成工作表: BTC月份分布统计...")
@@ -837,12 +671,8 @@ def export_combined_report(conn):
             GROUP BY mp.month
             ORDER BY mp.month
         """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='BTC月份分布统计', index=False)
-        ws = writer.sheets['BTC月份分布统计']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        df = data.query(query)
+        write_sheet(writer, df, 'BTC月份分布统计', PATTERN_FILLS)
         
         # 工作表4: ETH月份分布统计
         print("生成工作表: ETH月份分布统计...")
@@ -860,16 +690,12 @@ def export_combined_report(conn):
             GROUP BY mp.month
             ORDER BY mp.month
         """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='ETH月份分布统计', index=False)
-        ws = writer.sheets['ETH月份分布统计']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        df = data.query(query)
+        write_sheet(writer, df, 'ETH月份分布统计', PATTERN_FILLS)
         
         # 工作表5-6: BTCUSDT_周数据 和 ETHUSDT_周数据（带走势列）
         symbols_query = "SELECT id, symbol FROM symbols WHERE is_active = 1"
-        symbols_df = pd.read_sql_query(symbols_query, conn)
+        symbols_df = data.query(symbols_query)
         
         monthly_patterns_query = """
             SELECT 
@@ -879,7 +705,7 @@ def export_combined_report(conn):
                 pattern
             FROM monthly_patterns
         """
-        monthly_patterns_df = pd.read_sql_query(monthly_patterns_query, conn)
+        monthly_patterns_df = data.query(monthly_patterns_query)
         
         for _, row in symbols_df.iterrows():
             symbol_id = row['id']
@@ -904,34 +730,13 @@ def export_combined_report(conn):
                 WHERE symbol_id = ?
                 ORDER BY week_start
             """
-            df = pd.read_sql_query(query, conn, params=(symbol_id,))
+            df = data.query(query, (symbol_id,))
             
             # 根据月度模式表计算X/A/M/D走势
-            xamd_patterns = []
-            for idx, row_data in df.iterrows():
-                week_of_month = row_data['月内第几周']
-                year = row_data['年份']
-                month = row_data['月份']
-                if 1 <= week_of_month <= 4:
-                    monthly_pattern = monthly_patterns_df[
-                        (monthly_patterns_df['symbol_id'] == symbol_id) &
-                        (monthly_patterns_df['year'] == year) &
-                        (monthly_patterns_df['month'] == month)
-                    ]
-                    if len(monthly_pattern) > 0:
-                        pattern_str = monthly_pattern.iloc[0]['pattern']
-                        xamd_patterns.append(get_xamd_from_monthly_pattern(pattern_str, week_of_month))
-                    else:
-                        xamd_patterns.append('')
-                else:
-                    xamd_patterns.append('')
+            xamd_patterns = monthly_pattern_letters(df, monthly_patterns_df, symbol_id)
             
             df.insert(df.columns.get_loc('月内第几周') + 1, '走势', xamd_patterns)
-            df.to_excel(writer, sheet_name=f'{symbol}_周数据', index=False)
-            ws = writer.sheets[f'{symbol}_周数据']
-            style_excel_header(ws)
-            style_data_cells(ws)
-            auto_adjust_column_width(ws)
+            write_sheet(writer, df, f'{symbol}_周数据', PATTERN_FILLS)
         
         # ==================== 第二部分：周度模式分析 ====================
         print("\n【周度模式分析】")
@@ -952,12 +757,8 @@ def export_combined_report(conn):
             JOIN symbols s ON wp.symbol_id = s.id
             GROUP BY s.symbol
         """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='周度模式_总体汇总', index=False)
-        ws = writer.sheets['周度模式_总体汇总']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        df = data.query(query)
+        write_sheet(writer, df, '周度模式_总体汇总', PATTERN_FILLS)
         
         # 工作表: 周度模式_年度汇总
         print("生成工作表: 周度模式_年度汇总...")
@@ -975,12 +776,8 @@ def export_combined_report(conn):
             GROUP BY s.symbol, wp.year
             ORDER BY s.symbol, wp.year
         """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='周度模式_年度汇总', index=False)
-        ws = writer.sheets['周度模式_年度汇总']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        df = data.query(query)
+        write_sheet(writer, df, '周度模式_年度汇总', PATTERN_FILLS)
         
         # 工作表: BTC周度详细
         print("生成工作表: BTC周度详细...")
@@ -1017,12 +814,8 @@ def export_combined_report(conn):
             WHERE s.symbol = 'BTCUSDT'
             ORDER BY wp.week_start
         """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='BTC周度详细', index=False)
-        ws = writer.sheets['BTC周度详细']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        df = data.query(query)
+        write_sheet(writer, df, 'BTC周度详细', PATTERN_FILLS)
         
         # 工作表: ETH周度详细
         print("生成工作表: ETH周度详细...")
@@ -1059,175 +852,95 @@ def export_combined_report(conn):
             WHERE s.symbol = 'ETHUSDT'
             ORDER BY wp.week_start
         """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='ETH周度详细', index=False)
-        ws = writer.sheets['ETH周度详细']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        df = data.query(query)
+        write_sheet(writer, df, 'ETH周度详细', PATTERN_FILLS)
         
-        # 工作表: BTC日数据
-        print("生成工作表: BTC日数据...")
-        query = """
-            SELECT 
-                dd.trade_date as '日期',
-                CASE dd.day_of_week
-                    WHEN 0 THEN '周一'
-                    WHEN 1 THEN '周二'
-                    WHEN 2 THEN '周三'
-                    WHEN 3 THEN '周四'
-                    WHEN 4 THEN '周五'
-                    WHEN 5 THEN '周六'
-                    WHEN 6 THEN '周日'
-                END as '星期',
-                CASE 
-                    WHEN wp.pattern IS NULL THEN 'N/A'
-                    WHEN dd.day_of_week = 0 THEN SUBSTR(wp.pattern, 1, 1)  -- 周一，第1个字母
-                    WHEN dd.day_of_week = 1 THEN SUBSTR(wp.pattern, 2, 1)  -- 周二，第2个字母
-                    WHEN dd.day_of_week = 2 THEN SUBSTR(wp.pattern, 3, 1)  -- 周三，第3个字母
-                    WHEN dd.day_of_week = 3 THEN SUBSTR(wp.pattern, 4, 1)  -- 周四，第4个字母
-                    WHEN dd.day_of_week = 4 THEN SUBSTR(wp.pattern, 5, 1)  -- 周五，第5个字母
-                    WHEN dd.day_of_week = 5 THEN SUBSTR(wp.pattern, 6, 1)  -- 周六，第6个字母
-                    WHEN dd.day_of_week = 6 THEN SUBSTR(wp.pattern, 7, 1)  -- 周日，第7个字母
-                    ELSE 'N/A'
-                END as '周度模式',
-                CASE dd.day_of_week
-                    WHEN 0 THEN COALESCE(wp.monday_trend_detail, 'N/A')
-                    WHEN 1 THEN COALESCE(wp.tuesday_trend_detail, 'N/A')
-                    WHEN 2 THEN COALESCE(wp.wednesday_trend_detail, 'N/A')
-                    WHEN 3 THEN COALESCE(wp.thursday_trend_detail, 'N/A')
-                    WHEN 4 THEN COALESCE(wp.friday_trend_detail, 'N/A')
-                    WHEN 5 THEN COALESCE(wp.saturday_trend_detail, 'N/A')
-                    WHEN 6 THEN COALESCE(wp.sunday_trend_detail, 'N/A')
-                END as '走势明细',
-                CASE dd.day_of_week
-                    WHEN 0 THEN ROUND(wp.monday_breakout_up_percent, 2)
-                    WHEN 1 THEN ROUND(wp.tuesday_breakout_up_percent, 2)
-                    WHEN 2 THEN ROUND(wp.wednesday_breakout_up_percent, 2)
-                    WHEN 3 THEN ROUND(wp.thursday_breakout_up_percent, 2)
-                    WHEN 4 THEN ROUND(wp.friday_breakout_up_percent, 2)
-                    WHEN 5 THEN ROUND(wp.saturday_breakout_up_percent, 2)
-                    WHEN 6 THEN ROUND(wp.sunday_breakout_up_percent, 2)
-                END as '向上突破幅度(%)',
-                CASE dd.day_of_week
-                    WHEN 0 THEN ROUND(wp.monday_breakout_down_percent, 2)
-                    WHEN 1 THEN ROUND(wp.tuesday_breakout_down_percent, 2)
-                    WHEN 2 THEN ROUND(wp.wednesday_breakout_down_percent, 2)
-                    WHEN 3 THEN ROUND(wp.thursday_breakout_down_percent, 2)
-                    WHEN 4 THEN ROUND(wp.friday_breakout_down_percent, 2)
-                    WHEN 5 THEN ROUND(wp.saturday_breakout_down_percent, 2)
-                    WHEN 6 THEN ROUND(wp.sunday_breakout_down_percent, 2)
-                END as '向下突破幅度(%)',
-                dd.day_high as '最高价',
-                dd.day_low as '最低价',
-                dd.day_open as '开盘价',
-                dd.day_close as '收盘价',
-                dd.day_volume as '成交量',
-                dd.data_quality_score as '数据质量分数'
-            FROM daily_data dd
-            LEFT JOIN weekly_patterns wp ON (
-                dd.symbol_id = wp.symbol_id 
-                AND dd.trade_date >= DATE(wp.week_start) 
-                AND dd.trade_date < DATE(wp.week_start, '+7 days')
-            )
-            WHERE dd.symbol_id = (SELECT id FROM symbols WHERE symbol = 'BTCUSDT')
-            ORDER BY dd.trade_date
-        """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='BTC日数据', index=False)
-        ws = writer.sheets['BTC日数据']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
-        
-        # 工作表: ETH日数据
-        print("生成工作表: ETH日数据...")
-        query = """
-            SELECT 
-                dd.trade_date as '日期',
-                CASE dd.day_of_week
-                    WHEN 0 THEN '周一'
-                    WHEN 1 THEN '周二'
-                    WHEN 2 THEN '周三'
-                    WHEN 3 THEN '周四'
-                    WHEN 4 THEN '周五'
-                    WHEN 5 THEN '周六'
-                    WHEN 6 THEN '周日'
-                END as '星期',
-                CASE 
-                    WHEN wp.pattern IS NULL THEN 'N/A'
-                    WHEN dd.day_of_week = 0 THEN SUBSTR(wp.pattern, 1, 1)  -- 周一，第1个字母
-                    WHEN dd.day_of_week = 1 THEN SUBSTR(wp.pattern, 2, 1)  -- 周二，第2个字母
-                    WHEN dd.day_of_week = 2 THEN SUBSTR(wp.pattern, 3, 1)  -- 周三，第3个字母
-                    WHEN dd.day_of_week = 3 THEN SUBSTR(wp.pattern, 4, 1)  -- 周四，第4个字母
-                    WHEN dd.day_of_week = 4 THEN SUBSTR(wp.pattern, 5, 1)  -- 周五，第5个字母
-                    WHEN dd.day_of_week = 5 THEN SUBSTR(wp.pattern, 6, 1)  -- 周六，第6个字母
-                    WHEN dd.day_of_week = 6 THEN SUBSTR(wp.pattern, 7, 1)  -- 周日，第7个字母
-                    ELSE 'N/A'
-                END as '周度模式',
-                CASE dd.day_of_week
-                    WHEN 0 THEN COALESCE(wp.monday_trend_detail, 'N/A')
-                    WHEN 1 THEN COALESCE(wp.tuesday_trend_detail, 'N/A')
-                    WHEN 2 THEN COALESCE(wp.wednesday_trend_detail, 'N/A')
-                    WHEN 3 THEN COALESCE(wp.thursday_trend_detail, 'N/A')
-                    WHEN 4 THEN COALESCE(wp.friday_trend_detail, 'N/A')
-                    WHEN 5 THEN COALESCE(wp.saturday_trend_detail, 'N/A')
-                    WHEN 6 THEN COALESCE(wp.sunday_trend_detail, 'N/A')
-                END as '走势明细',
-                CASE dd.day_of_week
-                    WHEN 0 THEN ROUND(wp.monday_breakout_up_percent, 2)
-                    WHEN 1 THEN ROUND(wp.tuesday_breakout_up_percent, 2)
-                    WHEN 2 THEN ROUND(wp.wednesday_breakout_up_percent, 2)
-                    WHEN 3 THEN ROUND(wp.thursday_breakout_up_percent, 2)
-                    WHEN 4 THEN ROUND(wp.friday_breakout_up_percent, 2)
-                    WHEN 5 THEN ROUND(wp.saturday_breakout_up_percent, 2)
-                    WHEN 6 THEN ROUND(wp.sunday_breakout_up_percent, 2)
-                END as '向上突破幅度(%)',
-                CASE dd.day_of_week
-                    WHEN 0 THEN ROUND(wp.monday_breakout_down_percent, 2)
-                    WHEN 1 THEN ROUND(wp.tuesday_breakout_down_percent, 2)
-                    WHEN 2 THEN ROUND(wp.wednesday_breakout_down_percent, 2)
-                    WHEN 3 THEN ROUND(wp.thursday_breakout_down_percent, 2)
-                    WHEN 4 THEN ROUND(wp.friday_breakout_down_percent, 2)
-                    WHEN 5 THEN ROUND(wp.saturday_breakout_down_percent, 2)
-                    WHEN 6 THEN ROUND(wp.sunday_breakout_down_percent, 2)
-                END as '向下突破幅度(%)',
-                dd.day_high as '最高价',
-                dd.day_low as '最低价',
-                dd.day_open as '开盘价',
-                dd.day_close as '收盘价',
-                dd.day_volume as '成交量',
-                dd.data_quality_score as '数据质量分数'
-            FROM daily_data dd
-            LEFT JOIN weekly_patterns wp ON (
-                dd.symbol_id = wp.symbol_id 
-                AND dd.trade_date >= DATE(wp.week_start) 
-                AND dd.trade_date < DATE(wp.week_start, '+7 days')
-            )
-            WHERE dd.symbol_id = (SELECT id FROM symbols WHERE symbol = 'ETHUSDT')
-            ORDER BY dd.trade_date
-        """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='ETH日数据', index=False)
-        ws = writer.sheets['ETH日数据']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
-        
-        # ==================== 第三部分：日统计 ====================
-        create_statistics_sheets(conn, writer)
-        
-        # ==================== 第四部分：连续统计详细 ====================
-        create_detailed_consecutive_stats_sheets(conn, writer)
+        # 以下工作表都依赖按天展开的日模式
+        if has_daily_patterns:
+            # 工作表: BTC日数据
+            print("生成工作表: BTC日数据...")
+            query = """
+                SELECT 
+                    dd.trade_date as '日期',
+                    CASE dd.day_of_week
+                        WHEN 0 THEN '周一'
+                        WHEN 1 THEN '周二'
+                        WHEN 2 THEN '周三'
+                        WHEN 3 THEN '周四'
+                        WHEN 4 THEN '周五'
+                        WHEN 5 THEN '周六'
+                        WHEN 6 THEN '周日'
+                    END as '星期',
+                    COALESCE(dp.letter, 'N/A') as '周度模式',
+                    COALESCE(dp.trend_detail, 'N/A') as '走势明细',
+                    ROUND(dp.breakout_up_percent, 2) as '向上突破幅度(%)',
+                    ROUND(dp.breakout_down_percent, 2) as '向下突破幅度(%)',
+                    dd.day_high as '最高价',
+                    dd.day_low as '最低价',
+                    dd.day_open as '开盘价',
+                    dd.day_close as '收盘价',
+                    dd.day_volume as '成交量',
+                    dd.data_quality_score as '数据质量分数'
+                FROM daily_data dd
+                LEFT JOIN daily_patterns dp ON (
+                    dp.symbol_id = dd.symbol_id
+                    AND dp.trade_date = dd.trade_date
+                )
+                WHERE dd.symbol_id = (SELECT id FROM symbols WHERE symbol = 'BTCUSDT')
+                ORDER BY dd.trade_date
+            """
+            df = data.query(query)
+            write_sheet(writer, df, 'BTC日数据', PATTERN_FILLS)
+            
+            # 工作表: ETH日数据
+            print("生成工作表: ETH日数据...")
+            query = """
+                SELECT 
+                    dd.trade_date as '日期',
+                    CASE dd.day_of_week
+                        WHEN 0 THEN '周一'
+                        WHEN 1 THEN '周二'
+                        WHEN 2 THEN '周三'
+                        WHEN 3 THEN '周四'
+                        WHEN 4 THEN '周五'
+                        WHEN 5 THEN '周六'
+                        WHEN 6 THEN '周日'
+                    END as '星期',
+                    COALESCE(dp.letter, 'N/A') as '周度模式',
+                    COALESCE(dp.trend_detail, 'N/A') as '走势明细',
+                    ROUND(dp.breakout_up_percent, 2) as '向上突破幅度(%)',
+                    ROUND(dp.breakout_down_percent, 2) as '向下突破幅度(%)',
+                    dd.day_high as '最高价',
+                    dd.day_low as '最低价',
+                    dd.day_open as '开盘价',
+                    dd.day_close as '收盘价',
+                    dd.day_volume as '成交量',
+                    dd.data_quality_score as '数据质量分数'
+                FROM daily_data dd
+                LEFT JOIN daily_patterns dp ON (
+                    dp.symbol_id = dd.symbol_id
+                    AND dp.trade_date = dd.trade_date
+                )
+                WHERE dd.symbol_id = (SELECT id FROM symbols WHERE symbol = 'ETHUSDT')
+                ORDER BY dd.trade_date
+            """
+            df = data.query(query)
+            write_sheet(writer, df, 'ETH日数据', PATTERN_FILLS)
+            
+            # ==================== 第三部分：日统计 ====================
+            create_statistics_sheets(data, writer)
+            
+            # ==================== 第四部分：连续统计详细 ====================
+            create_detailed_consecutive_stats_sheets(data, writer)
     
     print(f"\n合并报告已保存: {excel_path}")
     
     # 同时保存最新版本
-    latest_path = os.path.join(excel_dir, '完整分析报告_最新.xlsx')
-    import shutil
-    shutil.copy(excel_path, latest_path)
+    publish_latest(excel_path, latest_path)
     print(f"最新版本已保存: {latest_path}")
     
+    save_fingerprint(latest_path, fingerprint)
+    
     print("\n" + "=" * 60)
     print("合并报告导出完成!")
     print("=" * 60)
@@ -1235,15 +948,24 @@ def export_combined_report(conn):
     return excel_path
 
 
-def main():
-    """主函数"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    try:
-        export_combined_report(conn)
-    finally:
-        conn.close()
-
+def main(data=None, force=False):
+    """
+    主函数
+    
+    Args:
+        data: 共享的报告数据层（由调用方传入时与其他报告共用查询结果），默认单独连接数据库
+        force: 输入数据未变化时也重新生成报告
+    """
+    with open_report_data(data) as data:
+        export_combined_report(data, force)
 
 if __name__ == '__main__':
-    main()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='导出合并报告（月度模式 + 周度模式）')
+    parser.add_argument('--force', action='store_true',
+                        help='输入数据未变化时也重新生成报告')
+    
+    args = parser.parse_args()
+    main(force=args.force)
 
@@ -0,0 +1,236 @@
+"""
+JSON API 导出程序
+将模式数据导出为前端按需加载的静态JSON接口（reports/data/api）：
+- 列式结构 {列名: [值, ...]}，不重复每行的键名，不缩进
+- 月度明细按 交易对/年份 拆分为分片，只显示一个交易对的页面不必下载全部数据
+- 每个文件附带预压缩的 .gz（和 .br，需要安装brotli）版本，静态服务器可直接返回
+- index.json 清单列出所有文件的行数、大小和内容哈希，前端据此决定加载哪些分片
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import REPORTS_DIR, TZ_UTC9
+from scripts.generate_reports import (
+    REPORT_TABLES, get_monthly_data, get_yearly_summary, get_overall_summary
+)
+from scripts.report_data import (
+    open_report_data, input_fingerprint, report_is_current, save_fingerprint
+)
+
+# 接口格式版本，字段或目录结构变化时递增
+JSON_API_VERSION = 1
+
+
+def json_api_dir():
+    """JSON接口目录"""
+    return os.path.join(REPORTS_DIR, 'data', 'api')
+
+
+def json_api_index_path():
+    """JSON接口清单的路径"""
+    return os.path.join(json_api_dir(), 'index.json')
+
+
+def json_api_is_current(data):
+    """JSON接口的输入数据与上次导出时相同"""
+    return report_is_current(json_api_index_path(), input_fingerprint(data, REPORT_TABLES))
+
+
+def to_columns(df):
+    """DataFrame 转为列式结构 {列名: [值, ...]}，空值为null"""
+    df = df.astype(object).where(df.notna(), None)
+    return {column: df[column].tolist() for column in df.columns}
+
+
+def get_brotli():
+    """brotli模块，未安装时返回None"""
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def write_if_changed(path, payload):
+    """
+    写入文件（内容相同时不改写，静态服务器的缓存和文件时间保持不变）
+
+    先写临时文件再替换，前端不会读到写了一半的文件
+    """
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            if f.read() == payload:
+                return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+
+    os.replace(tmp_path, path)
+
+
+def write_json_file(api_dir, relative_path, document, brotli=None):
+    """
+    写入一个JSON文件及其预压缩版本
+
+    Returns:
+        tuple: (清单中的文件信息, 写出的所有文件路径)
+    """
+    payload = json.dumps(document, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    path = os.path.join(api_dir, *relative_path.split('/'))
+
+    # mtime=0：内容不变时压缩结果也不变
+    variants = {'gzip': ('.gz', gzip.compress(payload, compresslevel=9, mtime=0))}
+    if brotli is not None:
+        variants['br'] = ('.br', brotli.compress(payload))
+
+    write_if_changed(path, payload)
+    written = [path]
+
+    for suffix, compressed in variants.values():
+        write_if_changed(path + suffix, compressed)
+        written.append(path + suffix)
+
+    entry = {
+        'path': relative_path,
+        'bytes': len(payload),
+        'encodings': {name: len(compressed) for name, (_, compressed) in variants.items()},
+        'sha256': hashlib.sha256(payload).hexdigest()[:16]
+    }
+
+    return entry, written
+
+
+def remove_stale_files(api_dir, keep):
+    """删除上次导出、本次已不存在的分片（如交易对被删除）"""
+    keep = {os.path.normpath(path) for path in keep}
+
+    for root, _, files in os.walk(api_dir, topdown=False):
+        for name in files:
+            path = os.path.normpath(os.path.join(root, name))
+            if path not in keep and not name.endswith('.fingerprint.json'):
+                os.remove(path)
+
+        if root != api_dir and not os.listdir(root):
+            os.rmdir(root)
+
+
+def export_json_api(data, force=False):
+    """
+    导出JSON接口
+
+    Args:
+        data: 报告数据层
+        force: 输入数据未变化时也重新导出
+
+    Returns:
+        str: 清单文件路径，跳过时返回None
+    """
+    print("导出JSON接口...")
+
+    if not force and json_api_is_current(data):
+        print("  输入数据未变化，跳过")
+        return None
+
+    api_dir = json_api_dir()
+    index_path = json_api_index_path()
+    fingerprint = input_fingerprint(data, REPORT_TABLES)
+
+    brotli = get_brotli()
+    if brotli is None:
+        print("  提示: brotli未安装，只生成gzip压缩版本（pip install brotli）")
+
+    monthly_df = get_monthly_data(data)
+    yearly_df = get_yearly_summary(data)
+    overall_df = get_overall_summary(data)
+
+    written = []
+    files = {}
+
+    # 汇总数据很小，各一个文件
+    for name, df in (('overall', overall_df), ('yearly', yearly_df)):
+        entry, paths = write_json_file(api_dir, f'{name}.json',
+                                       {'rows': len(df), 'columns': to_columns(df)}, brotli)
+        entry['rows'] = len(df)
+        files[name] = entry
+        written += paths
+
+    # 月度明细按 交易对/年份 分片，交易对和年份已在路径中，分片内不再重复
+    monthly = {}
+    shard_columns = [column for column in monthly_df.columns if column not in ('交易对', '年份')]
+
+    for (symbol, year), shard_df in monthly_df.groupby(['交易对', '年份'], sort=True):
+        year = int(year)
+        document = {
+            'symbol': symbol,
+            'year': year,
+            'rows': len(shard_df),
+            'columns': to_columns(shard_df[shard_columns])
+        }
+        entry, paths = write_json_file(api_dir, f'monthly/{symbol}/{year}.json', document, brotli)
+        entry['rows'] = len(shard_df)
+        monthly.setdefault(symbol, {})[str(year)] = entry
+        written += paths
+
+    index = {
+        'version': JSON_API_VERSION,
+        'generated_at': datetime.now(TZ_UTC9).strftime('%Y-%m-%d %H:%M:%S'),
+        'timezone': 'UTC+9',
+        'columns': {
+            'overall': list(overall_df.columns),
+            'yearly': list(yearly_df.columns),
+            'monthly': shard_columns
+        },
+        'files': files,
+        'monthly': monthly
+    }
+
+    _, paths = write_json_file(api_dir, 'index.json', index, brotli)
+    written += paths
+
+    remove_stale_files(api_dir, written)
+
+    total_bytes = sum(entry['bytes'] for symbol_shards in monthly.values() for entry in symbol_shards.values())
+    shard_count = sum(len(symbol_shards) for symbol_shards in monthly.values())
+    print(f"  JSON接口已保存: {api_dir}（{shard_count} 个月度分片，共 {total_bytes / 1024:.1f} KB）")
+
+    save_fingerprint(index_path, fingerprint)
+
+    return index_path
+
+
+def main(data=None, force=False):
+    """
+    主函数
+
+    Args:
+        data: 共享的报告数据层，默认单独连接数据库
+        force: 输入数据未变化时也重新导出
+    """
+    with open_report_data(data) as data:
+        try:
+            export_json_api(data, force)
+        except Exception as e:
+            print(f"\n错误: {e}")
+            import traceback
+            traceback.print_exc()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='导出按交易对/年份分片的JSON接口')
+    parser.add_argument('--force', action='store_true',
+                        help='输入数据未变化时也重新导出')
+
+    args = parser.parse_args()
+    main(force=args.force)
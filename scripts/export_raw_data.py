@@ -0,0 +1,243 @@
+"""
+原始数据导出程序
+将 daily_data、hourly_data、weekly_data 和各模式表按块流式导出为 CSV 或 Parquet，
+逐块从游标读取并写出，内存占用与表的大小无关，供分析笔记本直接读取
+"""
+
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import RAW_EXPORT_DIR, RAW_EXPORT_CHUNK_SIZE
+from scripts.db import connect
+
+# 导出的表及其排序键（均为UNIQUE约束的列，按索引顺序读取，无需额外排序）
+RAW_EXPORT_TABLES = {
+    'hourly_data': ['timestamp'],
+    'daily_data': ['trade_date'],
+    'weekly_data': ['week_start'],
+    'monthly_patterns': ['year', 'month'],
+    'weekly_patterns': ['week_start'],
+    'daily_patterns': ['trade_date'],
+}
+
+EXPORT_FORMATS = ('csv', 'parquet')
+
+
+def iter_table_chunks(conn, table, chunk_size=RAW_EXPORT_CHUNK_SIZE):
+    """
+    按块读取表数据（附带交易对名称），按 交易对、排序键 升序
+
+    Returns:
+        tuple: (列名列表, 数据块生成器)，每个数据块为不超过chunk_size行的列表
+    """
+    order_columns = ', '.join(f't.{col}' for col in ['symbol_id'] + RAW_EXPORT_TABLES[table])
+
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT s.symbol, t.*
+        FROM {table} t
+        JOIN symbols s ON s.id = t.symbol_id
+        ORDER BY {order_columns}
+    """)
+    columns = [description[0] for description in cursor.description]
+
+    def chunks():
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+    return columns, chunks()
+
+
+def write_csv(path, columns, chunks):
+    """逐块写出CSV，返回写出的行数"""
+    total = 0
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+
+        for rows in chunks:
+            writer.writerows(rows)
+            total += len(rows)
+
+    return total
+
+
+def parquet_schema(conn, table, columns):
+    """
+    根据表的声明类型生成Parquet schema
+
+    SQLite的列没有固定类型，按第一块数据推断时全为NULL的列会得到错误的类型，
+    因此按建表时声明的类型确定
+    """
+    import pyarrow as pa
+
+    declared = {row[1]: row[2].upper() for row in conn.execute(f"PRAGMA table_info({table})")}
+    fields = []
+
+    for column in columns:
+        declared_type = declared.get(column, 'TEXT')
+
+        if 'INT' in declared_type or 'BOOL' in declared_type:
+            arrow_type = pa.int64()
+        elif any(name in declared_type for name in ('REAL', 'FLOA', 'DOUB', 'DEC', 'NUM')):
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.string()
+
+        fields.append(pa.field(column, arrow_type))
+
+    return pa.schema(fields)
+
+
+def write_parquet(path, columns, chunks, schema):
+    """逐块写出Parquet（每块一个row group），返回写出的行数"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    total = 0
+
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in chunks:
+            arrays = [pa.array(values, type=field.type)
+                      for values, field in zip(zip(*rows), schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            total += len(rows)
+
+    return total
+
+
+def export_table(conn, table, fmt='csv', output_dir=RAW_EXPORT_DIR, chunk_size=RAW_EXPORT_CHUNK_SIZE):
+    """
+    导出一张表
+
+    先写入临时文件，完成后再替换，读取方不会读到写了一半的文件
+
+    Returns:
+        tuple: (文件路径, 行数)
+    """
+    columns, chunks = iter_table_chunks(conn, table, chunk_size)
+
+    path = os.path.join(output_dir, f'{table}.{fmt}')
+    tmp_path = f'{path}.tmp'
+
+    try:
+        if fmt == 'parquet':
+            total = write_parquet(tmp_path, columns, chunks, parquet_schema(conn, table, columns))
+        else:
+            total = write_csv(tmp_path, columns, chunks)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, path)
+    return path, total
+
+
+def export_raw_data(conn, fmt='csv', tables=None, output_dir=RAW_EXPORT_DIR):
+    """
+    导出原始数据
+
+    所有表在同一个读事务中导出，导出期间有写入时各文件仍来自同一数据快照
+
+    Args:
+        conn: 数据库连接
+        fmt: 导出格式（csv / parquet）
+        tables: 要导出的表，默认导出 RAW_EXPORT_TABLES 中的所有表
+        output_dir: 输出目录
+
+    Returns:
+        dict: {表名: (文件路径, 行数)}，parquet 不可用时返回 None
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"未知的导出格式: {fmt}（可选: {', '.join(EXPORT_FORMATS)}）")
+
+    if fmt == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("  警告: pyarrow未安装，无法导出Parquet")
+            print("  请运行: pip install pyarrow，或使用 --format csv")
+            return None
+
+    tables = tables or list(RAW_EXPORT_TABLES)
+    unknown = [table for table in tables if table not in RAW_EXPORT_TABLES]
+    if unknown:
+        raise ValueError(f"不支持导出的表: {', '.join(unknown)}")
+
+    # 还没有迁移的旧数据库缺少后来新增的表（如 daily_patterns），跳过这些表
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table in [table for table in tables if table not in existing]:
+        print(f"  警告: 数据库中没有 {table} 表，跳过（请运行: python scripts/init_database.py）")
+    tables = [table for table in tables if table in existing]
+
+    os.makedirs(output_dir, exist_ok=True)
+    results = {}
+
+    conn.execute("BEGIN")
+
+    try:
+        for table in tables:
+            start = time.perf_counter()
+            path, total = export_table(conn, table, fmt, output_dir)
+            results[table] = (path, total)
+
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            print(f"  {table}: {total} 行 -> {os.path.basename(path)} "
+                  f"({size_mb:.1f} MB, {time.perf_counter() - start:.1f}秒)")
+    finally:
+        conn.rollback()
+
+    return results
+
+
+def main(fmt='csv', tables=None):
+    """
+    主函数
+
+    Args:
+        fmt: 导出格式（csv / parquet）
+        tables: 要导出的表，默认全部
+    """
+    print("=" * 60)
+    print(f"导出原始数据（{fmt}）")
+    print("=" * 60)
+    print(f"输出目录: {RAW_EXPORT_DIR}")
+
+    conn = connect(readonly=True)
+
+    try:
+        if export_raw_data(conn, fmt, tables) is not None:
+            print("\n" + "=" * 60)
+            print("原始数据导出完成!")
+            print("=" * 60)
+
+    except Exception as e:
+        print(f"\n错误: {e}")
+        import traceback
+        traceback.print_exc()
+        # 由 run_all 记录为失败的步骤
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='导出原始数据（CSV/Parquet）')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv',
+                        help='导出格式（默认csv，parquet需要安装pyarrow）')
+    parser.add_argument('--tables', nargs='+', choices=list(RAW_EXPORT_TABLES),
+                        help='要导出的表（默认全部）')
+
+    args = parser.parse_args()
+    main(fmt=args.format, tables=args.tables)
@@ -3,78 +3,18 @@
 导出周度模式（7字母模式）数据到Excel
 """
 
-import sqlite3
 import os
 import sys
 from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import DATABASE_PATH, REPORTS_DIR, TZ_UTC9
+from config import REPORTS_DIR, TZ_UTC9
+from scripts.excel_writer import open_excel_writer, write_sheet, WEEKLY_PATTERN_FILLS
+from scripts.report_data import open_report_data, publish_latest
 
-import pandas as pd
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 
-
-def style_excel_header(ws, row_num=1):
-    """设置Excel表头样式"""
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True, size=11)
-    header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    
-    for cell in ws[row_num]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = header_alignment
-
-
-def style_data_cells(ws, start_row=2):
-    """设置数据单元格样式"""
-    data_alignment = Alignment(horizontal="center", vertical="center")
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    xamdxam_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-    amdxamd_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-    
-    for row in ws.iter_rows(min_row=start_row, max_row=ws.max_row):
-        for cell in row:
-            cell.alignment = data_alignment
-            cell.border = thin_border
-            
-            if cell.value == 'XAMDXAM':
-                cell.fill = xamdxam_fill
-            elif cell.value == 'AMDXAMD':
-                cell.fill = amdxamd_fill
-
-
-def auto_adjust_column_width(ws):
-    """自动调整列宽"""
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        
-        for cell in column:
-            try:
-                if cell.value:
-                    cell_length = len(str(cell.value))
-                    for char in str(cell.value):
-                        if '\u4e00' <= char <= '\u9fff':
-                            cell_length += 1
-                    if cell_length > max_length:
-                        max_length = cell_length
-            except:
-                pass
-        
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-
-
-def export_weekly_patterns_to_excel(conn):
+def export_weekly_patterns_to_excel(data):
     """导出周度模式数据到Excel"""
     print("=" * 60)
     print("导出周度模式数据到Excel")
@@ -86,7 +26,12 @@ def export_weekly_patterns_to_excel(conn):
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     excel_path = os.path.join(excel_dir, f'周度模式分析_{timestamp}.xlsx')
     
-    with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
+    has_daily_patterns = data.has_table('daily_patterns')
+    if not has_daily_patterns:
+        print("警告: 数据库中没有 daily_patterns 表，跳过日数据工作表")
+        print("  请运行: python scripts/init_database.py")
+    
+    with open_excel_writer(excel_path) as writer:
         # ========== 工作表1: 总体汇总 ==========
         print("生成工作表: 总体汇总...")
         query = """
@@ -103,12 +48,8 @@ def export_weekly_patterns_to_excel(conn):
             JOIN symbols s ON wp.symbol_id = s.id
             GROUP BY s.symbol
         """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='总体汇总', index=False)
-        ws = writer.sheets['总体汇总']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        df = data.query(query)
+        write_sheet(writer, df, '总体汇总', WEEKLY_PATTERN_FILLS)
         
         # ========== 工作表2: 年度汇总 ==========
         print("生成工作表: 年度汇总...")
@@ -126,12 +67,8 @@ def export_weekly_patterns_to_excel(conn):
             GROUP BY s.symbol, wp.year
             ORDER BY s.symbol, wp.year
         """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='年度汇总', index=False)
-        ws = writer.sheets['年度汇总']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        df = data.query(query)
+        write_sheet(writer, df, '年度汇总', WEEKLY_PATTERN_FILLS)
         
         # ========== 工作表3: BTC周度详细 ==========
         print("生成工作表: BTC周度详细...")
@@ -168,12 +105,8 @@ def export_weekly_patterns_to_excel(conn):
             WHERE s.symbol = 'BTCUSDT'
             ORDER BY wp.week_start
         """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='BTC周度详细', index=False)
-        ws = writer.sheets['BTC周度详细']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        df = data.query(query)
+        write_sheet(writer, df, 'BTC周度详细', WEEKLY_PATTERN_FILLS)
         
         # ========== 工作表4: ETH周度详细 ==========
         print("生成工作表: ETH周度详细...")
@@ -210,203 +143,121 @@ def export_weekly_patterns_to_excel(conn):
             WHERE s.symbol = 'ETHUSDT'
             ORDER BY wp.week_start
         """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='ETH周度详细', index=False)
-        ws = writer.sheets['ETH周度详细']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        df = data.query(query)
+        write_sheet(writer, df, 'ETH周度详细', WEEKLY_PATTERN_FILLS)
         
-        # ========== 工作表5: 日数据(BTC) ==========
-        print("生成工作表: BTC日数据...")
-        query = """
-            SELECT 
-                dd.trade_date as '日期',
-                CASE dd.day_of_week
-                    WHEN 0 THEN '周一'
-                    WHEN 1 THEN '周二'
-                    WHEN 2 THEN '周三'
-                    WHEN 3 THEN '周四'
-                    WHEN 4 THEN '周五'
-                    WHEN 5 THEN '周六'
-                    WHEN 6 THEN '周日'
-                END as '星期',
-                CASE 
-                    WHEN wp.pattern IS NULL THEN 'N/A'
-                    WHEN dd.day_of_week = 0 THEN SUBSTR(wp.pattern, 1, 1)  -- 周一，第1个字母
-                    WHEN dd.day_of_week = 1 THEN SUBSTR(wp.pattern, 2, 1)  -- 周二，第2个字母
-                    WHEN dd.day_of_week = 2 THEN SUBSTR(wp.pattern, 3, 1)  -- 周三，第3个字母
-                    WHEN dd.day_of_week = 3 THEN SUBSTR(wp.pattern, 4, 1)  -- 周四，第4个字母
-                    WHEN dd.day_of_week = 4 THEN SUBSTR(wp.pattern, 5, 1)  -- 周五，第5个字母
-                    WHEN dd.day_of_week = 5 THEN SUBSTR(wp.pattern, 6, 1)  -- 周六，第6个字母
-                    WHEN dd.day_of_week = 6 THEN SUBSTR(wp.pattern, 7, 1)  -- 周日，第7个字母
-                    ELSE 'N/A'
-                END as '周度模式',
-                CASE dd.day_of_week
-                    WHEN 0 THEN COALESCE(wp.monday_trend_detail, 'N/A')
-                    WHEN 1 THEN COALESCE(wp.tuesday_trend_detail, 'N/A')
-                    WHEN 2 THEN COALESCE(wp.wednesday_trend_detail, 'N/A')
-                    WHEN 3 THEN COALESCE(wp.thursday_trend_detail, 'N/A')
-                    WHEN 4 THEN COALESCE(wp.friday_trend_detail, 'N/A')
-                    WHEN 5 THEN COALESCE(wp.saturday_trend_detail, 'N/A')
-                    WHEN 6 THEN COALESCE(wp.sunday_trend_detail, 'N/A')
-                END as '走势明细',
-                CASE dd.day_of_week
-                    WHEN 0 THEN ROUND(wp.monday_breakout_up_percent, 2)
-                    WHEN 1 THEN ROUND(wp.tuesday_breakout_up_percent, 2)
-                    WHEN 2 THEN ROUND(wp.wednesday_breakout_up_percent, 2)
-                    WHEN 3 THEN ROUND(wp.thursday_breakout_up_percent, 2)
-                    WHEN 4 THEN ROUND(wp.friday_breakout_up_percent, 2)
-                    WHEN 5 THEN ROUND(wp.saturday_breakout_up_percent, 2)
-                    WHEN 6 THEN ROUND(wp.sunday_breakout_up_percent, 2)
-                END as '向上突破幅度(%)',
-                CASE dd.day_of_week
-                    WHEN 0 THEN ROUND(wp.monday_breakout_down_percent, 2)
-                    WHEN 1 THEN ROUND(wp.tuesday_breakout_down_percent, 2)
-                    WHEN 2 THEN ROUND(wp.wednesday_breakout_down_percent, 2)
-                    WHEN 3 THEN ROUND(wp.thursday_breakout_down_percent, 2)
-                    WHEN 4 THEN ROUND(wp.friday_breakout_down_percent, 2)
-                    WHEN 5 THEN ROUND(wp.saturday_breakout_down_percent, 2)
-                    WHEN 6 THEN ROUND(wp.sunday_breakout_down_percent, 2)
-                END as '向下突破幅度(%)',
-                dd.day_high as '最高价',
-                dd.day_low as '最低价',
-                dd.day_open as '开盘价',
-                dd.day_close as '收盘价',
-                dd.day_volume as '成交量',
-                dd.data_quality_score as '数据质量分数'
-            FROM daily_data dd
-            LEFT JOIN weekly_patterns wp ON (
-                dd.symbol_id = wp.symbol_id 
-                AND dd.trade_date >= DATE(wp.week_start) 
-                AND dd.trade_date < DATE(wp.week_start, '+7 days')
-            )
-            WHERE dd.symbol_id = (SELECT id FROM symbols WHERE symbol = 'BTCUSDT')
-            ORDER BY dd.trade_date
-        """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='BTC日数据', index=False)
-        ws = writer.sheets['BTC日数据']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
-        
-        # ========== 工作表6: 日数据(ETH) ==========
-        print("生成工作表: ETH日数据...")
-        query = """
-            SELECT 
-                dd.trade_date as '日期',
-                CASE dd.day_of_week
-                    WHEN 0 THEN '周一'
-                    WHEN 1 THEN '周二'
-                    WHEN 2 THEN '周三'
-                    WHEN 3 THEN '周四'
-                    WHEN 4 THEN '周五'
-                    WHEN 5 THEN '周六'
-                    WHEN 6 THEN '周日'
-                END as '星期',
-                CASE 
-                    WHEN wp.pattern IS NULL THEN 'N/A'
-                    WHEN dd.day_of_week = 0 THEN SUBSTR(wp.pattern, 1, 1)  -- 周一，第1个字母
-                    WHEN dd.day_of_week = 1 THEN SUBSTR(wp.pattern, 2, 1)  -- 周二，第2个字母
-                    WHEN dd.day_of_week = 2 THEN SUBSTR(wp.pattern, 3, 1)  -- 周三，第3个字母
-                    WHEN dd.day_of_week = 3 THEN SUBSTR(wp.pattern, 4, 1)  -- 周四，第4个字母
-                    WHEN dd.day_of_week = 4 THEN SUBSTR(wp.pattern, 5, 1)  -- 周五，第5个字母
-                    WHEN dd.day_of_week = 5 THEN SUBSTR(wp.pattern, 6, 1)  -- 周六，第6个字母
-                    WHEN dd.day_of_week = 6 THEN SUBSTR(wp.pattern, 7, 1)  -- 周日，第7个字母
-                    ELSE 'N/A'
-                END as '周度模式',
-                CASE dd.day_of_week
-                    WHEN 0 THEN COALESCE(wp.monday_trend_detail, 'N/A')
-                    WHEN 1 THEN COALESCE(wp.tuesday_trend_detail, 'N/A')
-                    WHEN 2 THEN COALESCE(wp.wednesday_trend_detail, 'N/A')
-                    WHEN 3 THEN COALESCE(wp.thursday_trend_detail, 'N/A')
-                    WHEN 4 THEN COALESCE(wp.friday_trend_detail, 'N/A')
-                    WHEN 5 THEN COALESCE(wp.saturday_trend_detail, 'N/A')
-                    WHEN 6 THEN COALESCE(wp.sunday_trend_detail, 'N/A')
-                END as '走势明细',
-                CASE dd.day_of_week
-                    WHEN 0 THEN ROUND(wp.monday_breakout_up_percent, 2)
-                    WHEN 1 THEN ROUND(wp.tuesday_breakout_up_percent, 2)
-                    WHEN 2 THEN ROUND(wp.wednesday_breakout_up_percent, 2)
-                    WHEN 3 THEN ROUND(wp.thursday_breakout_up_percent, 2)
-                    WHEN 4 THEN ROUND(wp.friday_breakout_up_percent, 2)
-                    WHEN 5 THEN ROUND(wp.saturday_breakout_up_percent, 2)
-                    WHEN 6 THEN ROUND(wp.sunday_breakout_up_percent, 2)
-                END as '向上突破幅度(%)',
-                CASE dd.day_of_week
-                    WHEN 0 THEN ROUND(wp.monday_breakout_down_percent, 2)
-                    WHEN 1 THEN ROUND(wp.tuesday_breakout_down_percent, 2)
-                    WHEN 2 THEN ROUND(wp.wednesday_breakout_down_percent, 2)
-                    WHEN 3 THEN ROUND(wp.thursday_breakout_down_percent, 2)
-                    WHEN 4 THEN ROUND(wp.friday_breakout_down_percent, 2)
-                    WHEN 5 THEN ROUND(wp.saturday_breakout_down_percent, 2)
-                    WHEN 6 THEN ROUND(wp.sunday_breakout_down_percent, 2)
-                END as '向下突破幅度(%)',
-                dd.day_high as '最高价',
-                dd.day_low as '最低价',
-                dd.day_open as '开盘价',
-                dd.day_close as '收盘价',
-                dd.day_volume as '成交量',
-                dd.data_quality_score as '数据质量分数'
-            FROM daily_data dd
-            LEFT JOIN weekly_patterns wp ON (
-                dd.symbol_id = wp.symbol_id 
-                AND dd.trade_date >= DATE(wp.week_start) 
-                AND dd.trade_date < DATE(wp.week_start, '+7 days')
-            )
-            WHERE dd.symbol_id = (SELECT id FROM symbols WHERE symbol = 'ETHUSDT')
-            ORDER BY dd.trade_date
-        """
-        df = pd.read_sql_query(query, conn)
-        df.to_excel(writer, sheet_name='ETH日数据', index=False)
-        ws = writer.sheets['ETH日数据']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        # 日数据工作表依赖按天展开的日模式
+        if has_daily_patterns:
+            # ========== 工作表5: 日数据(BTC) ==========
+            print("生成工作表: BTC日数据...")
+            query = """
+                SELECT 
+                    dd.trade_date as '日期',
+                    CASE dd.day_of_week
+                        WHEN 0 THEN '周一'
+                        WHEN 1 THEN '周二'
+                        WHEN 2 THEN '周三'
+                        WHEN 3 THEN '周四'
+                        WHEN 4 THEN '周五'
+                        WHEN 5 THEN '周六'
+                        WHEN 6 THEN '周日'
+                    END as '星期',
+                    COALESCE(dp.letter, 'N/A') as '周度模式',
+                    COALESCE(dp.trend_detail, 'N/A') as '走势明细',
+                    ROUND(dp.breakout_up_percent, 2) as '向上突破幅度(%)',
+                    ROUND(dp.breakout_down_percent, 2) as '向下突破幅度(%)',
+                    dd.day_high as '最高价',
+                    dd.day_low as '最低价',
+                    dd.day_open as '开盘价',
+                    dd.day_close as '收盘价',
+                    dd.day_volume as '成交量',
+                    dd.data_quality_score as '数据质量分数'
+                FROM daily_data dd
+                LEFT JOIN daily_patterns dp ON (
+                    dp.symbol_id = dd.symbol_id
+                    AND dp.trade_date = dd.trade_date
+                )
+                WHERE dd.symbol_id = (SELECT id FROM symbols WHERE symbol = 'BTCUSDT')
+                ORDER BY dd.trade_date
+            """
+            df = data.query(query)
+            write_sheet(writer, df, 'BTC日数据', WEEKLY_PATTERN_FILLS)
+            
+            # ========== 工作表6: 日数据(ETH) ==========
+            print("生成工作表: ETH日数据...")
+            query = """
+                SELECT 
+                    dd.trade_date as '日期',
+                    CASE dd.day_of_week
+                        WHEN 0 THEN '周一'
+                        WHEN 1 THEN '周二'
+                        WHEN 2 THEN '周三'
+                        WHEN 3 THEN '周四'
+                        WHEN 4 THEN '周五'
+                        WHEN 5 THEN '周六'
+                        WHEN 6 THEN '周日'
+                    END as '星期',
+                    COALESCE(dp.letter, 'N/A') as '周度模式',
+                    COALESCE(dp.trend_detail, 'N/A') as '走势明细',
+                    ROUND(dp.breakout_up_percent, 2) as '向上突破幅度(%)',
+                    ROUND(dp.breakout_down_percent, 2) as '向下突破幅度(%)',
+                    dd.day_high as '最高价',
+                    dd.day_low as '最低价',
+                    dd.day_open as '开盘价',
+                    dd.day_close as '收盘价',
+                    dd.day_volume as '成交量',
+                    dd.data_quality_score as '数据质量分数'
+                FROM daily_data dd
+                LEFT JOIN daily_patterns dp ON (
+                    dp.symbol_id = dd.symbol_id
+                    AND dp.trade_date = dd.trade_date
+                )
+                WHERE dd.symbol_id = (SELECT id FROM symbols WHERE symbol = 'ETHUSDT')
+                ORDER BY dd.trade_date
+            """
+            df = data.query(query)
+            write_sheet(writer, df, 'ETH日数据', WEEKLY_PATTERN_FILLS)
     
     print(f"\n周度模式报告已保存: {excel_path}")
     
     # 同时保存最新版本
     latest_path = os.path.join(excel_dir, '周度模式分析_最新.xlsx')
-    import shutil
-    shutil.copy(excel_path, latest_path)
+    publish_latest(excel_path, latest_path)
     print(f"最新版本已保存: {latest_path}")
     
     return excel_path
 
 
-def main():
-    """主函数"""
-    conn = sqlite3.connect(DATABASE_PATH)
+def main(data=None):
+    """
+    主函数
     
-    try:
-        # 检查数据是否存在
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM weekly_patterns")
-        count = cursor.fetchone()[0]
-        
-        if count == 0:
-            print("警告: 数据库中没有周度模式数据，请先运行:")
-            print("  1. python scripts/fetch_daily_data.py")
-            print("  2. python scripts/calculate_weekly_patterns.py")
-            return
-        
-        print(f"数据库中有 {count} 条周度模式记录")
-        
-        export_weekly_patterns_to_excel(conn)
-        
-        print("\n" + "=" * 60)
-        print("周度模式数据导出完成!")
-        print("=" * 60)
-        
-    except Exception as e:
-        print(f"\n错误: {e}")
-        import traceback
-        traceback.print_exc()
-    finally:
-        conn.close()
-
+    Args:
+        data: 共享的报告数据层（由调用方传入时与其他报告共用查询结果），默认单独连接数据库
+    """
+    with open_report_data(data) as data:
+        try:
+            # 检查数据是否存在
+            count = data.scalar("SELECT COUNT(*) FROM weekly_patterns")
+            
+            if count == 0:
+                print("警告: 数据库中没有周度模式数据，请先运行:")
+                print("  1. python scripts/fetch_daily_data.py")
+                print("  2. python scripts/calculate_weekly_patterns.py")
+                return
+            
+            print(f"数据库中有 {count} 条周度模式记录")
+            
+            export_weekly_patterns_to_excel(data)
+            
+            print("\n" + "=" * 60)
+            print("周度模式数据导出完成!")
+            print("=" * 60)
+            
+        except Exception as e:
+            print(f"\n错误: {e}")
+            import traceback
+            traceback.print_exc()
 
 if __name__ == '__main__':
     main()
@@ -1,20 +1,24 @@
 #!/usr/bin/env python3
 """
 Bitstamp 数据获取模块
-获取 BTCUSD 现货数据
+获取 BTCUSD 现货小时K线，写入本地小时K线存储（hourly_data）
 """
 
 import os
 import sys
-import time
 import requests
 from datetime import datetime, timedelta
-import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import TZ_UTC9, DATABASE_PATH, API_REQUEST_INTERVAL
+from config import TZ_UTC9, BITSTAMP_FETCH_WORKERS
+from scripts.db import connect
+from scripts.rate_limiter import get_limiter, update_bitstamp_limits
+from scripts.http_client import get_json, now_utc9
+from scripts.fetch_scheduler import run_fetch_jobs, symbols_for_exchange, fetch_symbol_data
+from scripts.hourly_store import save_hourly_candles
 
 # Bitstamp API 配置
 BITSTAMP_API_BASE = 'https://www.bitstamp.net/api/v2'
@@ -24,6 +28,9 @@ BITSTAMP_OHLC_ENDPOINT = '/ohlc/{pair}/'
 STEP_1HOUR = 3600  # 1小时（秒）
 MAX_LIMIT = 1000   # 每次最多获取1000条数据
 
+# Bitstamp 最早可用数据日期（UTC+9）
+BITSTAMP_EARLIEST_DATE = TZ_UTC9.localize(datetime(2011, 9, 1))
+
 
 class BitstampDataFetcher:
     """Bitstamp 数据获取器"""
@@ -36,10 +43,7 @@ class BitstampDataFetcher:
             pair: 交易对，如 'btcusd'
         """
         self.pair = pair.lower()
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        self.limiter = get_limiter('bitstamp')
     
     def fetch_ohlc(self, step=STEP_1HOUR, limit=MAX_LIMIT, start=None, end=None):
         """
@@ -67,68 +71,108 @@ class BitstampDataFetcher:
             params['end'] = int(end)
         
         try:
-            response = self.session.get(url, params=params, timeout=30)
-            response.raise_for_status()
-            return response.json()
+            # 等待Bitstamp共享令牌桶放行，失败时按指数退避重试
+            return get_json(url, params, limiter=self.limiter, update_limits=update_bitstamp_limits)
         except requests.exceptions.RequestException as e:
             print(f"API 请求失败: {e}")
             return None
     
-    def fetch_historical_data(self, start_date, end_date=None):
+    def split_windows(self, start_date, end_date):
+        """
+        将时间范围切分为互不重叠的窗口，每个窗口最多1000小时（一次请求）
+        
+        Returns:
+            list: [(窗口开始, 窗口结束), ...]，按时间正序
+        """
+        windows = []
+        current_start = start_date
+        
+        while current_start <= end_date:
+            current_end = min(current_start + timedelta(hours=MAX_LIMIT - 1), end_date)
+            windows.append((current_start, current_end))
+            current_start = current_end + timedelta(hours=1)
+        
+        return windows
+    
+    def fetch_window(self, window):
+        """
+        获取一个时间窗口的数据
+        
+        Raises:
+            RuntimeError: API请求失败
+        """
+        window_start, window_end = window
+        
+        data = self.fetch_ohlc(step=STEP_1HOUR, limit=MAX_LIMIT,
+                               start=int(window_start.timestamp()), end=int(window_end.timestamp()))
+        
+        if not data or 'data' not in data or 'ohlc' not in data['data']:
+            raise RuntimeError(f"{self.pair.upper()} {window_start.strftime('%Y-%m-%d %H:%M')} "
+                               f"至 {window_end.strftime('%Y-%m-%d %H:%M')} 获取失败")
+        
+        return data['data']['ohlc']
+    
+    def fetch_historical_data(self, start_date, end_date=None, on_page=None,
+                              max_workers=BITSTAMP_FETCH_WORKERS):
         """
         批量获取历史数据
         
+        时间范围切分为1000小时的窗口并发获取（共享Bitstamp令牌桶），
+        结果按时间正序交给调用方，并按时间戳去重
+        
         Args:
             start_date: 开始日期 (datetime对象)
-            end_date: 结束日期 (datetime对象)，默认为当前时间
+            end_date: 结束日期 (datetime对象)，默认为当前时间（录制/回放时为固定的时间）
+            on_page: 每完成一个窗口就按时间顺序调用 on_page(ohlc_data)，用于边获取边写入数据库；
+                     指定时不在内存中累积数据
+            max_workers: 并发获取的窗口数，1为逐个获取
         
         Returns:
-            list: OHLC数据列表
+            list: OHLC数据列表（指定on_page时为空列表）
+        
+        Raises:
+            RuntimeError: API请求失败（之前的窗口已交给on_page，可从检查点继续）
         """
         if end_date is None:
-            end_date = datetime.now(TZ_UTC9)
+            end_date = now_utc9()
         
-        all_data = []
-        current_end = end_date
+        windows = self.split_windows(start_date, end_date)
         
         print(f"开始获取 {self.pair.upper()} 历史数据...")
-        print(f"时间范围: {start_date.strftime('%Y-%m-%d')} 至 {end_date.strftime('%Y-%m-%d')}")
-        
-        batch_count = 0
-        while current_end > start_date:
-            batch_count += 1
-            
-            # 计算当前批次的开始时间（往前推1000小时）
-            current_start = current_end - timedelta(hours=MAX_LIMIT)
-            
-            # 转换为Unix时间戳
-            start_ts = int(current_start.timestamp())
-            end_ts = int(current_end.timestamp())
-            
-            print(f"\n批次 {batch_count}: {current_start.strftime('%Y-%m-%d %H:%M')} 至 {current_end.strftime('%Y-%m-%d %H:%M')}")
-            
-            # 获取数据
-            data = self.fetch_ohlc(step=STEP_1HOUR, limit=MAX_LIMIT, start=start_ts, end=end_ts)
-            
-            if data and 'data' in data and 'ohlc' in data['data']:
-                ohlc_data = data['data']['ohlc']
-                print(f"  获取到 {len(ohlc_data)} 条数据")
-                all_data.extend(ohlc_data)
-            else:
-                print(f"  未获取到数据")
-                break
-            
-            # 更新下一批次的结束时间
-            current_end = current_start
-            
-            # 如果已经到达起始日期，退出
-            if current_end <= start_date:
-                break
-            
-            # 延时，避免API限流
-            time.sleep(API_REQUEST_INTERVAL)
-        
-        print(f"\n总共获取 {len(all_data)} 条数据")
+        print(f"时间范围: {start_date.strftime('%Y-%m-%d')} 至 {end_date.strftime('%Y-%m-%d')}，"
+              f"共 {len(windows)} 批，{max_workers} 个并发")
+        
+        all_data = []
+        total_count = 0
+        last_timestamp = None
+        
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            # map 按提交顺序返回结果：后面的窗口先完成时会等待前面的窗口，
+            # 保证交给 on_page 的数据总是连续的时间前缀
+            try:
+                for batch_count, ohlc_data in enumerate(executor.map(self.fetch_window, windows), 1):
+                    # 按时间戳排序并去掉与已输出数据重复的K线
+                    ohlc_data = sorted(ohlc_data, key=lambda candle: int(candle['timestamp']))
+                    if last_timestamp is not None:
+                        ohlc_data = [c for c in ohlc_data if int(c['timestamp']) > last_timestamp]
+                    if ohlc_data:
+                        last_timestamp = int(ohlc_data[-1]['timestamp'])
+                    
+                    window_start, window_end = windows[batch_count - 1]
+                    print(f"  批次 {batch_count}/{len(windows)}: {window_start.strftime('%Y-%m-%d %H:%M')} "
+                          f"至 {window_end.strftime('%Y-%m-%d %H:%M')}，获取到 {len(ohlc_data)} 条数据")
+                    total_count += len(ohlc_data)
+                    
+                    if on_page:
+                        on_page(ohlc_data)
+                    else:
+                        all_data.extend(ohlc_data)
+            except Exception:
+                # 某个窗口失败时取消尚未开始的窗口，已输出的前缀不受影响
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+        
+        print(f"\n总共获取 {total_count} 条数据")
         return all_data
     
     def parse_ohlc_data(self, ohlc_data):
@@ -185,7 +229,7 @@ class BitstampDataFetcher:
             print("没有数据需要保存")
             return
         
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = connect()
         cursor = conn.cursor()
         
         # 确保交易对存在
@@ -198,39 +242,10 @@ class BitstampDataFetcher:
         cursor.execute("SELECT id FROM symbols WHERE symbol = ?", (symbol_name,))
         symbol_id = cursor.fetchone()[0]
         
-        # 插入小时数据（用于计算周数据）
-        inserted_count = 0
-        updated_count = 0
-        
-        for data in parsed_data:
-            # 检查是否已存在
-            cursor.execute("""
-                SELECT id FROM hourly_data 
-                WHERE symbol_id = ? AND timestamp = ?
-            """, (symbol_id, data['timestamp']))
-            
-            existing = cursor.fetchone()
-            
-            if existing:
-                # 更新现有数据
-                cursor.execute("""
-                    UPDATE hourly_data 
-                    SET open = ?, high = ?, low = ?, close = ?, volume = ?
-                    WHERE id = ?
-                """, (data['open'], data['high'], data['low'], data['close'], 
-                      data['volume'], existing[0]))
-                updated_count += 1
-            else:
-                # 插入新数据
-                cursor.execute("""
-                    INSERT INTO hourly_data 
-                    (symbol_id, timestamp, datetime, open, high, low, close, volume)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (symbol_id, data['timestamp'], data['datetime'].strftime('%Y-%m-%d %H:%M:%S'),
-                      data['open'], data['high'], data['low'], data['close'], data['volume']))
-                inserted_count += 1
-        
-        conn.commit()
+        candles = [(d['timestamp'], d['open'], d['high'], d['low'], d['close'], d['volume'])
+                   for d in parsed_data]
+        inserted_count, updated_count = save_hourly_candles(conn, symbol_id, candles, 'bitstamp_api')
+        
         conn.close()
         
         print(f"\n数据保存完成:")
@@ -244,49 +259,17 @@ def main(force_update=False):
     print("Bitstamp 数据获取")
     print("=" * 60)
     
-    # 初始化数据获取器
-    fetcher = BitstampDataFetcher(pair='btcusd')
-    
-    # 确定获取数据的时间范围
-    if force_update:
-        # 从2011年开始（Bitstamp成立时间）
-        start_date = datetime(2011, 9, 1, tzinfo=TZ_UTC9)
-    else:
-        # 增量更新：从数据库最后一条数据开始
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT MAX(timestamp) FROM hourly_data 
-            WHERE symbol_id = (SELECT id FROM symbols WHERE symbol = 'BTCUSD')
-        """)
-        last_timestamp = cursor.fetchone()[0]
-        conn.close()
-        
-        if last_timestamp:
-            start_date = datetime.fromtimestamp(last_timestamp, tz=TZ_UTC9)
-            print(f"增量更新，从 {start_date.strftime('%Y-%m-%d %H:%M')} 开始")
-        else:
-            start_date = datetime(2011, 9, 1, tzinfo=TZ_UTC9)
-            print("首次获取，从2011年开始")
-    
-    # 获取数据
-    ohlc_data = fetcher.fetch_historical_data(start_date)
-    
-    if not ohlc_data:
-        print("未获取到数据")
-        return False
-    
-    # 解析数据
-    parsed_data = fetcher.parse_ohlc_data(ohlc_data)
-    
-    # 保存到数据库
-    fetcher.save_to_database(parsed_data, symbol_name='BTCUSD')
+    # 所有Bitstamp交易对并发获取，共享Bitstamp令牌桶；
+    # 小时K线写入本地存储后聚合周数据和日数据
+    jobs = [(s['name'], fetch_symbol_data, (s, force_update))
+            for s in symbols_for_exchange('bitstamp')]
+    results = run_fetch_jobs(jobs)
     
     print("\n" + "=" * 60)
     print("Bitstamp 数据获取完成")
     print("=" * 60)
     
-    return True
+    return bool(results) and all(results.values())
 
 
 if __name__ == '__main__':
@@ -3,8 +3,6 @@ Binance API 数据获取脚本
 从Binance获取历史K线数据并存入数据库
 """
 
-import requests
-import sqlite3
 import time
 import os
 import sys
@@ -15,16 +13,36 @@ import json
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import (
-    DATABASE_PATH, BINANCE_API_BASE, BINANCE_FUTURES_API_BASE,
-    SYMBOLS, TZ_UTC9, API_REQUEST_INTERVAL, QUALITY_THRESHOLDS,
+    BINANCE_API_BASE, BINANCE_FUTURES_API_BASE,
+    TZ_UTC9, QUALITY_THRESHOLDS,
     WEEK_START_HOUR, WEEK_START_MINUTE, DATA_DIR
 )
+from scripts.db import connect
+from scripts.rate_limiter import get_limiter, binance_klines_weight, update_binance_limits
+from scripts.http_client import get_json, now_utc9
+from scripts.fetch_scheduler import run_fetch_jobs, symbols_for_exchange
+from scripts.fetch_bitstamp_data import BitstampDataFetcher, BITSTAMP_EARLIEST_DATE
+from scripts.hourly_store import (
+    save_hourly_candles, binance_klines_to_candles, load_hourly_klines, get_hourly_range,
+    aggregate_klines
+)
+from scripts.db_writer import BatchWriter, filter_changed_rows
+from scripts.dirty_ranges import mark_dirty
+from scripts.checkpoints import (
+    get_checkpoint, start_checkpoint, advance_checkpoint, finish_checkpoint, STATUS_RUNNING
+)
 
 import pytz
 
 # UTC时区
 TZ_UTC = pytz.UTC
 
+# Binance期货上线时间，查询最早数据失败时使用
+BINANCE_FUTURES_LAUNCH_DATE = TZ_UTC9.localize(datetime(2019, 9, 8, 8, 0, 0))
+
+# 本地K线存储的周期（检查点按此记录）
+HOURLY_TIMEFRAME = '1h'
+
 
 def get_week_boundaries(date_utc9):
     """
@@ -84,7 +102,7 @@ def utc_to_utc9(dt_utc):
     return dt_utc.astimezone(TZ_UTC9)
 
 
-def fetch_klines_from_binance(symbol, start_time_utc, end_time_utc, use_futures=True):
+def fetch_klines_from_binance(symbol, start_time_utc, end_time_utc, use_futures=True, on_page=None):
     """
     从Binance获取K线数据
     
@@ -93,13 +111,21 @@ def fetch_klines_from_binance(symbol, start_time_utc, end_time_utc, use_futures=
         start_time_utc: 开始时间（UTC）
         end_time_utc: 结束时间（UTC）
         use_futures: 是否使用期货API
+        on_page: 每获取一页就调用 on_page(klines)，用于边获取边写入数据库；
+                 指定时不在内存中累积K线
     
     Returns:
-        list: K线数据列表
+        list: K线数据列表（指定on_page时为空列表）
+    
+    Raises:
+        requests.exceptions.RequestException: 超过最大重试次数仍失败（已交给on_page的页不受影响）
     """
     base_url = BINANCE_FUTURES_API_BASE if use_futures else BINANCE_API_BASE
     url = f"{base_url}/klines"
     
+    limiter = get_limiter('binance')
+    weight = binance_klines_weight(1500, use_futures)
+    
     all_klines = []
     current_start = int(start_time_utc.timestamp() * 1000)
     end_ms = int(end_time_utc.timestamp() * 1000)
@@ -113,30 +139,24 @@ def fetch_klines_from_binance(symbol, start_time_utc, end_time_utc, use_futures=
             'limit': 1500  # 最大限制
         }
         
-        try:
-            response = requests.get(url, params=params, timeout=30)
-            response.raise_for_status()
-            klines = response.json()
-            
-            if not klines:
-                break
-            
+        # 等待共享令牌桶放行，失败时按指数退避重试，超过重试次数则抛出异常
+        klines = get_json(url, params, limiter=limiter, cost=weight,
+                          update_limits=update_binance_limits)
+        
+        if not klines:
+            break
+        
+        if on_page:
+            on_page(klines)
+        else:
             all_klines.extend(klines)
-            
-            # 更新起始时间为最后一条数据的时间 + 1毫秒
-            current_start = klines[-1][0] + 1
-            
-            # 如果返回数据少于限制，说明已获取完毕
-            if len(klines) < 1500:
-                break
-            
-            # 避免请求过快
-            time.sleep(API_REQUEST_INTERVAL)
-            
-        except requests.exceptions.RequestException as e:
-            print(f"  API请求错误: {e}")
-            time.sleep(5)  # 出错后等待5秒重试
-            continue
+        
+        # 更新起始时间为最后一条数据的时间 + 1毫秒
+        current_start = klines[-1][0] + 1
+        
+        # 如果返回数据少于限制，说明已获取完毕
+        if len(klines) < 1500:
+            break
     
     return all_klines
 
@@ -156,27 +176,44 @@ def process_klines_to_weekly(klines, week_start_utc9, week_end_utc9):
     if not klines:
         return None
     
-    # 转换为UTC时间戳范围
-    start_ts = utc9_to_utc(week_start_utc9).timestamp() * 1000
-    end_ts = utc9_to_utc(week_end_utc9).timestamp() * 1000
+    aggregated = aggregate_klines(klines, *week_bucket_bounds([(week_start_utc9, week_end_utc9)]))
     
-    # 过滤在时间范围内的K线
-    valid_klines = [k for k in klines if start_ts <= k[0] <= end_ts]
+    return weekly_data_at(aggregated, 0)
+
+
+def week_bucket_bounds(weeks):
+    """
+    将周列表转换为 aggregate_klines 使用的区间边界
     
-    if not valid_klines:
-        return None
+    Args:
+        weeks: 周列表，每项以 (周开始, 周结束) 开头（UTC+9）
     
-    # 提取价格数据
-    # K线格式: [开盘时间, 开盘价, 最高价, 最低价, 收盘价, 成交量, ...]
-    high_prices = [float(k[2]) for k in valid_klines]
-    low_prices = [float(k[3]) for k in valid_klines]
+    Returns:
+        tuple: (开始时间戳列表, 结束时间戳列表)，单位毫秒
+    """
+    starts = [utc9_to_utc(week[0]).timestamp() * 1000 for week in weeks]
+    ends = [utc9_to_utc(week[1]).timestamp() * 1000 for week in weeks]
+    return starts, ends
+
+
+def weekly_data_at(aggregated, i):
+    """
+    从 aggregate_klines 的结果中取出第i周的周数据
+    
+    Returns:
+        dict: 周数据，该周无K线时返回None
+    """
+    data_points = int(aggregated['data_points'][i])
+    
+    if not data_points:
+        return None
     
     return {
-        'week_high': max(high_prices),
-        'week_low': min(low_prices),
-        'week_open': float(valid_klines[0][1]),
-        'week_close': float(valid_klines[-1][4]),
-        'data_points': len(valid_klines)
+        'week_high': float(aggregated['high'][i]),
+        'week_low': float(aggregated['low'][i]),
+        'week_open': float(aggregated['open'][i]),
+        'week_close': float(aggregated['close'][i]),
+        'data_points': data_points
     }
 
 
@@ -244,9 +281,14 @@ def generate_all_weeks(start_date_utc9, end_date_utc9):
         current = week_end + timedelta(seconds=1)
 
 
-def get_earliest_available_date(symbol, use_futures=True):
+def get_earliest_available_date(symbol, use_futures=True, default=BINANCE_FUTURES_LAUNCH_DATE):
     """
     获取Binance上该交易对最早可用数据的日期
+    
+    Args:
+        symbol: 交易对符号
+        use_futures: 是否使用期货API
+        default: 查询失败时返回的日期
     """
     base_url = BINANCE_FUTURES_API_BASE if use_futures else BINANCE_API_BASE
     url = f"{base_url}/klines"
@@ -261,10 +303,11 @@ def get_earliest_available_date(symbol, use_futures=True):
         'limit': 1
     }
     
+    limiter = get_limiter('binance')
+    
     try:
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        klines = response.json()
+        klines = get_json(url, params, limiter=limiter, cost=binance_klines_weight(1, use_futures),
+                          update_limits=update_binance_limits)
         
         if klines:
             earliest_ts = klines[0][0] / 1000
@@ -273,51 +316,233 @@ def get_earliest_available_date(symbol, use_futures=True):
     except Exception as e:
         print(f"  获取最早日期失败: {e}")
     
-    # 默认返回2019年9月（Binance期货上线时间）
-    return TZ_UTC9.localize(datetime(2019, 9, 8, 8, 0, 0))
+    return default
+
+
+def get_last_complete_week_end(now_utc9):
+    """
+    获取指定时间之前最后一个完整周的结束时间（周一早上7:59:59，UTC+9）
+    """
+    week_start, _ = get_week_boundaries(now_utc9)
+    
+    # 周一早上8点之前仍属于上一周
+    if week_start > now_utc9:
+        week_start = week_start - timedelta(days=7)
+    
+    return week_start - timedelta(seconds=1)
+
+
+def get_sync_end_date(now_utc9):
+    """
+    获取小时K线需要同步到的时间（UTC+9）
+    
+    周数据需要到上一个完整周结束，日数据需要到昨天结束，取两者中较晚者，
+    保证 hourly_data 中只存储已收盘的K线
+    """
+    today_start = now_utc9.replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(get_last_complete_week_end(now_utc9), today_start - timedelta(seconds=1))
+
+
+def get_symbol_id(conn, symbol):
+    """获取交易对ID，不存在时返回None"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM symbols WHERE symbol = ?", (symbol,))
+    result = cursor.fetchone()
+    return result[0] if result else None
 
 
-def fetch_and_store_weekly_data(symbol_config, conn, force_update=False):
+def get_data_start_date(symbol_config, conn, symbol_id, refresh=False):
     """
-    获取并存储周数据
+    获取交易对在交易所最早可用数据的日期（UTC+9）
+    
+    查询结果保存在 symbols.data_start_date，之后直接使用，只有refresh时重新查询
     
     Args:
         symbol_config: 交易对配置
         conn: 数据库连接
-        force_update: 是否强制更新所有数据
+        symbol_id: 交易对ID
+        refresh: 是否忽略已保存的日期重新查询（--force）
     """
     cursor = conn.cursor()
+    
+    if not refresh:
+        cursor.execute("SELECT data_start_date FROM symbols WHERE id = ?", (symbol_id,))
+        cached = cursor.fetchone()[0]
+        
+        if cached:
+            return TZ_UTC9.localize(datetime.strptime(cached, '%Y-%m-%d %H:%M:%S'))
+    
+    if symbol_config.get('exchange', 'binance') == 'bitstamp':
+        earliest_date = BITSTAMP_EARLIEST_DATE
+    else:
+        print(f"  检查Binance数据可用性...")
+        earliest_date = get_earliest_available_date(symbol_config['api_symbol'],
+                                                    symbol_config.get('use_futures', True),
+                                                    default=None)
+        
+        # 查询失败时使用默认日期，但不保存，下次运行重新查询
+        if earliest_date is None:
+            return BINANCE_FUTURES_LAUNCH_DATE
+    
+    # 更新symbols表中的data_start_date
+    cursor.execute("""
+        UPDATE symbols SET data_start_date = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    """, (earliest_date.strftime('%Y-%m-%d %H:%M:%S'), symbol_id))
+    # 立即提交，避免在网络请求期间持有写锁阻塞其他并发任务
+    conn.commit()
+    
+    return earliest_date
+
+
+def fetch_hourly_candles(symbol_config, start_date, end_date, on_page):
+    """
+    从交易所按页获取小时K线，按时间顺序逐页交给 on_page 处理
+    
+    Args:
+        symbol_config: 交易对配置
+        start_date: 开始时间（UTC+9）
+        end_date: 结束时间（UTC+9）
+        on_page: 回调函数 on_page(candles)，
+                 candles 为 [(timestamp秒, open, high, low, close, volume), ...]
+    """
+    if symbol_config.get('exchange', 'binance') == 'bitstamp':
+        fetcher = BitstampDataFetcher(pair=symbol_config['api_symbol'])
+        start_ts = start_date.timestamp()
+        end_ts = end_date.timestamp()
+        
+        def on_bitstamp_page(ohlc_data):
+            # Bitstamp按1000小时窗口获取，会超出请求范围，只保留范围内的K线
+            on_page([(d['timestamp'], d['open'], d['high'], d['low'], d['close'], d['volume'])
+                     for d in fetcher.parse_ohlc_data(ohlc_data)
+                     if start_ts <= d['timestamp'] <= end_ts])
+        
+        fetcher.fetch_historical_data(start_date, end_date, on_page=on_bitstamp_page)
+        return
+    
+    fetch_klines_from_binance(symbol_config['api_symbol'], utc9_to_utc(start_date),
+                              utc9_to_utc(end_date), symbol_config.get('use_futures', True),
+                              on_page=lambda klines: on_page(binance_klines_to_candles(klines)))
+
+
+def sync_hourly_data(symbol_config, conn, force_update=False):
+    """
+    同步交易对的1小时K线到本地存储 hourly_data
+    
+    增量模式只获取本地最后一条K线之后的数据，没有新数据时不发送任何请求；
+    强制模式从交易所最早数据开始重新获取。
+    每获取一页就写入数据库并推进检查点，中断后重新运行（包括强制模式）从检查点继续。
+    周数据和日数据都从本地存储聚合，不再各自请求API。
+    
+    Args:
+        symbol_config: 交易对配置
+        conn: 数据库连接
+        force_update: 是否强制重新获取所有数据
+    
+    Returns:
+        int: 写入的K线条数
+    """
     symbol = symbol_config['name']
-    api_symbol = symbol_config['api_symbol']
-    use_futures = symbol_config.get('use_futures', True)
+    exchange = symbol_config.get('exchange', 'binance')
+    
+    print(f"\n同步小时K线: {symbol} ({exchange})")
+    print("-" * 40)
+    
+    symbol_id = get_symbol_id(conn, symbol)
+    
+    if symbol_id is None:
+        print(f"  错误: 交易对 {symbol} 不存在于数据库中")
+        return 0
+    
+    end_date = get_sync_end_date(now_utc9())
+    
+    # 确定开始时间
+    checkpoint = get_checkpoint(conn, symbol_id, HOURLY_TIMEFRAME)
+    
+    if checkpoint and checkpoint['status'] == STATUS_RUNNING:
+        # 上次获取中断，从检查点继续
+        range_start = datetime.fromtimestamp(checkpoint['range_start'], tz=TZ_UTC9)
+        if checkpoint['last_timestamp'] is not None:
+            start_date = datetime.fromtimestamp(checkpoint['last_timestamp'], tz=TZ_UTC9) + timedelta(hours=1)
+        else:
+            start_date = range_start
+        print(f"  上次获取中断，从检查点继续: {start_date.strftime('%Y-%m-%d %H:%M')}")
+    else:
+        _, last_hour = get_hourly_range(conn, symbol_id)
+        
+        if force_update or last_hour is None:
+            # 只有需要从头获取时才用到最早可用日期
+            start_date = get_data_start_date(symbol_config, conn, symbol_id, refresh=force_update)
+            print(f"  最早可用数据: {start_date.strftime('%Y-%m-%d')}")
+        else:
+            start_date = last_hour + timedelta(hours=1)
+        range_start = start_date
+    
+    if start_date > end_date:
+        print("  小时K线已是最新，无需获取")
+        if checkpoint and checkpoint['status'] == STATUS_RUNNING:
+            finish_checkpoint(conn, symbol_id, HOURLY_TIMEFRAME)
+        return 0
+    
+    print(f"  获取范围: {start_date.strftime('%Y-%m-%d %H:%M')} 到 {end_date.strftime('%Y-%m-%d %H:%M')}")
+    
+    start_checkpoint(conn, symbol_id, HOURLY_TIMEFRAME, range_start.timestamp(), end_date.timestamp(),
+                     last_timestamp=checkpoint['last_timestamp'] if start_date > range_start else None)
+    
+    totals = {'inserted': 0, 'updated': 0}
+    
+    def on_page(candles):
+        # 每页立即写入数据库并推进检查点
+        if not candles:
+            return
+        inserted, updated = save_hourly_candles(conn, symbol_id, candles, f'{exchange}_api')
+        advance_checkpoint(conn, symbol_id, HOURLY_TIMEFRAME, max(c[0] for c in candles))
+        totals['inserted'] += inserted
+        totals['updated'] += updated
+    
+    fetch_hourly_candles(symbol_config, start_date, end_date, on_page)
+    finish_checkpoint(conn, symbol_id, HOURLY_TIMEFRAME)
+    
+    print(f"  小时K线 新增: {totals['inserted']}, 更新: {totals['updated']}")
+    
+    return totals['inserted'] + totals['updated']
+
+
+def fetch_and_store_weekly_data(symbol_config, conn, force_update=False, sync=True):
+    """
+    从本地小时K线存储聚合并保存周数据
+    
+    Args:
+        symbol_config: 交易对配置
+        conn: 数据库连接
+        force_update: 是否强制重新计算所有周数据
+        sync: 聚合前是否先同步小时K线（调度器已同步时传False）
+    """
+    cursor = conn.cursor()
+    symbol = symbol_config['name']
+    
+    if sync:
+        sync_hourly_data(symbol_config, conn, force_update)
     
     print(f"\n处理交易对: {symbol}")
     print("-" * 40)
     
     # 获取symbol_id
-    cursor.execute("SELECT id, data_start_date FROM symbols WHERE symbol = ?", (symbol,))
-    result = cursor.fetchone()
+    symbol_id = get_symbol_id(conn, symbol)
     
-    if not result:
+    if symbol_id is None:
         print(f"  错误: 交易对 {symbol} 不存在于数据库中")
         return
     
-    symbol_id = result[0]
+    first_hour, last_hour = get_hourly_range(conn, symbol_id)
     
-    # 获取最早可用数据日期
-    print(f"  检查Binance数据可用性...")
-    earliest_date = get_earliest_available_date(api_symbol, use_futures)
-    print(f"  最早可用数据: {earliest_date.strftime('%Y-%m-%d')}")
-    
-    # 更新symbols表中的data_start_date
-    cursor.execute("""
-        UPDATE symbols SET data_start_date = ?, updated_at = CURRENT_TIMESTAMP
-        WHERE id = ?
-    """, (earliest_date.strftime('%Y-%m-%d %H:%M:%S'), symbol_id))
+    if first_hour is None:
+        print("  本地没有小时K线数据，跳过")
+        return
     
     # 确定开始日期
     if force_update:
-        start_date = earliest_date
+        start_date = first_hour
     else:
         # 查找数据库中最后一条记录
         cursor.execute("""
@@ -330,29 +555,20 @@ def fetch_and_store_weekly_data(symbol_config, conn, force_update=False):
             start_date = start_date + timedelta(seconds=1)
             print(f"  从上次更新点继续: {start_date.strftime('%Y-%m-%d')}")
         else:
-            start_date = earliest_date
+            start_date = first_hour
     
-    # 确定结束日期（当前时间的上一个完整周）
-    now_utc9 = datetime.now(TZ_UTC9)
-    _, current_week_end = get_week_boundaries(now_utc9)
-    
-    # 如果当前周还未结束，使用上一周的结束时间
-    if now_utc9 < current_week_end:
-        end_date = current_week_end - timedelta(days=7)
-    else:
-        end_date = current_week_end
+    # 确定结束日期：本地K线覆盖范围内的最后一个完整周
+    end_date = get_last_complete_week_end(min(now_utc9(), last_hour + timedelta(hours=1)))
     
     print(f"  数据范围: {start_date.strftime('%Y-%m-%d')} 到 {end_date.strftime('%Y-%m-%d')}")
     
     # 如果开始日期已经超过结束日期，无需更新
     if start_date >= end_date:
-        print(f"  数据已是最新，无需更新")
+        print("  数据已是最新，无需更新")
         return
     
     # 记录更新日志
     update_start_time = time.time()
-    records_added = 0
-    records_updated = 0
     
     # 获取所有需要处理的周
     weeks = list(generate_all_weeks(start_date, end_date))
@@ -360,89 +576,66 @@ def fetch_and_store_weekly_data(symbol_config, conn, force_update=False):
     
     print(f"  需要处理 {total_weeks} 周的数据...")
     
+    # 从本地存储一次性读取整个范围的小时K线，一次数组运算聚合出所有周
+    all_klines = load_hourly_klines(conn, symbol_id, start_date, end_date)
+    aggregated = aggregate_klines(all_klines, *week_bucket_bounds(weeks))
+    
+    rows = []
+    
     for i, (week_start, week_end, year, month, week_of_year, week_of_month) in enumerate(weeks):
-        # 显示进度
-        if (i + 1) % 10 == 0 or i == 0:
-            print(f"  处理进度: {i + 1}/{total_weeks} ({(i + 1) * 100 // total_weeks}%)")
-        
-        # 转换为UTC时间用于API查询
-        week_start_utc = utc9_to_utc(week_start)
-        week_end_utc = utc9_to_utc(week_end)
-        
-        # 获取K线数据
-        klines = fetch_klines_from_binance(api_symbol, week_start_utc, week_end_utc, use_futures)
-        
-        if not klines:
-            print(f"    警告: {week_start.strftime('%Y-%m-%d')} 周无数据")
-            continue
-        
-        # 处理K线数据
-        weekly_data = process_klines_to_weekly(klines, week_start, week_end)
+        weekly_data = weekly_data_at(aggregated, i)
         
         if not weekly_data:
+            print(f"    警告: {week_start.strftime('%Y-%m-%d')} 周无数据")
             continue
         
         # 计算数据质量分数
         quality_score = calculate_data_quality(weekly_data['data_points'])
         
-        # 检查是否已存在
-        cursor.execute("""
-            SELECT id FROM weekly_data WHERE symbol_id = ? AND week_start = ?
-        """, (symbol_id, week_start.strftime('%Y-%m-%d %H:%M:%S')))
-        
-        existing = cursor.fetchone()
+        rows.append((symbol_id,
+                     week_start.strftime('%Y-%m-%d %H:%M:%S'),
+                     week_end.strftime('%Y-%m-%d %H:%M:%S'),
+                     utc9_to_utc(week_start).strftime('%Y-%m-%d %H:%M:%S'),
+                     utc9_to_utc(week_end).strftime('%Y-%m-%d %H:%M:%S'),
+                     year, month, week_of_year, week_of_month,
+                     weekly_data['week_high'], weekly_data['week_low'],
+                     weekly_data['week_open'], weekly_data['week_close'],
+                     weekly_data['data_points'], quality_score))
+    
+    columns = ['symbol_id', 'week_start', 'week_end', 'week_start_utc', 'week_end_utc',
+               'year', 'month', 'week_of_year', 'week_of_month',
+               'week_high', 'week_low', 'week_open', 'week_close',
+               'data_points', 'data_quality_score']
+    update_columns = ['week_high', 'week_low', 'week_open', 'week_close',
+                      'data_points', 'data_quality_score']
+    
+    # 只写入新增或有变化的周，并记录范围供模式计算增量重算
+    rows = filter_changed_rows(conn, 'weekly_data', columns, rows,
+                               ['symbol_id', 'week_start'], update_columns)
+    
+    # 变化范围、数据和更新日志在同一个工作单元内提交
+    with BatchWriter(conn) as writer:
+        if rows:
+            mark_dirty(conn, symbol_id, 'weekly_data', rows[0][1], rows[-1][1])
         
-        if existing:
-            # 更新记录
-            cursor.execute("""
-                UPDATE weekly_data SET
-                    week_high = ?, week_low = ?, week_open = ?, week_close = ?,
-                    data_points = ?, data_quality_score = ?,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (weekly_data['week_high'], weekly_data['week_low'],
-                  weekly_data['week_open'], weekly_data['week_close'],
-                  weekly_data['data_points'], quality_score, existing[0]))
-            records_updated += 1
-        else:
-            # 插入新记录
-            cursor.execute("""
-                INSERT INTO weekly_data
-                (symbol_id, week_start, week_end, week_start_utc, week_end_utc,
-                 year, month, week_of_year, week_of_month,
-                 week_high, week_low, week_open, week_close,
-                 data_points, data_quality_score)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (symbol_id,
-                  week_start.strftime('%Y-%m-%d %H:%M:%S'),
-                  week_end.strftime('%Y-%m-%d %H:%M:%S'),
-                  week_start_utc.strftime('%Y-%m-%d %H:%M:%S'),
-                  week_end_utc.strftime('%Y-%m-%d %H:%M:%S'),
-                  year, month, week_of_year, week_of_month,
-                  weekly_data['week_high'], weekly_data['week_low'],
-                  weekly_data['week_open'], weekly_data['week_close'],
-                  weekly_data['data_points'], quality_score))
-            records_added += 1
+        # 批量写入（已存在的周则更新价格数据）
+        records_added, records_updated = writer.upsert(
+            'weekly_data', columns, rows,
+            conflict_columns=['symbol_id', 'week_start'],
+            update_columns=update_columns
+        )
         
-        # 每50条提交一次
-        if (records_added + records_updated) % 50 == 0:
-            conn.commit()
-    
-    conn.commit()
-    
-    # 记录更新日志
-    execution_time = time.time() - update_start_time
-    cursor.execute("""
-        INSERT INTO update_logs
-        (symbol_id, update_type, start_date, end_date, records_added, records_updated,
-         status, execution_time_seconds)
-        VALUES (?, ?, ?, ?, ?, ?, 'SUCCESS', ?)
-    """, (symbol_id, 'FULL' if force_update else 'INCREMENTAL',
-          start_date.strftime('%Y-%m-%d %H:%M:%S'),
-          end_date.strftime('%Y-%m-%d %H:%M:%S'),
-          records_added, records_updated, execution_time))
-    
-    conn.commit()
+        # 记录更新日志
+        execution_time = time.time() - update_start_time
+        writer.execute("""
+            INSERT INTO update_logs
+            (symbol_id, update_type, start_date, end_date, records_added, records_updated,
+             status, execution_time_seconds)
+            VALUES (?, ?, ?, ?, ?, ?, 'SUCCESS', ?)
+        """, (symbol_id, 'FULL' if force_update else 'INCREMENTAL',
+              start_date.strftime('%Y-%m-%d %H:%M:%S'),
+              end_date.strftime('%Y-%m-%d %H:%M:%S'),
+              records_added, records_updated, execution_time))
     
     print(f"\n  完成! 新增: {records_added}, 更新: {records_updated}, 耗时: {execution_time:.1f}秒")
 
@@ -460,6 +653,20 @@ def update_system_config(conn):
     conn.commit()
 
 
+def fetch_symbol_weekly_data(symbol_config, force_update=False):
+    """
+    获取单个交易对的周数据（供并发调度器调用）
+    
+    每个任务使用独立的数据库连接，SQLite连接不能跨线程共享
+    """
+    conn = connect()
+    
+    try:
+        fetch_and_store_weekly_data(symbol_config, conn, force_update)
+    finally:
+        conn.close()
+
+
 def main(force_update=False):
     """主函数"""
     print("=" * 60)
@@ -467,14 +674,15 @@ def main(force_update=False):
     print("=" * 60)
     print(f"当前时间(UTC+9): {datetime.now(TZ_UTC9).strftime('%Y-%m-%d %H:%M:%S')}")
     
+    # 所有Binance交易对并发获取，共享Binance令牌桶
+    jobs = [(s['name'], fetch_symbol_weekly_data, (s, force_update))
+            for s in symbols_for_exchange('binance')]
+    run_fetch_jobs(jobs)
+    
     # 连接数据库
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = connect()
     
     try:
-        # 处理每个交易对
-        for symbol_config in SYMBOLS:
-            fetch_and_store_weekly_data(symbol_config, conn, force_update)
-        
         # 更新系统配置
         update_system_config(conn)
         
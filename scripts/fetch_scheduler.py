@@ -0,0 +1,119 @@
+"""
+并发数据获取调度器
+所有交易对、所有交易所的获取任务在线程池中并行执行，
+各交易所的请求频率由 rate_limiter 中的共享令牌桶控制
+"""
+
+import os
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import SYMBOLS, TZ_UTC9, FETCH_MAX_WORKERS
+from scripts.db import connect
+
+
+def run_fetch_jobs(jobs, max_workers=FETCH_MAX_WORKERS):
+    """
+    并发执行获取任务
+
+    Args:
+        jobs: 任务列表 [(任务名, 函数, 参数元组), ...]
+              每个任务需自行打开数据库连接（SQLite连接不能跨线程共享）
+        max_workers: 最大线程数
+
+    Returns:
+        dict: 任务名 -> 是否成功
+    """
+    results = {}
+
+    if not jobs:
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+        futures = {executor.submit(func, *args): name for name, func, args in jobs}
+
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result = future.result()
+                results[name] = result is not False
+            except Exception as e:
+                print(f"\n任务 {name} 失败: {e}")
+                traceback.print_exc()
+                results[name] = False
+
+    return results
+
+
+def symbols_for_exchange(exchange):
+    """获取指定交易所的交易对配置"""
+    return [s for s in SYMBOLS if s.get('exchange', 'binance') == exchange]
+
+
+def fetch_symbol_data(symbol_config, force_update=False):
+    """
+    获取单个交易对的全部数据（供并发调度器调用）
+
+    先同步一次小时K线到本地存储，再从本地存储聚合周数据和日数据，
+    每个交易对每次运行只请求一次交易所API
+    """
+    from scripts.fetch_data import sync_hourly_data, fetch_and_store_weekly_data
+    from scripts.fetch_daily_data import fetch_and_store_daily_data
+
+    conn = connect()
+
+    try:
+        sync_hourly_data(symbol_config, conn, force_update)
+        fetch_and_store_weekly_data(symbol_config, conn, force_update, sync=False)
+        fetch_and_store_daily_data(symbol_config, conn, force_update, sync=False)
+    finally:
+        conn.close()
+
+    return True
+
+
+def main(force_update=False, include_bitstamp=True):
+    """
+    主函数：并发获取所有交易所、所有交易对的数据
+
+    Args:
+        force_update: 是否强制重新获取所有数据
+        include_bitstamp: 是否同时获取Bitstamp数据
+    """
+    from scripts.fetch_data import update_system_config
+
+    print("=" * 60)
+    print("并发数据获取")
+    print("=" * 60)
+    print(f"当前时间(UTC+9): {datetime.now(TZ_UTC9).strftime('%Y-%m-%d %H:%M:%S')}")
+
+    jobs = [(f"binance:{s['name']}", fetch_symbol_data, (s, force_update))
+            for s in symbols_for_exchange('binance')]
+
+    if include_bitstamp:
+        jobs += [(f"bitstamp:{s['name']}", fetch_symbol_data, (s, force_update))
+                 for s in symbols_for_exchange('bitstamp')]
+
+    print(f"共 {len(jobs)} 个获取任务，最多 {FETCH_MAX_WORKERS} 个并发")
+
+    results = run_fetch_jobs(jobs)
+
+    conn = connect()
+    try:
+        update_system_config(conn)
+    finally:
+        conn.close()
+
+    print("\n" + "=" * 60)
+    for name, ok in results.items():
+        print(f"  {'✓' if ok else '✗'} {name}")
+    print("=" * 60)
+
+    if not all(results.values()):
+        raise RuntimeError("部分获取任务失败")
+
+    return True
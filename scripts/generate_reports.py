@@ -3,7 +3,6 @@
 生成Excel和PDF格式的分析报告
 """
 
-import sqlite3
 import os
 import sys
 from datetime import datetime
@@ -11,17 +10,22 @@ from datetime import datetime
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import DATABASE_PATH, REPORTS_DIR, TZ_UTC9, REPORT_CONFIG
+from config import REPORTS_DIR, TZ_UTC9, REPORT_CONFIG, REPORT_WORKERS, CHART_FIGSIZE
+from scripts.excel_writer import open_excel_writer, write_sheet, MONTHLY_PATTERN_FILLS
+from scripts.report_data import (
+    open_report_data, input_fingerprint, report_is_current, save_fingerprint, publish_latest
+)
 
-import pandas as pd
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.chart import BarChart, PieChart, Reference
 from openpyxl.chart.label import DataLabelList
 
 
-def get_monthly_data(conn):
+# 报告使用的数据表（输入指纹）
+REPORT_TABLES = ['symbols', 'monthly_patterns']
+
+def get_monthly_data(data):
     """获取月度详细数据"""
     query = """
         SELECT 
@@ -43,10 +47,10 @@ def get_monthly_data(conn):
         JOIN symbols s ON mp.symbol_id = s.id
         ORDER BY s.symbol, mp.year, mp.month
     """
-    return pd.read_sql_query(query, conn)
+    return data.query(query)
 
 
-def get_yearly_summary(conn):
+def get_yearly_summary(data):
     """获取年度汇总数据"""
     query = """
         SELECT 
@@ -66,10 +70,10 @@ def get_yearly_summary(conn):
         GROUP BY s.symbol, mp.year
         ORDER BY s.symbol, mp.year
     """
-    return pd.read_sql_query(query, conn)
+    return data.query(query)
 
 
-def get_overall_summary(conn):
+def get_overall_summary(data):
     """获取总体汇总数据"""
     query = """
         SELECT 
@@ -85,10 +89,10 @@ def get_overall_summary(conn):
         JOIN symbols s ON mp.symbol_id = s.id
         GROUP BY s.symbol
     """
-    return pd.read_sql_query(query, conn)
+    return data.query(query)
 
 
-def get_pattern_distribution(conn):
+def get_pattern_distribution(data):
     """获取模式分布数据（按月份统计）"""
     query = """
         SELECT 
@@ -100,181 +104,136 @@ def get_pattern_distribution(conn):
         GROUP BY mp.month
         ORDER BY mp.month
     """
-    return pd.read_sql_query(query, conn)
+    return data.query(query)
 
 
-def style_excel_header(ws, row_num=1):
-    """设置Excel表头样式"""
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True, size=11)
-    header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    
-    for cell in ws[row_num]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = header_alignment
+def excel_report_path():
+    """Excel报告最新版本的路径"""
+    return os.path.join(REPORTS_DIR, 'excel', 'AMDX_XAMD_分析报告_最新.xlsx')
 
 
-def style_data_cells(ws, start_row=2):
-    """设置数据单元格样式"""
-    data_alignment = Alignment(horizontal="center", vertical="center")
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # AMDX用绿色，XAMD用红色
-    amdx_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-    xamd_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+def pdf_report_path():
+    """PDF报告最新版本的路径"""
+    return os.path.join(REPORTS_DIR, 'pdf', 'AMDX_XAMD_分析报告_最新.pdf')
+
+
+def json_data_path():
+    """JSON合并数据的路径"""
+    return os.path.join(REPORTS_DIR, 'data', 'all_data.json')
+
+
+def excel_report_is_current(data):
+    """Excel报告的输入数据与上次生成时相同"""
+    return report_is_current(excel_report_path(), input_fingerprint(data, REPORT_TABLES))
+
+
+def pdf_report_fingerprint(data):
+    """
+    PDF报告的输入指纹：数据表指纹加上图表设置
+
+    安装 matplotlib 或修改图表尺寸后，PDF报告即使数据未变化也会重新生成
+    """
+    from scripts.charts import chart_settings
     
-    for row in ws.iter_rows(min_row=start_row, max_row=ws.max_row):
-        for cell in row:
-            cell.alignment = data_alignment
-            cell.border = thin_border
-            
-            # 模式列着色
-            if cell.value == 'AMDX':
-                cell.fill = amdx_fill
-            elif cell.value == 'XAMD':
-                cell.fill = xamd_fill
-
-
-def auto_adjust_column_width(ws):
-    """自动调整列宽"""
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        
-        for cell in column:
-            try:
-                if cell.value:
-                    cell_length = len(str(cell.value))
-                    # 中文字符算2个宽度
-                    for char in str(cell.value):
-                        if '\u4e00' <= char <= '\u9fff':
-                            cell_length += 1
-                    if cell_length > max_length:
-                        max_length = cell_length
-            except:
-                pass
-        
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
+    return {**input_fingerprint(data, REPORT_TABLES), 'charts': chart_settings()}
+
+
+def pdf_report_is_current(data):
+    """PDF报告的输入数据与上次生成时相同"""
+    return report_is_current(pdf_report_path(), pdf_report_fingerprint(data))
+
+
+def json_data_is_current(data):
+    """JSON数据的输入数据与上次导出时相同"""
+    return report_is_current(json_data_path(), input_fingerprint(data, REPORT_TABLES))
 
 
-def generate_excel_report(conn):
-    """生成Excel报告"""
+def generate_excel_report(data, force=False):
+    """
+    生成Excel报告
+    
+    Args:
+        data: 报告数据层
+        force: 输入数据未变化时也重新生成
+    """
     print("生成Excel报告...")
     
+    if not force and excel_report_is_current(data):
+        print("  输入数据未变化，跳过")
+        return None
+    
+    excel_dir = os.path.join(REPORTS_DIR, 'excel')
+    latest_path = excel_report_path()
+    fingerprint = input_fingerprint(data, REPORT_TABLES)
+    
     # 获取数据
-    monthly_df = get_monthly_data(conn)
-    yearly_df = get_yearly_summary(conn)
-    overall_df = get_overall_summary(conn)
-    distribution_df = get_pattern_distribution(conn)
+    monthly_df = get_monthly_data(data)
+    yearly_df = get_yearly_summary(data)
+    overall_df = get_overall_summary(data)
+    distribution_df = get_pattern_distribution(data)
     
     # 创建Excel文件
-    excel_dir = os.path.join(REPORTS_DIR, 'excel')
     os.makedirs(excel_dir, exist_ok=True)
     
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     excel_path = os.path.join(excel_dir, f'AMDX_XAMD_分析报告_{timestamp}.xlsx')
     
-    with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
+    with open_excel_writer(excel_path) as writer:
         # 工作表1: 总体汇总
-        overall_df.to_excel(writer, sheet_name='总体汇总', index=False)
-        ws = writer.sheets['总体汇总']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        write_sheet(writer, overall_df, '总体汇总', MONTHLY_PATTERN_FILLS)
         
         # 工作表2: 年度汇总
-        yearly_df.to_excel(writer, sheet_name='年度汇总', index=False)
-        ws = writer.sheets['年度汇总']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        write_sheet(writer, yearly_df, '年度汇总', MONTHLY_PATTERN_FILLS)
         
         # 工作表3: 月度详细
-        monthly_df.to_excel(writer, sheet_name='月度详细', index=False)
-        ws = writer.sheets['月度详细']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        write_sheet(writer, monthly_df, '月度详细', MONTHLY_PATTERN_FILLS)
         
         # 工作表4: 模式分布（按月份）
-        distribution_df.to_excel(writer, sheet_name='月份分布', index=False)
-        ws = writer.sheets['月份分布']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
+        write_sheet(writer, distribution_df, '月份分布', MONTHLY_PATTERN_FILLS)
         
         # 按交易对分别创建工作表
         symbols = monthly_df['交易对'].unique()
         for symbol in symbols:
             symbol_df = monthly_df[monthly_df['交易对'] == symbol].copy()
             sheet_name = f"{symbol}_详细"[:31]
-            symbol_df.to_excel(writer, sheet_name=sheet_name, index=False)
-            ws = writer.sheets[sheet_name]
-            style_excel_header(ws)
-            style_data_cells(ws)
-            auto_adjust_column_width(ws)
+            write_sheet(writer, symbol_df, sheet_name, MONTHLY_PATTERN_FILLS)
     
     print(f"  Excel报告已保存: {excel_path}")
     
-    # 同时保存一个最新版本（不带时间戳）
-    latest_path = os.path.join(excel_dir, 'AMDX_XAMD_分析报告_最新.xlsx')
-    
-    with pd.ExcelWriter(latest_path, engine='openpyxl') as writer:
-        overall_df.to_excel(writer, sheet_name='总体汇总', index=False)
-        ws = writer.sheets['总体汇总']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
-        
-        yearly_df.to_excel(writer, sheet_name='年度汇总', index=False)
-        ws = writer.sheets['年度汇总']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
-        
-        monthly_df.to_excel(writer, sheet_name='月度详细', index=False)
-        ws = writer.sheets['月度详细']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
-        
-        distribution_df.to_excel(writer, sheet_name='月份分布', index=False)
-        ws = writer.sheets['月份分布']
-        style_excel_header(ws)
-        style_data_cells(ws)
-        auto_adjust_column_width(ws)
-        
-        for symbol in symbols:
-            symbol_df = monthly_df[monthly_df['交易对'] == symbol].copy()
-            sheet_name = f"{symbol}_详细"[:31]
-            symbol_df.to_excel(writer, sheet_name=sheet_name, index=False)
-            ws = writer.sheets[sheet_name]
-            style_excel_header(ws)
-            style_data_cells(ws)
-            auto_adjust_column_width(ws)
-    
+    # 同时保存一个最新版本（不带时间戳），与上面的文件内容相同，不再重复生成
+    publish_latest(excel_path, latest_path)
     print(f"  最新版本已保存: {latest_path}")
     
+    save_fingerprint(latest_path, fingerprint)
+    
     return excel_path, latest_path
 
 
-def generate_pdf_report(conn):
-    """生成PDF报告"""
+def generate_pdf_report(data, force=False, chart_workers=1):
+    """
+    生成PDF报告
+    
+    Args:
+        data: 报告数据层
+        force: 输入数据未变化时也重新生成
+        chart_workers: 绘制图表的进程数（在报告进程池中运行时为1，不再嵌套进程池）
+    """
     print("生成PDF报告...")
     
+    if not force and pdf_report_is_current(data):
+        print("  输入数据未变化，跳过")
+        return None
+    
+    pdf_dir = os.path.join(REPORTS_DIR, 'pdf')
+    latest_path = pdf_report_path()
+    fingerprint = pdf_report_fingerprint(data)
+    
     try:
         from reportlab.lib import colors
         from reportlab.lib.pagesizes import A4, landscape
         from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
         from reportlab.lib.units import inch, cm
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
         from reportlab.pdfbase import pdfmetrics
         from reportlab.pdfbase.ttfonts import TTFont
     except ImportError:
@@ -283,12 +242,11 @@ def generate_pdf_report(conn):
         return None
     
     # 获取数据
-    monthly_df = get_monthly_data(conn)
-    yearly_df = get_yearly_summary(conn)
-    overall_df = get_overall_summary(conn)
+    monthly_df = get_monthly_data(data)
+    yearly_df = get_yearly_summary(data)
+    overall_df = get_overall_summary(data)
     
     # 创建PDF
-    pdf_dir = os.path.join(REPORTS_DIR, 'pdf')
     os.makedirs(pdf_dir, exist_ok=True)
     
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -365,32 +323,71 @@ def generate_pdf_report(conn):
     ]))
     elements.append(yearly_table)
     
+    # 图表（数据未变化的图表使用缓存的图片）
+    from scripts.charts import generate_charts
+    charts = generate_charts(data, workers=chart_workers)
+    
+    # 每行两张图表各占一半页面宽度，减去单元格左右内边距（各6pt）
+    half_width = doc.width / 2
+    
+    def chart_image(key, width):
+        """缓存的图表图片，按图表尺寸的宽高比缩放"""
+        return Image(charts[key], width=width, height=width * CHART_FIGSIZE[1] / CHART_FIGSIZE[0])
+    
+    for symbol in yearly_df['交易对'].unique() if charts else []:
+        elements.append(PageBreak())
+        elements.append(Paragraph(f"{symbol} Charts", subtitle_style))
+        
+        if ('pattern_frequency', symbol, None) in charts:
+            elements.append(chart_image(('pattern_frequency', symbol, None), min(20*cm, doc.width)))
+        
+        # 每年一行：突破幅度和价格区间并排
+        for year in yearly_df.loc[yearly_df['交易对'] == symbol, '年份']:
+            row = [chart_image((kind, symbol, int(year)), half_width - 12)
+                   for kind in ('breakout_magnitude', 'price_range')
+                   if (kind, symbol, int(year)) in charts]
+            if row:
+                elements.append(Table([row], colWidths=[half_width] * len(row)))
+    
     # 构建PDF
     doc.build(elements)
     
     print(f"  PDF报告已保存: {pdf_path}")
     
     # 保存最新版本
-    latest_path = os.path.join(pdf_dir, 'AMDX_XAMD_分析报告_最新.pdf')
-    import shutil
-    shutil.copy(pdf_path, latest_path)
+    publish_latest(pdf_path, latest_path)
     print(f"  最新版本已保存: {latest_path}")
     
+    save_fingerprint(latest_path, fingerprint)
+    
     return pdf_path
 
 
-def export_data_json(conn):
-    """导出JSON格式数据（用于GitHub Pages等）"""
+def export_data_json(data, force=False):
+    """
+    导出JSON格式数据（用于GitHub Pages等）
+    
+    Args:
+        data: 报告数据层
+        force: 输入数据未变化时也重新导出
+    """
     print("导出JSON数据...")
     
     import json
     
-    # 获取数据
-    monthly_df = get_monthly_data(conn)
-    yearly_df = get_yearly_summary(conn)
-    overall_df = get_overall_summary(conn)
+    if not force and json_data_is_current(data):
+        print("  输入数据未变化，跳过")
+        return None
     
     data_dir = os.path.join(REPORTS_DIR, 'data')
+    combined_path = json_data_path()
+    fingerprint = input_fingerprint(data, REPORT_TABLES)
+    
+    # 获取数据
+    monthly_df = get_monthly_data(data)
+    yearly_df = get_yearly_summary(data)
+    overall_df = get_overall_summary(data)
+    
     os.makedirs(data_dir, exist_ok=True)
     
     # 月度数据
@@ -414,56 +411,64 @@ def export_data_json(conn):
         'monthly': monthly_df.to_dict(orient='records')
     }
     
-    combined_path = os.path.join(data_dir, 'all_data.json')
     with open(combined_path, 'w', encoding='utf-8') as f:
         json.dump(combined, f, ensure_ascii=False, indent=2)
     
     print(f"  JSON数据已保存: {data_dir}")
     
+    save_fingerprint(combined_path, fingerprint)
+    
     return combined_path
 
 
-def main():
-    """主函数"""
+def main(data=None, force=False):
+    """
+    主函数
+    
+    Args:
+        data: 共享的报告数据层（由调用方传入时与其他报告共用查询结果），默认单独连接数据库
+        force: 输入数据未变化时也重新生成所有报告
+    """
     print("=" * 60)
     print("AMDX/XAMD 报告生成程序")
     print("=" * 60)
     print(f"当前时间: {datetime.now(TZ_UTC9).strftime('%Y-%m-%d %H:%M:%S')} (UTC+9)")
     
     # 连接数据库
-    conn = sqlite3.connect(DATABASE_PATH)
-    
-    try:
-        # 检查数据是否存在
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM monthly_patterns")
-        count = cursor.fetchone()[0]
-        
-        if count == 0:
-            print("\n警告: 数据库中没有模式数据，请先运行:")
-            print("  1. python scripts/fetch_data.py")
-            print("  2. python scripts/calculate_patterns.py")
-            return
-        
-        print(f"\n数据库中有 {count} 条模式记录")
-        
-        # 生成报告
-        generate_excel_report(conn)
-        generate_pdf_report(conn)
-        export_data_json(conn)
-        
-        print("\n" + "=" * 60)
-        print("报告生成完成!")
-        print("=" * 60)
-        
-    except Exception as e:
-        print(f"\n错误: {e}")
-        import traceback
-        traceback.print_exc()
-    finally:
-        conn.close()
-
+    with open_report_data(data) as data:
+        try:
+            # 检查数据是否存在
+            count = data.scalar("SELECT COUNT(*) FROM monthly_patterns")
+            
+            if count == 0:
+                print("\n警告: 数据库中没有模式数据，请先运行:")
+                print("  1. python scripts/fetch_data.py")
+                print("  2. python scripts/calculate_patterns.py")
+                return
+            
+            print(f"\n数据库中有 {count} 条模式记录")
+            
+            # 生成报告（输入数据与上次生成时相同的报告跳过）
+            generate_excel_report(data, force)
+            generate_pdf_report(data, force, chart_workers=REPORT_WORKERS)
+            export_data_json(data, force)
+            
+            print("\n" + "=" * 60)
+            print("报告生成完成!")
+            print("=" * 60)
+            
+        except Exception as e:
+            print(f"\n错误: {e}")
+            import traceback
+            traceback.print_exc()
 
 if __name__ == '__main__':
-    main()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='生成AMDX/XAMD分析报告')
+    parser.add_argument('--force', action='store_true',
+                        help='输入数据未变化时也重新生成报告')
+    
+    args = parser.parse_args()
+    main(force=args.force)
 
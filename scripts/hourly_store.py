@@ -0,0 +1,179 @@
+"""
+小时K线存储模块
+所有交易所的1小时K线统一写入 hourly_data 表，
+周数据和日数据都从该本地存储聚合得到，无需重复请求API
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import TZ_UTC9
+from scripts.db_writer import upsert_rows
+
+
+def save_hourly_candles(conn, symbol_id, candles, data_source):
+    """
+    保存小时K线到 hourly_data 表
+
+    Args:
+        conn: 数据库连接
+        symbol_id: 交易对ID
+        candles: K线列表，每条为 (timestamp秒, open, high, low, close, volume)
+        data_source: 数据来源（如 'binance_api'、'bitstamp_api'）
+
+    Returns:
+        tuple: (新增条数, 更新条数)
+    """
+    rows = ((symbol_id, timestamp,
+             datetime.fromtimestamp(timestamp, tz=TZ_UTC9).strftime('%Y-%m-%d %H:%M:%S'),
+             open_, high, low, close, volume, data_source)
+            for timestamp, open_, high, low, close, volume in candles)
+
+    return upsert_rows(
+        conn, 'hourly_data',
+        ['symbol_id', 'timestamp', 'datetime', 'open', 'high', 'low', 'close', 'volume', 'data_source'],
+        rows,
+        conflict_columns=['symbol_id', 'timestamp'],
+        update_columns=['open', 'high', 'low', 'close', 'volume', 'data_source']
+    )
+
+
+def binance_klines_to_candles(klines):
+    """
+    将Binance K线格式转换为 save_hourly_candles 使用的格式
+
+    Binance K线格式: [开盘时间(毫秒), 开盘价, 最高价, 最低价, 收盘价, 成交量, ...]
+    """
+    return [(int(k[0]) // 1000, float(k[1]), float(k[2]), float(k[3]),
+             float(k[4]), float(k[5]))
+            for k in klines]
+
+
+def load_hourly_klines(conn, symbol_id, start_utc9, end_utc9):
+    """
+    从 hourly_data 读取指定时间范围内的K线
+
+    返回与Binance相同的K线格式，可直接交给 process_klines_to_weekly/daily 处理:
+    [开盘时间(毫秒), 开盘价, 最高价, 最低价, 收盘价, 成交量]
+
+    Args:
+        conn: 数据库连接
+        symbol_id: 交易对ID
+        start_utc9: 开始时间（UTC+9，含）
+        end_utc9: 结束时间（UTC+9，含）
+
+    Returns:
+        list: 按开盘时间升序排列的K线列表
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT timestamp * 1000, open, high, low, close, volume
+        FROM hourly_data
+        WHERE symbol_id = ? AND timestamp >= ? AND timestamp <= ?
+        ORDER BY timestamp
+    """, (symbol_id, int(start_utc9.timestamp()), int(end_utc9.timestamp())))
+
+    return [list(row) for row in cursor.fetchall()]
+
+
+def get_hourly_range(conn, symbol_id):
+    """
+    获取 hourly_data 中该交易对已存储的时间范围
+
+    Returns:
+        tuple: (最早时间, 最晚时间)，均为UTC+9的datetime；无数据时为 (None, None)
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT MIN(timestamp), MAX(timestamp) FROM hourly_data WHERE symbol_id = ?
+    """, (symbol_id,))
+    first_ts, last_ts = cursor.fetchone()
+
+    if first_ts is None:
+        return None, None
+
+    return (datetime.fromtimestamp(first_ts, tz=TZ_UTC9),
+            datetime.fromtimestamp(last_ts, tz=TZ_UTC9))
+
+
+def klines_to_array(klines):
+    """
+    将K线列表一次性解析为浮点数组
+
+    Args:
+        klines: K线列表，每条前6列为 [开盘时间(毫秒), 开盘价, 最高价, 最低价, 收盘价, 成交量]，
+                价格可以是字符串（Binance原始格式）或数值
+
+    Returns:
+        numpy.ndarray: 形状为 (n, 6) 的float64数组
+    """
+    if isinstance(klines, np.ndarray):
+        return klines[:, :6].astype(np.float64, copy=False)
+
+    if not klines:
+        return np.empty((0, 6), dtype=np.float64)
+
+    return np.array([k[:6] for k in klines], dtype=np.float64)
+
+
+def aggregate_klines(klines, bucket_starts, bucket_ends):
+    """
+    按时间区间分组聚合K线，一次数组运算完成所有区间的 开/高/低/收/量
+
+    Args:
+        klines: 按开盘时间升序排列的K线（列表或 klines_to_array 的结果）
+        bucket_starts: 各区间开始时间戳（毫秒，含），升序且互不重叠
+        bucket_ends: 各区间结束时间戳（毫秒，含）
+
+    Returns:
+        dict: 与区间一一对应的数组
+              open/high/low/close/volume 为float数组（无数据的区间为NaN），
+              data_points 为每个区间的K线条数
+    """
+    data = klines_to_array(klines)
+    starts = np.asarray(bucket_starts, dtype=np.float64)
+    ends = np.asarray(bucket_ends, dtype=np.float64)
+    n_buckets = len(starts)
+
+    result = {
+        'open': np.full(n_buckets, np.nan),
+        'high': np.full(n_buckets, np.nan),
+        'low': np.full(n_buckets, np.nan),
+        'close': np.full(n_buckets, np.nan),
+        'volume': np.full(n_buckets, np.nan),
+        'data_points': np.zeros(n_buckets, dtype=np.int64)
+    }
+
+    if n_buckets == 0 or len(data) == 0:
+        return result
+
+    # 计算每条K线所属区间，丢弃不落在任何区间内的K线
+    open_times = data[:, 0]
+    bucket_id = np.searchsorted(starts, open_times, side='right') - 1
+    valid = bucket_id >= 0
+    valid[valid] = open_times[valid] <= ends[bucket_id[valid]]
+
+    data = data[valid]
+    bucket_id = bucket_id[valid]
+
+    if len(data) == 0:
+        return result
+
+    # K线已排序，同一区间的K线是连续的一段
+    offsets = np.flatnonzero(np.r_[True, bucket_id[1:] != bucket_id[:-1]])
+    last_rows = np.r_[offsets[1:], len(data)] - 1
+    ids = bucket_id[offsets]
+
+    result['open'][ids] = data[offsets, 1]
+    result['high'][ids] = np.maximum.reduceat(data[:, 2], offsets)
+    result['low'][ids] = np.minimum.reduceat(data[:, 3], offsets)
+    result['close'][ids] = data[last_rows, 4]
+    result['volume'][ids] = np.add.reduceat(data[:, 5], offsets)
+    result['data_points'][ids] = last_rows - offsets + 1
+
+    return result
@@ -0,0 +1,262 @@
+"""
+HTTP 客户端模块
+所有交易所请求共用：连接复用（keep-alive连接池）、gzip压缩、
+指数退避重试（带随机抖动，有最大重试次数），并处理 429/418 的 Retry-After
+
+支持录制/回放（AMDX_HTTP_MODE=record/replay），回放模式下不访问网络，
+可离线调试聚合和模式计算，或在CI中端到端运行获取流程。
+录制时保存当时的时间，回放时以该时间推算请求范围，录制之后的任何一天都能回放
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    HTTP_TIMEOUT, HTTP_MAX_RETRIES, HTTP_BACKOFF_BASE, HTTP_BACKOFF_MAX, HTTP_POOL_SIZE,
+    HTTP_CACHE_MODE, HTTP_CACHE_DIR, HTTP_CACHE_NOW, TZ_UTC9
+)
+
+# 服务器要求退避的状态码：429=超出限流，418=因持续超限被封禁（Binance）
+RATE_LIMIT_STATUS = (429, 418)
+
+CACHE_MODES = ('off', 'record', 'replay')
+
+
+class ReplayMissError(requests.exceptions.RequestException):
+    """回放模式下缓存中没有对应的请求"""
+
+
+# 每个线程一个会话（requests.Session 不保证线程安全），线程内复用连接
+_local = threading.local()
+
+# 录制/回放时本次运行固定使用的当前时间
+_pinned_now = None
+_pinned_now_lock = threading.Lock()
+
+
+def get_session():
+    """获取当前线程的HTTP会话"""
+    session = getattr(_local, 'session', None)
+
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        })
+        _local.session = session
+
+    return session
+
+
+def backoff_delay(attempt):
+    """第attempt次重试前的等待时间（指数退避 + 随机抖动）"""
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+
+def parse_retry_after(headers, default):
+    """解析 Retry-After 响应头（秒），没有时返回default"""
+    value = headers.get('Retry-After')
+
+    try:
+        return max(float(value), 0)
+    except (TypeError, ValueError):
+        return default
+
+
+def clock_path():
+    """录制时间文件的路径（与录制的响应放在一起）"""
+    return os.path.join(HTTP_CACHE_DIR, 'clock.json')
+
+
+def parse_now(value):
+    """解析 AMDX_HTTP_NOW / 录制时间（不带时区时按UTC+9）"""
+    now = datetime.fromisoformat(value)
+
+    if now.tzinfo is None:
+        return TZ_UTC9.localize(now)
+
+    return now.astimezone(TZ_UTC9)
+
+
+def resolve_now(mode):
+    """确定本次运行固定使用的当前时间（录制时同时保存）"""
+    if HTTP_CACHE_NOW:
+        now = parse_now(HTTP_CACHE_NOW)
+    elif mode == 'replay' and os.path.exists(clock_path()):
+        with open(clock_path(), 'r', encoding='utf-8') as f:
+            now = parse_now(json.load(f)['now'])
+    else:
+        if mode == 'replay':
+            print("  警告: 回放缓存中没有录制时间，使用当前时间（只能回放同一天录制的请求）")
+        now = datetime.now(TZ_UTC9)
+
+    now = now.replace(microsecond=0)
+
+    if mode == 'record':
+        os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+        with open(clock_path(), 'w', encoding='utf-8') as f:
+            json.dump({'now': now.strftime('%Y-%m-%d %H:%M:%S')}, f)
+
+    return now
+
+
+def now_utc9(mode=None):
+    """
+    获取推算请求范围使用的当前时间（UTC+9）
+
+    请求参数中的结束时间（endTime/end）由当前时间推算，录制/回放时必须固定，
+    否则录制后的第二天回放，请求参数不同，缓存中找不到：
+    - 设置了 AMDX_HTTP_NOW 时使用该时间
+    - 回放时使用录制时保存的时间
+    - 录制时使用第一次调用时的时间，并保存到缓存目录
+
+    Args:
+        mode: 录制/回放模式，默认使用 HTTP_CACHE_MODE
+    """
+    global _pinned_now
+    mode = mode or HTTP_CACHE_MODE
+
+    if mode == 'off' and not HTTP_CACHE_NOW:
+        return datetime.now(TZ_UTC9)
+
+    # 同一次运行中所有线程使用同一个时间
+    with _pinned_now_lock:
+        if _pinned_now is None:
+            _pinned_now = resolve_now(mode)
+        return _pinned_now
+
+
+def cache_path(url, params):
+    """
+    获取请求对应的缓存文件路径
+
+    以 地址 + 排序后的参数 的SHA-256作为键，同一请求总是对应同一个文件
+    """
+    key_source = json.dumps([url, sorted((params or {}).items())], default=str)
+    key = hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+    return os.path.join(HTTP_CACHE_DIR, key[:2], f'{key}.json.gz')
+
+
+def load_cached(url, params):
+    """从缓存读取响应，不存在时返回None"""
+    path = cache_path(url, params)
+
+    if not os.path.exists(path):
+        return None
+
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)['data']
+
+
+def save_cached(url, params, data):
+    """保存响应到缓存（先写临时文件再替换，避免并发线程读到半个文件）"""
+    path = cache_path(url, params)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump({'url': url, 'params': params, 'data': data}, f)
+
+    os.replace(tmp_path, path)
+
+
+def get_json(url, params=None, limiter=None, cost=1, update_limits=None,
+             max_retries=HTTP_MAX_RETRIES, timeout=HTTP_TIMEOUT, mode=None):
+    """
+    发送GET请求并返回JSON，失败时按指数退避重试
+
+    Args:
+        url: 请求地址
+        params: 查询参数
+        limiter: 交易所令牌桶（rate_limiter.TokenBucket），每次请求前获取令牌
+        cost: 每次请求消耗的权重
+        update_limits: 根据响应头校准令牌桶的函数 update_limits(limiter, headers)
+        max_retries: 最多重试次数
+        timeout: 单次请求超时（秒）
+        mode: 录制/回放模式（off/record/replay），默认使用 HTTP_CACHE_MODE
+
+    Returns:
+        解析后的JSON数据
+
+    Raises:
+        ReplayMissError: 回放模式下缓存中没有该请求
+        requests.exceptions.RequestException: 超过最大重试次数，或不可重试的错误（如400）
+    """
+    mode = mode or HTTP_CACHE_MODE
+
+    if mode not in CACHE_MODES:
+        raise ValueError(f"未知的HTTP模式: {mode}（可选: {', '.join(CACHE_MODES)}）")
+
+    if mode == 'replay':
+        data = load_cached(url, params)
+        if data is None:
+            raise ReplayMissError(f"回放缓存中没有该请求: {url} {params}")
+        return data
+
+    data = request_json(url, params, limiter, cost, update_limits, max_retries, timeout)
+
+    if mode == 'record':
+        save_cached(url, params, data)
+
+    return data
+
+
+def request_json(url, params, limiter, cost, update_limits, max_retries, timeout):
+    """发送请求并返回JSON（get_json 的网络部分，参数含义相同）"""
+    session = get_session()
+    attempt = 0
+
+    while True:
+        if limiter:
+            limiter.acquire(cost)
+
+        retry_after = None
+
+        try:
+            response = session.get(url, params=params, timeout=timeout)
+
+            if limiter and update_limits:
+                update_limits(limiter, response.headers)
+
+            if response.status_code in RATE_LIMIT_STATUS:
+                retry_after = parse_retry_after(response.headers, backoff_delay(attempt))
+                # 暂停该交易所的令牌桶，所有共享该令牌桶的线程一起退避
+                if limiter:
+                    limiter.pause(retry_after)
+
+            response.raise_for_status()
+            return response.json()
+
+        except requests.exceptions.RequestException as e:
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+
+            # 客户端错误（参数错误等）重试也无法成功，直接抛出
+            retryable = status is None or status >= 500 or status in RATE_LIMIT_STATUS
+
+            if not retryable or attempt >= max_retries:
+                print(f"  API请求失败: {e}")
+                raise
+
+            delay = retry_after if retry_after is not None else backoff_delay(attempt)
+            attempt += 1
+            print(f"  API请求错误: {e}，{delay:.1f}秒后第{attempt}次重试")
+
+            # 已暂停令牌桶时由 limiter.acquire 等待
+            if not (limiter and retry_after is not None):
+                time.sleep(delay)
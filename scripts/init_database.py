@@ -2,7 +2,6 @@
 数据库初始化脚本
 """
 
-import sqlite3
 import os
 import sys
 
@@ -10,6 +9,48 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import DATABASE_PATH, DATABASE_DIR, SYMBOLS
+from scripts.db import connect
+from scripts.calculate_weekly_patterns import backfill_daily_patterns
+
+SCHEMA_PATH = os.path.join(DATABASE_DIR, 'schema.sql')
+
+
+def apply_schema(conn):
+    """
+    执行schema（所有语句都是 IF NOT EXISTS / INSERT OR IGNORE，可重复执行），
+    并由已有的周模式补齐新增的 daily_patterns 表
+
+    Returns:
+        int: 补齐的日模式条数
+    """
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        conn.executescript(f.read())
+    
+    return backfill_daily_patterns(conn)
+
+
+def migrate_database():
+    """
+    迁移已有数据库（只生成报告时在报告之前运行）
+    
+    旧数据库没有后来新增的表（如 daily_patterns），报告查询这些表之前先补齐
+    """
+    if not os.path.exists(DATABASE_PATH):
+        print(f"数据库不存在: {DATABASE_PATH}，请先运行: python scripts/init_database.py")
+        return
+    
+    conn = connect()
+    
+    try:
+        count = apply_schema(conn)
+        conn.commit()
+        
+        if count:
+            print(f"  ✓ 由周模式补齐日模式 {count} 条")
+        print("✓ 数据库结构已是最新")
+    finally:
+        conn.close()
+
 
 def init_database():
     """初始化数据库"""
@@ -21,21 +62,19 @@ def init_database():
     os.makedirs(DATABASE_DIR, exist_ok=True)
     
     # 连接数据库（如果不存在会自动创建）
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = connect()
     cursor = conn.cursor()
     
     # 读取并执行schema
-    schema_path = os.path.join(DATABASE_DIR, 'schema.sql')
-    
-    if os.path.exists(schema_path):
-        print(f"读取数据库结构: {schema_path}")
-        with open(schema_path, 'r', encoding='utf-8') as f:
-            schema_sql = f.read()
-        
-        cursor.executescript(schema_sql)
+    if os.path.exists(SCHEMA_PATH):
+        print(f"读取数据库结构: {SCHEMA_PATH}")
+        count = apply_schema(conn)
         print("✓ 数据库结构创建成功")
+        
+        if count:
+            print(f"  ✓ 由周模式补齐日模式 {count} 条")
     else:
-        print(f"错误: 找不到schema文件: {schema_path}")
+        print(f"错误: 找不到schema文件: {SCHEMA_PATH}")
         return False
     
     # 插入交易对配置
@@ -66,7 +105,7 @@ def init_database():
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
     tables = cursor.fetchall()
     
-    expected_tables = ['data_quality_logs', 'monthly_patterns', 'symbols', 
+    expected_tables = ['daily_patterns', 'data_quality_logs', 'monthly_patterns', 'symbols', 
                        'system_config', 'update_logs', 'weekly_data']
     
     created_tables = [t[0] for t in tables]
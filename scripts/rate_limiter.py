@@ -0,0 +1,130 @@
+"""
+API 限流模块
+每个交易所使用独立的令牌桶，并根据交易所返回的权重/限流响应头校准
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import RATE_LIMITS
+
+
+class TokenBucket:
+    """令牌桶限流器（线程安全，多个获取线程共享）"""
+
+    def __init__(self, capacity, window_seconds):
+        """
+        初始化
+
+        Args:
+            capacity: 令牌桶容量（时间窗口内允许的请求权重上限）
+            window_seconds: 时间窗口长度（秒），令牌按 capacity/window_seconds 的速率补充
+        """
+        self.capacity = capacity
+        self.refill_rate = capacity / window_seconds
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        """按经过的时间补充令牌"""
+        elapsed = now - self.last_refill
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+        self.last_refill = now
+
+    def acquire(self, cost=1):
+        """
+        获取令牌，令牌不足时阻塞等待
+
+        Args:
+            cost: 本次请求消耗的权重
+        """
+        cost = min(cost, self.capacity)
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now >= self.paused_until and self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+
+                wait = max(self.paused_until - now,
+                           (cost - self.tokens) / self.refill_rate)
+
+            time.sleep(wait)
+
+    def sync(self, used):
+        """
+        根据服务器报告的已用权重校准剩余令牌
+
+        Args:
+            used: 当前时间窗口内服务器统计的已用权重
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, max(self.capacity - used, 0))
+
+    def pause(self, seconds):
+        """暂停发放令牌（用于服务器要求退避的情况）"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+# 每个交易所一个共享的令牌桶
+LIMITERS = {
+    exchange: TokenBucket(limit['capacity'], limit['window_seconds'])
+    for exchange, limit in RATE_LIMITS.items()
+}
+
+
+def get_limiter(exchange):
+    """获取指定交易所的令牌桶"""
+    return LIMITERS[exchange]
+
+
+def binance_klines_weight(limit, use_futures=True):
+    """
+    计算Binance K线接口的请求权重
+
+    期货API按limit分档计算权重，现货API固定为2
+    """
+    if not use_futures:
+        return 2
+
+    if limit < 100:
+        return 1
+    elif limit < 500:
+        return 2
+    elif limit <= 1000:
+        return 5
+    else:
+        return 10
+
+
+def update_binance_limits(limiter, headers):
+    """根据Binance响应头 X-MBX-USED-WEIGHT-1M 校准令牌桶"""
+    used = headers.get('X-MBX-USED-WEIGHT-1M') or headers.get('X-MBX-USED-WEIGHT')
+
+    if used is not None:
+        try:
+            limiter.sync(int(used))
+        except ValueError:
+            pass
+
+
+def update_bitstamp_limits(limiter, headers):
+    """根据Bitstamp响应头 X-RateLimit-Remaining 校准令牌桶（如果返回）"""
+    remaining = headers.get('X-RateLimit-Remaining')
+
+    if remaining is not None:
+        try:
+            limiter.sync(limiter.capacity - int(remaining))
+        except ValueError:
+            pass
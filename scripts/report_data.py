@@ -0,0 +1,217 @@
+"""
+报告数据模块
+各导出程序共用的查询缓存（ReportData）、输入数据指纹、报告文件发布和数据整理函数。
+同一次运行中相同的查询只执行一次，结果交给所有报告格式使用；
+输入数据与上次生成报告时相同的报告直接跳过
+"""
+
+import json
+import os
+import shutil
+import sys
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.db import connect
+
+
+class ReportData:
+    """
+    报告数据层
+
+    以 SQL（去掉多余空白）和参数为键缓存查询结果，
+    多个导出程序共用同一个实例时，重复的汇总、周数据和日数据查询只执行一次
+
+    可以传给其他进程（报告进程池）：传递时只带缓存不带连接，
+    子进程中遇到缓存中没有的查询时自行打开只读连接
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.owns_conn = False
+        self.cache = {}
+        self.queries = 0
+        self.hits = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['conn'] = None
+        state['owns_conn'] = False
+        return state
+
+    def close(self):
+        """关闭自行打开的连接（传入的连接由创建方关闭）"""
+        if self.owns_conn:
+            self.conn.close()
+            self.conn = None
+            self.owns_conn = False
+
+    def query(self, sql, params=()):
+        """
+        执行查询，相同的查询直接返回缓存结果
+
+        Returns:
+            DataFrame: 结果的副本，调用方可以自由修改
+        """
+        key = (' '.join(sql.split()), tuple(params))
+        df = self.cache.get(key)
+
+        if df is None:
+            if self.conn is None:
+                self.conn = connect(readonly=True)
+                self.owns_conn = True
+
+            df = pd.read_sql_query(sql, self.conn, params=params)
+            self.cache[key] = df
+            self.queries += 1
+        else:
+            self.hits += 1
+
+        return df.copy()
+
+    def scalar(self, sql, params=()):
+        """执行只返回一个值的查询"""
+        return self.query(sql, params).iat[0, 0]
+
+    def has_table(self, table):
+        """数据库中是否有该表（旧数据库可能还没有迁移）"""
+        return bool(self.scalar(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)))
+
+    def summary(self):
+        """查询次数统计"""
+        return f"数据库查询 {self.queries} 次，缓存命中 {self.hits} 次"
+
+
+@contextmanager
+def open_report_data(data=None):
+    """
+    获取报告数据层
+
+    传入共享的实例时直接使用（由创建方关闭连接），否则打开只读连接，结束时关闭
+    """
+    if data is not None:
+        yield data
+        return
+
+    conn = connect(readonly=True)
+
+    try:
+        yield ReportData(conn)
+    finally:
+        conn.close()
+
+
+def input_fingerprint(data, tables):
+    """
+    报告输入数据的指纹：各表的行数、最大ID和最后更新时间
+
+    写入（新增、更新、删除）都会改变其中至少一项，指纹相同说明报告的输入数据没有变化
+
+    Returns:
+        dict: {表名: [行数, 最大ID, 最后更新时间]}
+    """
+    fingerprint = {}
+
+    for table in tables:
+        count, max_id, last_updated = data.query(
+            f"SELECT COUNT(*), MAX(id), MAX(updated_at) FROM {table}").iloc[0]
+        fingerprint[table] = [
+            int(count),
+            None if pd.isna(max_id) else int(max_id),
+            None if pd.isna(last_updated) else str(last_updated)
+        ]
+
+    return fingerprint
+
+
+def fingerprint_path(report_path):
+    """报告对应的指纹文件（与报告放在同一目录）"""
+    return f'{report_path}.fingerprint.json'
+
+
+def report_is_current(report_path, fingerprint):
+    """报告文件存在，且生成时的输入指纹与当前相同"""
+    path = fingerprint_path(report_path)
+
+    if not (os.path.exists(report_path) and os.path.exists(path)):
+        return False
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f) == fingerprint
+    except (OSError, ValueError):
+        return False
+
+
+def save_fingerprint(report_path, fingerprint):
+    """报告生成完成后保存输入指纹（生成中途失败时不保存，下次重新生成）"""
+    with open(fingerprint_path(report_path), 'w', encoding='utf-8') as f:
+        json.dump(fingerprint, f, ensure_ascii=False, indent=2)
+
+
+def publish_latest(report_path, latest_path):
+    """
+    将生成的报告发布为最新版本（不带时间戳的文件），不再重复生成一遍
+
+    优先创建硬链接，文件系统不支持时复制。先在临时路径创建再替换，
+    旧的最新版本与以前的带时间戳报告是同一个文件时不会被改写
+    """
+    tmp_path = f'{latest_path}.tmp'
+
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    try:
+        os.link(report_path, tmp_path)
+    except OSError:
+        shutil.copy2(report_path, tmp_path)
+
+    os.replace(tmp_path, latest_path)
+
+
+def monthly_pattern_letters(weekly, monthly_patterns, symbol_id,
+                            year_column='年份', month_column='月份', week_column='月内第几周'):
+    """
+    根据月度模式和月内第几周，得到每周的X/A/M/D走势
+
+    周数据与月度模式按 (symbol_id, year, month) 连接，再按月内第几周取模式中对应位置的字母。
+    pattern是一个4字母字符串（XAMD或AMDX），每个字母对应月内第1-4周，例如：
+    - pattern='XAMD', week_of_month=1 -> 'X'
+    - pattern='AMDX', week_of_month=4 -> 'X'
+    第5周及以后、或没有对应月度模式的周为空字符串
+
+    Args:
+        weekly: 一个交易对的周数据 DataFrame
+        monthly_patterns: 月度模式 DataFrame，包含 symbol_id, year, month, pattern
+        symbol_id: 交易对ID
+        year_column: weekly 中年份的列名
+        month_column: weekly 中月份的列名
+        week_column: weekly 中月内第几周的列名
+
+    Returns:
+        Series: 与 weekly 的行一一对应的走势字母
+    """
+    keys = pd.DataFrame({
+        'symbol_id': symbol_id,
+        'year': weekly[year_column].to_numpy(),
+        'month': weekly[month_column].to_numpy()
+    })
+    patterns = monthly_patterns[['symbol_id', 'year', 'month', 'pattern']].drop_duplicates(
+        ['symbol_id', 'year', 'month'])
+
+    pattern = keys.merge(patterns, how='left', on=['symbol_id', 'year', 'month'])['pattern']
+    pattern = pattern.where(pattern.str.len() == 4)
+
+    week_of_month = weekly[week_column].to_numpy()
+    letters = np.full(len(weekly), '', dtype=object)
+
+    for week in range(1, 5):
+        letter = pattern.str[week - 1].fillna('').to_numpy()
+        letters = np.where(week_of_month == week, letter, letters)
+
+    return pd.Series(letters, index=weekly.index, dtype=object)
@@ -0,0 +1,205 @@
+"""
+报告生成调度模块
+Excel报告、PDF报告、JSON数据、JSON接口和合并报告互相独立，在进程池中并行生成。
+
+主进程先检查各报告的输入指纹，只生成输入数据有变化的报告；
+多个报告共用的汇总数据在主进程中查询一次，随查询缓存（ReportData）传给各子进程
+"""
+
+import os
+import sys
+import time
+import importlib
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import TZ_UTC9, REPORT_WORKERS
+from scripts.report_data import open_report_data
+
+# 报告任务：(名称, 模块, 生成函数, 检查输入是否变化的函数)
+REPORT_JOBS = [
+    ('Excel报告', 'generate_reports', 'generate_excel_report', 'excel_report_is_current'),
+    ('PDF报告', 'generate_reports', 'generate_pdf_report', 'pdf_report_is_current'),
+    ('JSON数据', 'generate_reports', 'export_data_json', 'json_data_is_current'),
+    ('JSON接口', 'export_json_api', 'export_json_api', 'json_api_is_current'),
+    ('合并报告', 'export_combined_report', 'export_combined_report', 'combined_report_is_current'),
+]
+
+
+def get_function(module_name, function_name):
+    """获取 scripts 下模块中的函数"""
+    module = importlib.import_module(f'scripts.{module_name}')
+    return getattr(module, function_name)
+
+
+def pending_jobs(data, force=False):
+    """
+    输入数据有变化（或强制生成）的报告任务
+
+    检查某个报告的输入数据出错时按有变化处理，由该报告自己生成（或失败），不影响其他报告
+    """
+    if force:
+        return list(REPORT_JOBS)
+
+    pending = []
+
+    for name, module_name, function_name, check_name in REPORT_JOBS:
+        try:
+            is_current = get_function(module_name, check_name)(data)
+        except Exception as e:
+            print(f"  {name}: 检查输入数据失败（{e}），重新生成")
+            is_current = False
+
+        if is_current:
+            print(f"  {name}: 输入数据未变化，跳过")
+        else:
+            pending.append((name, module_name, function_name, check_name))
+
+    return pending
+
+
+def prefetch_shared_data(data):
+    """查询多个报告共用的数据（月度明细和各项汇总），子进程直接使用缓存结果"""
+    from scripts import generate_reports
+
+    generate_reports.get_monthly_data(data)
+    generate_reports.get_yearly_summary(data)
+    generate_reports.get_overall_summary(data)
+    generate_reports.get_pattern_distribution(data)
+
+
+def prerender_charts(data, jobs, workers=REPORT_WORKERS):
+    """
+    需要生成PDF报告时，先在主进程中用进程池绘制图表
+
+    PDF报告在子进程中只用单个进程绘制图表：这里先绘制好，子进程直接使用缓存的图片，
+    不在子进程中再嵌套进程池
+    """
+    if not any(function_name == 'generate_pdf_report' for _, _, function_name, _ in jobs):
+        return
+
+    # 没有reportlab时PDF报告会跳过，不需要图表
+    if importlib.util.find_spec('reportlab') is None:
+        return
+
+    from scripts.charts import generate_charts
+
+    try:
+        generate_charts(data, workers)
+    except Exception as e:
+        print(f"  图表绘制失败: {e}")
+
+
+def run_job(module_name, function_name, data):
+    """
+    在子进程中生成一个报告
+
+    主进程已确认输入数据有变化，因此强制生成；结束时关闭子进程中打开的连接
+    """
+    try:
+        return get_function(module_name, function_name)(data, force=True)
+    finally:
+        data.close()
+
+
+def generate_all_reports(data, force=False, workers=REPORT_WORKERS):
+    """
+    生成所有报告
+
+    Args:
+        data: 报告数据层
+        force: 输入数据未变化时也重新生成
+        workers: 进程数（1 表示在当前进程中依次生成）
+
+    Returns:
+        dict: {报告名称: 生成函数的返回值}，失败的报告为异常对象
+    """
+    jobs = pending_jobs(data, force)
+
+    if not jobs:
+        print("  所有报告的输入数据都未变化")
+        return {}
+
+    prefetch_shared_data(data)
+    prerender_charts(data, jobs, workers)
+    results = {}
+
+    # 只有一个任务时不值得启动进程池
+    if workers <= 1 or len(jobs) == 1:
+        for name, module_name, function_name, _ in jobs:
+            try:
+                results[name] = get_function(module_name, function_name)(data, force=True)
+            except Exception as e:
+                print(f"  {name}生成失败: {e}")
+                results[name] = e
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        futures = {
+            executor.submit(run_job, module_name, function_name, data): name
+            for name, module_name, function_name, _ in jobs
+        }
+
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                print(f"  {name}生成失败: {e}")
+                results[name] = e
+
+    return results
+
+
+def main(data=None, force=False, workers=REPORT_WORKERS):
+    """
+    主函数
+
+    Args:
+        data: 共享的报告数据层，默认单独连接数据库
+        force: 输入数据未变化时也重新生成所有报告
+        workers: 进程数
+    """
+    print("=" * 60)
+    print("生成报告")
+    print("=" * 60)
+    print(f"当前时间: {datetime.now(TZ_UTC9).strftime('%Y-%m-%d %H:%M:%S')} (UTC+9)")
+
+    start = time.perf_counter()
+
+    with open_report_data(data) as data:
+        count = data.scalar("SELECT COUNT(*) FROM monthly_patterns")
+
+        if count == 0:
+            print("\n警告: 数据库中没有模式数据，请先运行:")
+            print("  1. python scripts/fetch_data.py")
+            print("  2. python scripts/calculate_patterns.py")
+            return
+
+        results = generate_all_reports(data, force, workers)
+        print(f"\n{data.summary()}（主进程）")
+
+    failed = [name for name, result in results.items() if isinstance(result, Exception)]
+
+    print("\n" + "=" * 60)
+    print(f"报告生成完成，用时 {time.perf_counter() - start:.1f}秒")
+    print("=" * 60)
+
+    if failed:
+        raise RuntimeError(f"报告生成失败: {', '.join(failed)}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='并行生成所有报告')
+    parser.add_argument('--force', action='store_true',
+                        help='输入数据未变化时也重新生成报告')
+    parser.add_argument('--workers', type=int, default=REPORT_WORKERS,
+                        help=f'进程数（默认{REPORT_WORKERS}）')
+
+    args = parser.parse_args()
+    main(force=args.force, workers=args.workers)